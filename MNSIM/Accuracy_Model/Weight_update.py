@@ -6,7 +6,6 @@ import configparser as cp
 import numpy as np
 from MNSIM.Hardware_Model import *
 from MNSIM.Hardware_Model.Crossbar import crossbar
-from MNSIM.Interface.interface import *
 
 def weight_update(SimConfig_path, weight, is_SAF=1, is_Variation=1):
     # print("Hardware config file is loaded:", SimConfig_path)
@@ -45,6 +44,7 @@ def weight_update(SimConfig_path, weight, is_SAF=1, is_Variation=1):
     return weight
 
 if __name__ == '__main__':
+    from MNSIM.Interface.interface import TrainTestInterface
     SimConfig_path = os.path.join(os.path.dirname(os.path.dirname(os.getcwd())), "SimConfig.ini")
     weights_file_path = os.path.join(os.path.dirname(os.path.dirname(os.getcwd())),"cifar10_lenet_train_params.pth")
     __TestInterface = TrainTestInterface('MNSIM.Interface.lenet', 'MNSIM.Interface.cifar10', SimConfig_path,
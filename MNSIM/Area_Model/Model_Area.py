@@ -6,15 +6,12 @@ import configparser as cp
 work_path = os.path.dirname(os.getcwd())
 sys.path.append(work_path)
 import numpy as np
-from MNSIM.Interface.interface import *
 from MNSIM.Mapping_Model.Tile_connection_graph import TCG
-import pandas as pd
+from MNSIM.NoC.interconnect_estimation import interconnect_estimation
 from MNSIM.Hardware_Model.Tile import tile
 
 class Model_area():
     def __init__(self, NetStruct, SimConfig_path, multiple=None, TCG_mapping=None):
-        path = os.getcwd() + '/Final_Results/'
-        data = pd.read_csv(path + 'area.csv')
         self.NetStruct = NetStruct
         self.SimConfig_path = SimConfig_path
         if multiple is None:
@@ -49,40 +46,42 @@ class Model_area():
         self.arch_total_buf_area = 0
         self.arch_total_output_mux_area = 0
         self.arch_total_pooling_area = 0
-        self.arch_Noc_area = float(data.columns[1])
+        if self.graph.noc_input.area is None:
+            interconnect_estimation(SimConfig_path, self.graph.noc_input)
+        self.arch_Noc_area = self.graph.noc_input.area
         self.calculate_model_area()
 
     def calculate_model_area(self): #Todo: Noc area
-
+        # all the tiles are identical, the area of each layer is the tile area scaled by the tile number of the layer
+        # (tile_share: the tiles shared by several layers (tile packing) are split by the PE numbers)
         self.graph.tile.calculate_tile_area()
-        for i in range(self.total_layer_num):
-            tile_num = self.graph.layer_tileinfo[i]['tilenum']
-            self.arch_area[i] = self.graph.tile.tile_area * tile_num
-            self.arch_xbar_area[i] = self.graph.tile.tile_xbar_area * tile_num
-            self.arch_ADC_area[i] = self.graph.tile.tile_ADC_area * tile_num
-            self.arch_DAC_area[i] = self.graph.tile.tile_DAC_area * tile_num
-            self.arch_digital_area[i] = self.graph.tile.tile_digital_area * tile_num
-            self.arch_adder_area[i] = self.graph.tile.tile_adder_area * tile_num
-            self.arch_shiftreg_area[i] = self.graph.tile.tile_shiftreg_area * tile_num
-            self.arch_iReg_area[i] = self.graph.tile.tile_iReg_area * tile_num
-            self.arch_input_demux_area[i] = self.graph.tile.tile_input_demux_area * tile_num
-            self.arch_output_mux_area[i] = self.graph.tile.tile_output_mux_area * tile_num
-            self.arch_jointmodule_area[i] = self.graph.tile.tile_jointmodule_area * tile_num
-            self.arch_buf_area[i] = self.graph.tile.tile_buffer_area * tile_num
-            self.arch_pooling_area[i] = self.graph.tile.tile_pooling_area * tile_num
-        self.arch_total_area = sum(self.arch_area) + self.arch_Noc_area
-        self.arch_total_xbar_area = sum(self.arch_xbar_area)
-        self.arch_total_ADC_area = sum(self.arch_ADC_area)
-        self.arch_total_DAC_area = sum(self.arch_DAC_area)
-        self.arch_total_digital_area = sum(self.arch_digital_area)
-        self.arch_total_adder_area = sum(self.arch_adder_area)
-        self.arch_total_shiftreg_area = sum(self.arch_shiftreg_area)
-        self.arch_total_iReg_area = sum(self.arch_iReg_area)
-        self.arch_total_input_demux_area = sum(self.arch_input_demux_area)
-        self.arch_total_output_mux_area = sum(self.arch_output_mux_area)
-        self.arch_total_jointmodule_area = sum(self.arch_jointmodule_area)
-        self.arch_total_buf_area = sum(self.arch_buf_area)
-        self.arch_total_pooling_area = sum(self.arch_pooling_area)
+        tile_num = self.graph.get_layer_tileinfo_array()['tile_share']
+        self.arch_area = self.graph.tile.tile_area * tile_num
+        self.arch_xbar_area = self.graph.tile.tile_xbar_area * tile_num
+        self.arch_ADC_area = self.graph.tile.tile_ADC_area * tile_num
+        self.arch_DAC_area = self.graph.tile.tile_DAC_area * tile_num
+        self.arch_digital_area = self.graph.tile.tile_digital_area * tile_num
+        self.arch_adder_area = self.graph.tile.tile_adder_area * tile_num
+        self.arch_shiftreg_area = self.graph.tile.tile_shiftreg_area * tile_num
+        self.arch_iReg_area = self.graph.tile.tile_iReg_area * tile_num
+        self.arch_input_demux_area = self.graph.tile.tile_input_demux_area * tile_num
+        self.arch_output_mux_area = self.graph.tile.tile_output_mux_area * tile_num
+        self.arch_jointmodule_area = self.graph.tile.tile_jointmodule_area * tile_num
+        self.arch_buf_area = self.graph.tile.tile_buffer_area * tile_num
+        self.arch_pooling_area = self.graph.tile.tile_pooling_area * tile_num
+        self.arch_total_area = self.arch_area.sum() + self.arch_Noc_area
+        self.arch_total_xbar_area = self.arch_xbar_area.sum()
+        self.arch_total_ADC_area = self.arch_ADC_area.sum()
+        self.arch_total_DAC_area = self.arch_DAC_area.sum()
+        self.arch_total_digital_area = self.arch_digital_area.sum()
+        self.arch_total_adder_area = self.arch_adder_area.sum()
+        self.arch_total_shiftreg_area = self.arch_shiftreg_area.sum()
+        self.arch_total_iReg_area = self.arch_iReg_area.sum()
+        self.arch_total_input_demux_area = self.arch_input_demux_area.sum()
+        self.arch_total_output_mux_area = self.arch_output_mux_area.sum()
+        self.arch_total_jointmodule_area = self.arch_jointmodule_area.sum()
+        self.arch_total_buf_area = self.arch_buf_area.sum()
+        self.arch_total_pooling_area = self.arch_pooling_area.sum()
 
     def model_area_output(self, module_information = 1, layer_information = 1):
         print("Hardware area:", self.arch_total_area, "um^2")
@@ -106,6 +105,7 @@ class Model_area():
                 print("     Hardware area:", self.arch_area[i], "um^2")
 
 if __name__ == '__main__':
+    from MNSIM.Interface.interface import TrainTestInterface
     test_SimConfig_path = os.path.join(os.path.dirname(os.path.dirname(os.getcwd())), "SimConfig.ini")
     test_weights_file_path = os.path.join(os.path.dirname(os.path.dirname(os.getcwd())),
                                           "vgg8_params.pth")
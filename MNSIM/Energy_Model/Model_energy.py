@@ -6,18 +6,15 @@ import configparser as cp
 work_path = os.path.dirname(os.getcwd())
 sys.path.append(work_path)
 import numpy as np
-import pandas as pd
-from MNSIM.Interface.interface import *
 from MNSIM.Mapping_Model.Tile_connection_graph import TCG
 from MNSIM.Hardware_Model.Tile import tile
 from MNSIM.Power_Model.Model_inference_power import Model_inference_power
 from MNSIM.Latency_Model.Model_latency import Model_latency
+from MNSIM.NoC.interconnect_estimation import interconnect_estimation
 
 class Model_energy():
     def __init__(self,NetStruct,SimConfig_path,model_power=None,
                  model_latency=None,multiple=None,TCG_mapping=None):
-        path = os.getcwd() + '/Final_Results/'
-        data = pd.read_csv(path + 'Energy.csv')
         self.NetStruct = NetStruct
         self.SimConfig_path = SimConfig_path
         if multiple is None:
@@ -65,7 +62,17 @@ class Model_energy():
         self.arch_total_buf_w_energy = 0
         self.arch_total_output_mux_energy = 0
         self.arch_total_pooling_energy = 0
-        self.arch_Noc_energy = float(data.columns[1]) * 1e-3
+        if self.graph.noc_input.energy is None:
+            interconnect_estimation(SimConfig_path, self.graph.noc_input)
+        self.arch_Noc_energy = self.graph.noc_input.energy * 1e-3
+        SimConfig = cp.ConfigParser()
+        SimConfig.read(SimConfig_path, encoding='UTF-8')
+        self.inter_chip_energy = float(SimConfig.get('Architecture level', 'Inter_Chip_Energy', fallback='0'))
+            # unit: pJ/bit
+        self.arch_chip_link_energy = self.graph.chip_transfer_volume.sum() * self.inter_chip_energy * 1e-3
+            # the data sent between chips (multi-chip partition), unit: nJ
+        self.arch_reprogramming_energy = self.graph.layer_write_energy.sum() if self.graph.phase_num > 1 else 0
+            # weight reprogramming: all the phases are programmed in each inference, unit: nJ
         self.calculate_model_energy()
 
     def calculate_model_energy(self):
@@ -88,7 +95,8 @@ class Model_energy():
                                           self.arch_input_demux_energy[i]+self.arch_output_mux_energy[i]+self.arch_jointmodule_energy[i]
             self.arch_energy[i] = self.arch_xbar_energy[i]+self.arch_ADC_energy[i]+self.arch_DAC_energy[i]+\
                                   self.arch_digital_energy[i]+self.arch_buf_energy[i]+self.arch_pooling_energy[i]
-        self.arch_total_energy = sum(self.arch_energy) + self.arch_Noc_energy
+        self.arch_total_energy = sum(self.arch_energy) + self.arch_Noc_energy + self.arch_chip_link_energy + \
+                                 self.arch_reprogramming_energy
         self.arch_total_xbar_energy = sum(self.arch_xbar_energy)
         self.arch_total_ADC_energy = sum(self.arch_ADC_energy)
         self.arch_total_DAC_energy = sum(self.arch_DAC_energy)
@@ -122,12 +130,15 @@ class Model_energy():
             print("			|---output_mux energy:", self.arch_total_output_mux_energy, "nJ")
             print("			|---joint_module energy:", self.arch_total_jointmodule_energy, "nJ")
             print("		NoC part energy:", self.arch_Noc_energy, "nJ")
+            print("		Inter chip link energy:", self.arch_chip_link_energy, "nJ")
+            print("		Weight programming energy:", self.arch_reprogramming_energy, "nJ")
         if layer_information:
             for i in range(self.total_layer_num):
                 print("Layer", i, ":")
                 print("     Hardware energy:", self.arch_energy[i], "nJ")
 
 if __name__ == '__main__':
+    from MNSIM.Interface.interface import TrainTestInterface
     test_SimConfig_path = os.path.join(os.path.dirname(os.path.dirname(os.getcwd())), "SimConfig.ini")
     test_weights_file_path = os.path.join(os.path.dirname(os.path.dirname(os.getcwd())),
                                           "vgg8_params.pth")
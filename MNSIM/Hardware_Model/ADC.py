@@ -3,6 +3,7 @@
 import configparser as cp
 import os
 import math
+from MNSIM.Hardware_Model.Component_library import component_lookup
 test_SimConfig_path = os.path.join(os.path.dirname(os.path.dirname(os.getcwd())),"SimConfig.ini")
 	#Default SimConfig file path: MNSIM_Python/SimConfig.ini
 
@@ -28,58 +29,26 @@ class ADC(object):
 
 	def calculate_ADC_area(self):
 		#unit: um^2
-		ADC_area_dict = {1: 1600, #reference: A 10b 1.5GS/s Pipelined-SAR ADC with Background Second-Stage Common-Mode Regulation and Offset Calibration in 14nm CMOS FinFET
-						 2: 1200, #reference: ISAAC: A Convolutional Neural Network Accelerator with In-Situ Analog Arithmetic in Crossbars
-						 3: 1650, #reference: A >3GHz ERBW 1.1GS/s 8b Two-Step SAR ADC with Recursive-Weight DAC
-						 4: 580, #reference: Area-Efficient 1GS/s 6b SAR ADC with Charge-Injection-Cell-Based DAC
-						 5: 1650, #ASPDAC1
-						 6: 1650, #ASPDAC2
-						 7: 500 #ASPDAC3
-		}
 		if self.ADC_choice != -1:
 			assert self.ADC_choice in [1,2,3,4,5,6,7]
-			self.ADC_area = ADC_area_dict[self.ADC_choice]
+			self.ADC_area = component_lookup('ADC', 'area', self.ADC_choice)
 
 	def calculate_ADC_precision(self):
-		ADC_precision_dict = {1: 10, #reference: A 10b 1.5GS/s Pipelined-SAR ADC with Background Second-Stage Common-Mode Regulation and Offset Calibration in 14nm CMOS FinFET
-						 2: 8, #reference: ISAAC: A Convolutional Neural Network Accelerator with In-Situ Analog Arithmetic in Crossbars
-						 3: 8, #reference: A >3GHz ERBW 1.1GS/s 8b Two-Step SAR ADC with Recursive-Weight DAC
-						 4: 6, #reference: Area-Efficient 1GS/s 6b SAR ADC with Charge-Injection-Cell-Based DAC
-						 5: 8, #ASPDAC1
-						 6: 6, #ASPDAC2
-						 7: 4 #ASPDAC3
-		}
 		if self.ADC_choice != -1:
 			assert self.ADC_choice in [1,2,3,4,5,6,7]
-			self.ADC_precision = ADC_precision_dict[self.ADC_choice]
+			self.ADC_precision = component_lookup('ADC', 'precision', self.ADC_choice)
 
 	def calculate_ADC_power(self):
 		#unit: W
-		ADC_power_dict = {1: 6.92*1e-3, #reference: A 10b 1.5GS/s Pipelined-SAR ADC with Background Second-Stage Common-Mode Regulation and Offset Calibration in 14nm CMOS FinFET
-						 2: 2*1e-3, #reference: ISAAC: A Convolutional Neural Network Accelerator with In-Situ Analog Arithmetic in Crossbars
-						 3: 4*1e-3, #reference: A >3GHz ERBW 1.1GS/s 8b Two-Step SAR ADC with Recursive-Weight DAC
-						 4: 1.26*1e-3, #reference: Area-Efficient 1GS/s 6b SAR ADC with Charge-Injection-Cell-Based DAC
-						 5: 4e-3, #ASPDAC1
-						 6: 1.26e-3, #ASPDAC2
-						 7: 0.7e-3 #ASPDAC3
-		}
 		if self.ADC_choice != -1:
 			assert self.ADC_choice in [1,2,3,4,5,6,7]
-			self.ADC_power = ADC_power_dict[self.ADC_choice]
+			self.ADC_power = component_lookup('ADC', 'power', self.ADC_choice)
 
 	def calculate_ADC_sample_rate(self):
 		#unit: GSamples/s
-		ADC_sample_rate_dict = {1: 1.5, #reference: A 10b 1.5GS/s Pipelined-SAR ADC with Background Second-Stage Common-Mode Regulation and Offset Calibration in 14nm CMOS FinFET
-								2: 1.28, #reference: ISAAC: A Convolutional Neural Network Accelerator with In-Situ Analog Arithmetic in Crossbars
-								3: 1.1, #reference: A >3GHz ERBW 1.1GS/s 8b Two-Step SAR ADC with Recursive-Weight DAC
-								4: 1, #reference: Area-Efficient 1GS/s 6b SAR ADC with Charge-Injection-Cell-Based DAC
-								5: 1.1, #ASPDAC1
-								6: 1, #ASPDAC2
-								7:1 #ASPDAC3
-		}
 		if self.ADC_choice != -1:
 			assert self.ADC_choice in [1,2,3,4,5,6,7]
-			self.ADC_sample_rate = ADC_sample_rate_dict[self.ADC_choice]
+			self.ADC_sample_rate = component_lookup('ADC', 'sample_rate', self.ADC_choice)
 
 	def calculate_ADC_latency(self):
 		# unit: ns
@@ -3,6 +3,7 @@
 import configparser as cp
 import os
 import math
+from MNSIM.Hardware_Model.Component_library import component_lookup
 test_SimConfig_path = os.path.join(os.path.dirname(os.path.dirname(os.getcwd())),"SimConfig.ini")
 	#Default SimConfig file path: MNSIM_Python/SimConfig.ini
 
@@ -31,44 +32,15 @@ class adder(object):
 	def calculate_adder_area(self):
 		# unit: um^2
 		if self.adder_area == 0:
-			adder_area_dict = {130: 10*14*130*130/1e6, #ref: Implementation of an Efficient 14-Transistor Full Adder (.18μm technology) Using DTMOS
-							   65: 10*14*65*65/1e6,
-							   55: 10*14*55*55/1e6,
-							   45: 10*14*45*45/1e6,
-							   28: 10*14*28*28/1e6
-			}
+			#ref: Implementation of an Efficient 14-Transistor Full Adder (.18μm technology) Using DTMOS
 			# TODO: add circuits simulation results
-			if self.adder_tech <= 28:
-				self.adder_area = adder_area_dict[28] * self.adder_bitwidth
-			elif self.adder_tech <= 45:
-				self.adder_area = adder_area_dict[45] * self.adder_bitwidth
-			elif self.adder_tech <= 55:
-				self.adder_area = adder_area_dict[55] * self.adder_bitwidth
-			elif self.adder_tech <= 65:
-				self.adder_area = adder_area_dict[65] * self.adder_bitwidth
-			else:
-				self.adder_area = adder_area_dict[130] * self.adder_bitwidth
+			self.adder_area = component_lookup('adder', 'area', self.adder_tech, self.adder_bitwidth)
 
 	def calculate_adder_power(self):
 		# unit: W
 		if self.adder_power == 0:
-			adder_power_dict = {130: 2.5e-9,
-							   65: 2.5e-9,
-							   55: 2.5e-9,
-							   45: 2.5e-9,
-							   28: 2.5e-9
-			}
 			# TODO: add circuits simulation results
-			if self.adder_tech <= 28:
-				self.adder_power = adder_power_dict[28] * self.adder_bitwidth
-			elif self.adder_tech <= 45:
-				self.adder_power = adder_power_dict[45] * self.adder_bitwidth
-			elif self.adder_tech <= 55:
-				self.adder_power = adder_power_dict[55] * self.adder_bitwidth
-			elif self.adder_tech <= 65:
-				self.adder_power = adder_power_dict[65] * self.adder_bitwidth
-			else:
-				self.adder_power = adder_power_dict[130] * self.adder_bitwidth
+			self.adder_power = component_lookup('adder', 'power', self.adder_tech, self.adder_bitwidth)
 
 	def calculate_adder_energy(self):
 		assert self.adder_power >= 0
@@ -0,0 +1,238 @@
+#!/usr/bin/python
+#-*-coding:utf-8-*-
+import functools
+import numpy as np
+# Characterization tables of the peripheral components (ADC, DAC, adder, shiftreg, JointModule, Pooling, buffer)
+# All tables are loaded once as numpy arrays, and the lookup/interpolation functions accept scalars or arrays
+# Between the characterized technology nodes and bitwidths the tables are linearly interpolated
+# component_lookup memoizes the scalar queries by (component, quantity, parameters)
+
+
+# ADC, indexed by ADC_choice (1~7)
+ADC_choice_list = np.array([1, 2, 3, 4, 5, 6, 7])
+ADC_area_table = np.array([1600, #reference: A 10b 1.5GS/s Pipelined-SAR ADC with Background Second-Stage Common-Mode Regulation and Offset Calibration in 14nm CMOS FinFET
+						   1200, #reference: ISAAC: A Convolutional Neural Network Accelerator with In-Situ Analog Arithmetic in Crossbars
+						   1650, #reference: A >3GHz ERBW 1.1GS/s 8b Two-Step SAR ADC with Recursive-Weight DAC
+						   580, #reference: Area-Efficient 1GS/s 6b SAR ADC with Charge-Injection-Cell-Based DAC
+						   1650, #ASPDAC1
+						   1650, #ASPDAC2
+						   500 #ASPDAC3
+						   ], dtype = float) # unit: um^2
+ADC_precision_table = np.array([10, 8, 8, 6, 8, 6, 4]) # unit: bit
+ADC_power_table = np.array([6.92e-3, 2e-3, 4e-3, 1.26e-3, 4e-3, 1.26e-3, 0.7e-3]) # unit: W
+ADC_sample_rate_table = np.array([1.5, 1.28, 1.1, 1, 1.1, 1, 1]) # unit: GSamples/s
+
+# DAC, indexed by DAC_choice (1~6)
+# Data reference: ISAAC: A Convolutional Neural Network Accelerator with In-Situ Analog Arithmetic in Crossbars
+DAC_choice_list = np.array([1, 2, 3, 4, 5, 6])
+DAC_area_table = np.array([0.166, 0.332, 0.664, 1.328, 5.312, 21.248]) # unit: um^2
+DAC_precision_table = np.array([1, 2, 3, 4, 6, 8]) # unit: bit
+DAC_power_table = np.array([0.0039e-3, 0.0078e-3, 0.0156e-3, 0.0312e-3, 0.1248e-3, 0.4992]) # unit: W
+
+# adder (per bit), indexed by technology node
+# ref: Implementation of an Efficient 14-Transistor Full Adder (.18μm technology) Using DTMOS
+adder_tech_list = np.array([28, 45, 55, 65, 130])
+adder_area_coefficient = 10 * 14 / 1e6 # area = coefficient * tech^2, unit: um^2
+adder_power_table = np.array([2.5e-9, 2.5e-9, 2.5e-9, 2.5e-9, 2.5e-9]) # unit: W
+
+# shiftreg and JointModule, indexed by bitwidth, characterized in 65nm
+shiftreg_base_list = np.array([4, 8, 16])
+shiftreg_area_table = np.array([228.96, 217.44, 230.40]) # unit: um^2
+shiftreg_power_table = np.array([2.13e-4, 1.97e-4, 1.24e-4]) # unit: W
+jointmodule_bit_list = np.array([4, 8, 12, 16])
+jointmodule_area_table = np.array([182.88, 353.76, 385.44, 512.16]) # unit: um^2
+jointmodule_power_table = np.array([1.39e-4, 2.64e-4, 3.67e-4, 4.97e-4]) # unit: W
+
+# Pooling module (3x3 pooling, 64 units), characterized in 65nm
+Pooling_area_base = 83834 # unit: um^2
+Pooling_power_base = 18.72e-3 # unit: W
+Pooling_latency_base = 10 # unit: ns
+
+# buffer, indexed by technology node and capacity
+# area = capacity * param[0] + param[1] (unit: mm^2)
+# power tables are sampled at the capacity points used in LinearCaculate (unit: mW)
+buf_tech_list = np.array([22, 32, 40, 90])
+sram_area_param_table = np.array([[0.0062, 1.0194], [0.004, 0.6744], [0.0019, 0.3222], [0.0315, 5.2282]])
+dram_area_param_table = np.array([[0.0008, 0.0392], [0.0012, 0.0461], [0.0026, 0.0683], [0.0128, 0.592]])
+sram_dynamic_rpower_table = np.array([
+	[24.58644692636836, 21.256680531480068, 16.630583603036584, 14.955019387590541, 14.552721904914858,
+	 14.257453645247653, 12.527513793888135, 15.518218262806235, 14.294173411058916, 12.51284044801866,
+	 16.45505738866356, 15.398484327588525, 13.717732207478887, 11.419544538453302, 8.665835778978261],
+	[29.63490174539241, 25.144562713942936, 19.62063471965257, 17.873127969312, 18.905345968508605,
+	 18.018235899146582, 15.723097777716921, 20.71955405788429, 18.510839616813907, 16.334889657949883,
+	 22.02049502929944, 20.681490961446165, 18.73011577040343, 16.190697604655696, 13.074672495123739],
+	[29.63490174539241, 25.144562713942936, 19.62063471965257, 17.873127969312, 18.905345968508605,
+	 18.018235899146582, 15.723097777716921, 20.71955405788429, 18.510839616813907, 16.334889657949883,
+	 22.02049502929944, 20.681490961446165, 18.73011577040343, 16.190697604655696, 13.074672495123739],
+	[52.383805276449415, 44.37317131426524, 34.84710077256134, 31.39500415877679, 34.77577468633599,
+	 34.490551860570235, 30.263038598896543, 42.48749115726415, 38.142483189606374, 34.37125197169005,
+	 49.56160095336047, 47.21163075497303, 44.02150725842623, 40.12512548739461, 35.312430579797535]])
+sram_leakage_power_table = np.array([
+	[2.42854, 3.54801, 5.61291, 11.4183, 23.084, 46.1475, 78.511, 171.338, 292.098, 530.104, 1173.47,
+	 2131.32, 4046.65, 7874.45, 15530.2],
+	[4.06907, 6.36693, 10.626, 21.734, 44.0492, 87.6308, 155.592, 324.812, 577.957, 1070.5, 2322.98,
+	 4306.92, 8273.83, 16200.9, 32055.2],
+	[5.90615, 9.34077, 15.7349, 32.1237, 65.0152, 129.268, 231.709, 478.67, 861.842, 1603.65, 3465.46,
+	 6453.81, 12424.1, 24354.4, 48215.4],
+	[2.69023, 4.27071, 7.21407, 14.7199, 29.8378, 59.7241, 106.782, 220.305, 396.275, 738.045, 1592.69,
+	 2969.55, 5718.32, 11211.1, 22196.8]])
+sram_dynamic_wpower_table = np.array([
+	[29.3559897079659, 29.713923128350277, 29.530313651210307, 25.06269706042524, 21.94130601547564,
+	 20.231697781658134, 21.454993708946155, 19.37077951002227, 20.48340313543494, 21.06338832333147,
+	 20.007023868974393, 20.658973707418422, 20.318119336830588, 18.301609401318288, 14.622542600538111],
+	[35.39851092395947, 35.331527619066925, 35.27583072378753, 30.257008996510823, 28.580154490478073,
+	 25.69427070302727, 27.232004710199497, 25.937265770163453, 26.75242923117652, 27.892681861309633,
+	 26.92143086207399, 28.002222347127162, 28.115886394768236, 26.403908745931517, 22.502559172211537],
+	[35.39851092395947, 35.331527619066925, 35.27583072378753, 30.257008996510823, 28.580154490478073,
+	 25.69427070302727, 27.232004710199497, 25.937265770163453, 26.75242923117652, 27.892681861309633,
+	 26.92143086207399, 28.002222347127162, 28.115886394768236, 26.403908745931517, 22.502559172211537],
+	[62.47828345243852, 62.466561175135844, 63.247021535501034, 53.59512980692658, 52.799359202307436,
+	 49.21837852434092, 52.83040146832812, 53.27702651853158, 55.388535979058624, 59.30383289275703,
+	 60.73959918114395, 64.24097242908681, 66.62819573136711, 66.19188635483901, 61.62546412363937]])
+dram_dynamic_rpower_table = np.array([
+	[5.681848876595699, 6.9811730309205275, 11.519467006258639, 8.10154645283615, 6.581302792658147,
+	 5.900831057759254, 5.725089599784555, 7.78228702489136, 7.480759423788605, 7.400832514933912,
+	 7.200510637177808, 7.753335479486354, 8.786647382482153, 8.959563134053493, 9.216515473798376],
+	[7.236587110619756, 8.707150015780643, 14.596740785106435, 17.136735119555528, 16.231649371927908,
+	 12.893354037630123, 12.045127437155477, 10.688682659298424, 10.29624937270162, 10.196571034059529,
+	 9.69737572047803, 11.936414739345064, 12.135244112283946, 12.452589307509026, 12.892932290091725],
+	[6.00413669478087, 10.443264794158491, 17.518400785966282, 20.306613107796057, 33.742406512473444,
+	 12.115899982438531, 13.870181710614307, 12.190883930115897, 10.291594768299696, 11.782946929021605,
+	 11.253307875894988, 14.095464361477127, 14.502955682673132, 15.029589041095893, 15.727820241175348],
+	[8.278404192149114, 14.261612256610029, 24.26827029012119, 28.076699764079873, 48.58402035645765,
+	 33.94574450749927, 29.87777535577492, 25.69488976589619, 26.32735142879692, 24.10225640040032,
+	 24.665088619910982, 25.958915613109475, 27.673132633122997, 33.60599015066913, 33.9591579033123]])
+dram_leakage_power_table = np.array([
+	[0.80335, 1.55197, 2.90346, 5.80693, 11.6139, 23.2277, 46.1862, 81.8447, 163.272, 326.543, 728.684,
+	 1306.17, 2582.94, 5165.88, 10331.8],
+	[1.61758, 3.13207, 5.88851, 11.5717, 21.4912, 42.9824, 85.9648, 170.404, 339.819, 679.638, 1476.06,
+	 2687.83, 5375.66, 10751.3, 21502.6],
+	[2.02492, 4.66081, 8.78423, 17.2699, 31.8008, 69.0798, 129.371, 256.446, 552.638, 1022.8, 2202.63,
+	 4046.17, 8092.34, 16184.7, 32369.4],
+	[0.93135, 2.14261, 4.03893, 7.94048, 14.6479, 29.2958, 58.5917, 117.183, 234.367, 466.596, 931.805,
+	 1863.61, 3727.22, 6915.89, 14845]])
+dram_dynamic_wpower_table = np.array([
+	[3.706883046022031, 3.921325418623195, 5.054852386203041, 3.9908753357560434, 3.7851853095769874,
+	 3.8453333860048495, 4.167187756509934, 4.911138366537072, 5.326949438806781, 5.74173116254764,
+	 6.119545690840774, 6.81240067654919, 7.396402439733693, 7.9164496786638, 8.462919213404739],
+	[5.27699161084737, 5.593601364333531, 7.639589728232387, 6.818362819272997, 7.883506280720917,
+	 6.937121414334673, 7.591702891372499, 7.296593325244988, 7.71822168107739, 8.19333640175923,
+	 8.405686722518405, 9.600735659072807, 10.402987161597224, 11.141248112537074, 11.936863723414977],
+	[5.181210213039781, 7.064149083904494, 9.78507719601658, 8.742072902805608, 11.789490799851796,
+	 6.817519206964049, 9.029084978228566, 8.517021276595743, 7.9714657263610675, 9.564827207786548,
+	 9.820295942720763, 11.438135493494391, 12.50739816329699, 13.503543378995435, 14.602981442044417],
+	[7.831898041136469, 10.770445086486584, 15.336791528950911, 14.213391345675653, 20.13615632388908,
+	 15.593317605050055, 16.433687291751003, 15.603024766149424, 18.464324091331296, 17.9898653003729,
+	 19.871953123298216, 22.13599430123531, 24.729953107531664, 28.518664298921703, 30.44195819387776]])
+
+
+def choice_index(choice, choice_list):
+	# map the component choices to the row index of the tables
+	choice = np.asarray(choice)
+	index = np.searchsorted(choice_list, choice)
+	assert np.all(index < len(choice_list)) and np.all(choice_list[np.minimum(index, len(choice_list)-1)] == choice), \
+		"Component choice is out of range"
+	return index
+
+def interpolate_table(value, point_list, table):
+	# linear interpolation along the characterized points (axis 0 of table), exact at the characterized points
+	# e.g. technology node or bitwidth, value out of the characterized range is clamped to the boundary points
+	value = np.clip(np.asarray(value, dtype = float), point_list[0], point_list[-1])
+	upper = np.clip(np.searchsorted(point_list, value, side = 'left'), 1, len(point_list)-1)
+	lower = upper - 1
+	weight = (value - point_list[lower]) / (point_list[upper] - point_list[lower])
+	weight = np.reshape(weight, np.shape(weight) + (1,) * (np.ndim(table) - 1))
+	return (1 - weight) * table[lower] + weight * table[upper]
+
+def interpolate_capacity(size, data):
+	# vectorized version of Buffer.LinearCaculate
+	# data: (..., #points) power sampled at the capacity points, size: capacity (broadcast with data[..., 0])
+	size = np.asarray(size, dtype = float)
+	data = np.asarray(data, dtype = float)
+	lower_bound = np.floor(size / 2048) - 1
+	index = np.clip(lower_bound, 0, data.shape[-1]-2).astype(int)
+	lower_data = np.take_along_axis(data, index[..., np.newaxis], axis = -1)[..., 0] if data.ndim > 1 else data[index]
+	upper_data = np.take_along_axis(data, index[..., np.newaxis] + 1, axis = -1)[..., 0] if data.ndim > 1 else data[index+1]
+	base = 2048 * 2.0**index
+	power = (size - base) / base * (upper_data - lower_data) + lower_data
+	return np.where(lower_bound < 0, data[..., 0] / 2048 * size, power)
+
+
+def calculate_ADC_table(quantity, ADC_choice):
+	index = choice_index(ADC_choice, ADC_choice_list)
+	table = {'area': ADC_area_table, 'precision': ADC_precision_table,
+			 'power': ADC_power_table, 'sample_rate': ADC_sample_rate_table}
+	return table[quantity][index]
+
+def calculate_DAC_table(quantity, DAC_choice):
+	index = choice_index(DAC_choice, DAC_choice_list)
+	table = {'area': DAC_area_table, 'precision': DAC_precision_table, 'power': DAC_power_table}
+	return table[quantity][index]
+
+def calculate_adder_table(quantity, adder_tech, adder_bitwidth):
+	# the area is evaluated from its analytic formula (quadratic in technology), the power is interpolated
+	if quantity == 'area':
+		adder_tech = np.clip(np.asarray(adder_tech, dtype = float), adder_tech_list[0], adder_tech_list[-1])
+		return adder_area_coefficient * adder_tech**2 * np.asarray(adder_bitwidth)
+	table = {'power': adder_power_table}
+	return interpolate_table(adder_tech, adder_tech_list, table[quantity]) * np.asarray(adder_bitwidth)
+
+def calculate_shiftreg_table(quantity, shiftreg_tech, max_shiftbase):
+	table = {'area': shiftreg_area_table, 'power': shiftreg_power_table}
+	return interpolate_table(max_shiftbase, shiftreg_base_list, table[quantity]) * (np.asarray(shiftreg_tech) / 65)**2
+
+def calculate_jointmodule_table(quantity, jointmodule_tech, jointmodule_bit):
+	table = {'area': jointmodule_area_table, 'power': jointmodule_power_table}
+	return interpolate_table(jointmodule_bit, jointmodule_bit_list, table[quantity]) * (np.asarray(jointmodule_tech) / 65)**2
+
+def calculate_Pooling_table(quantity, Pooling_Tech, Pooling_unit_num):
+	# area and power scale with the square of technology and linearly with the pooling unit number
+	if quantity == 'latency':
+		return Pooling_latency_base * np.ones(np.shape(Pooling_Tech))
+	base = {'area': Pooling_area_base, 'power': Pooling_power_base}
+	return base[quantity] * (np.asarray(Pooling_Tech) / 65)**2 * np.asarray(Pooling_unit_num) / 64
+
+def calculate_buffer_table(quantity, buf_choice, buf_Tech, buf_Size):
+	# buf_choice: 1: SRAM, 2: DRAM
+	# area unit: um^2, power unit: mW
+	buf_choice = np.asarray(buf_choice)
+	assert np.all(np.isin(buf_choice, [1, 2])), "Buffer choice must be 1 (SRAM) or 2 (DRAM)"
+	table = {'area': (sram_area_param_table, dram_area_param_table),
+			 'dynamic_rpower': (sram_dynamic_rpower_table, dram_dynamic_rpower_table),
+			 'dynamic_wpower': (sram_dynamic_wpower_table, dram_dynamic_wpower_table),
+			 'leakage_power': (sram_leakage_power_table, dram_leakage_power_table)}
+	sram_data = interpolate_table(buf_Tech, buf_tech_list, table[quantity][0])
+	dram_data = interpolate_table(buf_Tech, buf_tech_list, table[quantity][1])
+	data = np.where((buf_choice == 1)[..., np.newaxis], sram_data, dram_data)
+	if quantity == 'area':
+		return (np.asarray(buf_Size) * data[..., 0] + data[..., 1]) * 1e6
+	return interpolate_capacity(buf_Size, data)
+
+component_table_dict = {
+	'ADC': calculate_ADC_table,
+	'DAC': calculate_DAC_table,
+	'adder': calculate_adder_table,
+	'shiftreg': calculate_shiftreg_table,
+	'jointmodule': calculate_jointmodule_table,
+	'Pooling': calculate_Pooling_table,
+	'buffer': calculate_buffer_table
+}
+
+@functools.lru_cache(maxsize = 256)
+def component_lookup(component, quantity, *params):
+	# memoized scalar query, e.g. component_lookup('buffer', 'leakage_power', 1, 22, 16)
+	assert component in component_table_dict, "Unknown component: " + str(component)
+	return component_table_dict[component](quantity, *params).item()
+
+
+def component_library_test():
+	print("ADC power:", component_lookup('ADC', 'power', 2), "W")
+	print("DAC area:", component_lookup('DAC', 'area', 1), "um^2")
+	print("adder power (65nm, 8bit):", component_lookup('adder', 'power', 65, 8), "W")
+	print("buffer leakage power (SRAM, 28nm, 16KB):", component_lookup('buffer', 'leakage_power', 1, 28, 16), "mW")
+	print("buffer read power over capacity (SRAM, 22nm):",
+		  calculate_buffer_table('dynamic_rpower', 1, 22, np.array([16, 4096, 65536])), "mW")
+
+
+if __name__ == '__main__':
+	component_library_test()
@@ -197,9 +197,46 @@ class crossbar(device):
 			if self.cell_type[0] == '0':
 				temp_matrix = np.ones((self.xbar_num_read_row, self.xbar_column-self.xbar_num_read_column)) / self.device_resistance[0]
 				# print("temp_matrix",temp_matrix.T)
-				# print("temp_vector",temp_v2[0:self.xbar_num_read_column])
-				# print("unused power", 0.25* (temp_matrix.T.dot(temp_v2[0:self.xbar_num_read_column])).sum())
-				self.xbar_read_power += 0.25* (temp_matrix.T.dot(temp_v2[0:self.xbar_num_read_column])).sum()
+				# print("temp_vector",temp_v2[0:self.xbar_num_read_row])
+				# print("unused power", 0.25* (temp_matrix.T.dot(temp_v2[0:self.xbar_num_read_row])).sum())
+				self.xbar_read_power += 0.25* (temp_matrix.T.dot(temp_v2[0:self.xbar_num_read_row])).sum()
+					# the unselected columns are driven by the occupied rows (the first xbar_num_read_row voltages)
+
+	def calculate_xbar_read_power_batch(self, read_row = None, read_column = None, read_matrix = None, read_vector = None):
+		# unit: W
+		# batched version of calculate_xbar_read_power, the configuration of this crossbar is used as the template
+		# read_row and read_column are arrays with the length of #crossbars (occupied sizes in each crossbar)
+		# read_matrix is a (#crossbars x xbar_row x xbar_column) array of cell conductance (estimation level)
+		# read_vector is a (#crossbars x xbar_row x 1) array of read voltages (estimation level)
+		# return: an array with the read power of each crossbar
+		if self.xbar_simulation_level == 0:
+			assert (read_row is not None) and (read_column is not None), "read_row and read_column are required"
+			read_row = np.asarray(read_row, dtype = float)
+			read_column = np.asarray(read_column, dtype = float)
+			assert read_row.shape == read_column.shape, "read_row and read_column must be equal in length"
+			assert (read_row * read_column <= self.xbar_row * self.xbar_column).all(), "Crossbar usage utilization rate > 1"
+			self.calculate_device_read_power()
+			xbar_read_power = read_row * read_column * self.device_read_power
+			if self.cell_type[0] == '0':
+				self.calculate_device_read_power(self.device_resistance[0])
+				xbar_read_power += 0.25 * read_row * (self.xbar_column - read_column) * self.device_read_power
+		else:
+			read_matrix = np.asarray(read_matrix, dtype = float)
+			read_vector = np.asarray(read_vector, dtype = float).reshape(read_matrix.shape[0], self.xbar_row)
+			temp_v2 = read_vector * read_vector
+			xbar_read_power = np.einsum('nrc,nr->n', read_matrix, temp_v2)
+			if self.cell_type[0] == '0':
+				# the unselected columns of each crossbar are driven by the occupied rows
+				if read_row is None:
+					read_row = np.full(read_matrix.shape[0], self.xbar_row)
+				if read_column is None:
+					read_column = np.full(read_matrix.shape[0], self.xbar_column)
+				read_row = np.asarray(read_row)
+				read_column = np.asarray(read_column)
+				row_mask = np.arange(self.xbar_row)[np.newaxis, :] < read_row[:, np.newaxis]
+				xbar_read_power += 0.25 * (self.xbar_column - read_column) / self.device_resistance[0] \
+								   * (temp_v2 * row_mask).sum(axis = 1)
+		return xbar_read_power
 
 	def calculate_xbar_write_power(self):
 		# unit: W
@@ -244,7 +281,17 @@ class crossbar(device):
 		print("crossbar_write_latency:", self.xbar_write_latency, "ns")
 		print("crossbar_write_energy:", self.xbar_write_energy, "nJ")
 
-	
+
+def segment_sum(value, segment_id, segment_num = None):
+	# sum the values which belong to the same segment (e.g., crossbars -> PE, PE -> tile, tile -> layer)
+	# segment_id: the segment index of each value, segment_num: the total number of segments
+	value = np.asarray(value, dtype = float)
+	segment_id = np.asarray(segment_id, dtype = int)
+	if segment_num is None:
+		segment_num = segment_id.max() + 1 if len(segment_id) > 0 else 0
+	return np.bincount(segment_id, weights = value, minlength = segment_num)
+
+
 def xbar_test():
 	print("load file:",test_SimConfig_path)
 	_xbar = crossbar(test_SimConfig_path)
@@ -3,6 +3,7 @@
 import configparser as cp
 import os
 import math
+from MNSIM.Hardware_Model.Component_library import component_lookup
 test_SimConfig_path = os.path.join(os.path.dirname(os.path.dirname(os.getcwd())),"SimConfig.ini")
 	#Default SimConfig file path: MNSIM_Python/SimConfig.ini
 
@@ -28,43 +29,22 @@ class DAC(object):
 	def calculate_DAC_area(self):
 		#unit: um^2
 		#Data reference: ISAAC: A Convolutional Neural Network Accelerator with In-Situ Analog Arithmetic in Crossbars
-		DAC_area_dict = {1: 0.166, #1-bit
-						 2: 0.332, #2-bit
-						 3: 0.664, #3-bit
-						 4: 1.328, #4-bit
-						 5: 5.312, #6-bit
-						 6: 21.248 #8-bit
-		}
 		if self.DAC_choice != -1:
 			assert self.DAC_choice in [1,2,3,4,5,6]
-			self.DAC_area = DAC_area_dict[self.DAC_choice]
+			self.DAC_area = component_lookup('DAC', 'area', self.DAC_choice)
 
 	def calculate_DAC_precision(self):
 		#Data reference: ISAAC: A Convolutional Neural Network Accelerator with In-Situ Analog Arithmetic in Crossbars
-		DAC_precision_dict = {1: 1, #1-bit
-						 2: 2, #2-bit
-						 3: 3, #3-bit
-						 4: 4, #4-bit
-						 5: 6, #6-bit
-						 6: 8 #8-bit
-		}
 		if self.DAC_choice != -1:
 			assert self.DAC_choice in [1,2,3,4,5,6]
-			self.DAC_precision = DAC_precision_dict[self.DAC_choice]
+			self.DAC_precision = component_lookup('DAC', 'precision', self.DAC_choice)
 
 	def calculate_DAC_power(self):
 		#unit: W
 		#Data reference: ISAAC: A Convolutional Neural Network Accelerator with In-Situ Analog Arithmetic in Crossbars
-		DAC_power_dict = {1: 0.0039*1e-3, #1-bit
-						 2: 0.0078*1e-3, #2-bit
-						 3: 0.0156*1e-3, #3-bit
-						 4: 0.0312*1e-3, #4-bit
-						 5: 0.1248*1e-3, #6-bit
-						 6: 0.4992 #8-bit
-		}
 		if self.DAC_choice != -1:
 			assert self.DAC_choice in [1,2,3,4,5,6]
-			self.DAC_power = DAC_power_dict[self.DAC_choice]
+			self.DAC_power = component_lookup('DAC', 'power', self.DAC_choice)
 
 	def calculate_DAC_sample_rate(self):
 		# unit: GSamples/s
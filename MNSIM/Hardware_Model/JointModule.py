@@ -3,6 +3,7 @@
 import configparser as cp
 import os
 import math
+from MNSIM.Hardware_Model.Component_library import component_lookup
 test_SimConfig_path = os.path.join(os.path.dirname(os.path.dirname(os.getcwd())),"SimConfig.ini")
     #Default SimConfig file path: MNSIM_Python/SimConfig.ini
 
@@ -32,36 +33,12 @@ class JointModule(object):
     def calculate_jointmodule_power(self):
         # unit: W
         if self.jointmodule_power == 0:
-            jointmodule_power_dict = {4: 1.39e-4,
-                               8: 2.64e-4,
-                               12: 3.67e-4,
-                               16: 4.97e-4
-                               }
-            if self.jointmodule_bit <= 4:
-                self.jointmodule_power = jointmodule_power_dict[4]*pow((self.jointmodule_tech/65),2)
-            elif self.jointmodule_bit <= 8:
-                self.jointmodule_power = jointmodule_power_dict[8] * pow((self.jointmodule_tech / 65), 2)
-            elif self.jointmodule_bit <= 12:
-                self.jointmodule_power = jointmodule_power_dict[12] * pow((self.jointmodule_tech / 65), 2)
-            else:
-                self.jointmodule_power = jointmodule_power_dict[16] * pow((self.jointmodule_tech / 65), 2)
+            self.jointmodule_power = component_lookup('jointmodule', 'power', self.jointmodule_tech, self.jointmodule_bit)
 
     def calculate_jointmodule_area(self):
         # unit: um^2
         if self.jointmodule_area == 0:
-            jointmodule_area_dict = {4: 182.88,
-                               8: 353.76,
-                               12: 385.44,
-                               16: 512.16
-                               }
-            if self.jointmodule_bit <= 4:
-                self.jointmodule_area = jointmodule_area_dict[4]*pow((self.jointmodule_tech/65),2)
-            elif self.jointmodule_bit <= 8:
-                self.jointmodule_area = jointmodule_area_dict[8] * pow((self.jointmodule_tech / 65), 2)
-            elif self.jointmodule_bit <= 12:
-                self.jointmodule_area = jointmodule_area_dict[12] * pow((self.jointmodule_tech / 65), 2)
-            else:
-                self.jointmodule_area = jointmodule_area_dict[16] * pow((self.jointmodule_tech / 65), 2)
+            self.jointmodule_area = component_lookup('jointmodule', 'area', self.jointmodule_tech, self.jointmodule_bit)
 
     def calculate_jointmodule_energy(self):
         assert self.jointmodule_power >= 0
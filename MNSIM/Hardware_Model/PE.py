@@ -494,7 +494,7 @@ class ProcessElement(crossbar, DAC, ADC):
 		# TODO: PipeLine optimization
 		# ignore the latency of MUX and DEMUX
 		self.PE_read_latency = self.PE_xbar_read_latency + self.PE_ADC_read_latency\
-							   + self.PE_DAC_read_latency + self.PE_digital_read_latency
+							   + self.PE_DAC_read_latency + self.PE_digital_read_latency'''
 
 	def calculate_PE_write_latency(self):
 		# Notice: before calculating latency, PE_write_config must be executed
@@ -521,7 +521,7 @@ class ProcessElement(crossbar, DAC, ADC):
 										+ self.PE_adder_write_latency + self.PE_shiftreg_write_latency
 		# TODO: PipeLine optimization
 		self.PE_write_latency = self.PE_xbar_write_latency + self.PE_ADC_write_latency\
-								+ self.PE_DAC_write_latency + self.PE_digital_write_latency'''
+								+ self.PE_DAC_write_latency + self.PE_digital_write_latency
 
 	def calculate_demux_power(self):
 		transistor_power = 10*1.2/1e9
@@ -607,9 +607,29 @@ class ProcessElement(crossbar, DAC, ADC):
 		self.PE_digital_read_power = self.input_demux_read_power + self.output_mux_read_power + self.PE_adder_read_power + self.PE_shiftreg_read_power + self.PE_iReg_read_power
 		self.PE_read_power = self.PE_xbar_read_power + self.PE_DAC_read_power + self.PE_ADC_read_power + self.PE_digital_read_power
 
-	def calculate_PE_read_power(self):
+	def PE_xbar_read_stack(self):
+		# collect the read configurations of all enabled crossbars in this PE (group-major order)
+		# return: read_row, read_column (1D arrays), read_matrix and read_vector (stacked arrays, None in behavior level)
+		enabled_xbar = []
+		for i in range(self.group_num):
+			for j in range(self.PE_multiplex_xbar_num[1]):
+				if self.PE_xbar_enable[i][j] == 1:
+					enabled_xbar.append(self.PE_xbar_list[i][j])
+		read_row = np.array([__xbar.xbar_num_read_row for __xbar in enabled_xbar], dtype = float)
+		read_column = np.array([__xbar.xbar_num_read_column for __xbar in enabled_xbar], dtype = float)
+		if self.PE_simulation_level == 0:
+			return read_row, read_column, None, None
+		read_matrix = np.zeros((len(enabled_xbar), self.xbar_row, self.xbar_column))
+		read_vector = np.zeros((len(enabled_xbar), self.xbar_row, 1))
+		for i, __xbar in enumerate(enabled_xbar):
+			read_matrix[i] = __xbar.xbar_read_matrix
+			read_vector[i] = __xbar.xbar_read_vector
+		return read_row, read_column, read_matrix, read_vector
+
+	def calculate_PE_read_power(self, xbar_read_power = None):
 		# unit: W
 		# Notice: before calculating latency, PE_read_config must be executed
+		# xbar_read_power: the summed read power of the enabled crossbars, computed in batch if None
 		self.calculate_DAC_power()
 		self.calculate_ADC_power()
 		self.calculate_demux_power()
@@ -628,16 +648,12 @@ class ProcessElement(crossbar, DAC, ADC):
 		self.PE_digital_read_power = 0
 		self.PE_max_occupied_column = 0
 		if self.num_occupied_group != 0:
+			if xbar_read_power is None:
+				read_row, read_column, read_matrix, read_vector = self.PE_xbar_read_stack()
+				xbar_read_power = self.calculate_xbar_read_power_batch(read_row, read_column, read_matrix, read_vector).sum()
+			self.PE_xbar_read_power = xbar_read_power/self.input_demux/self.output_mux
 			for i in range(self.group_num):
 				if self.PE_xbar_enable[i][0] == 1:
-					if self.PE_multiplex_xbar_num[1] == 1:
-						self.PE_xbar_list[i][0].calculate_xbar_read_power()
-						self.PE_xbar_read_power += self.PE_xbar_list[i][0].xbar_read_power/self.input_demux/self.output_mux
-					else:
-						self.PE_xbar_list[i][0].calculate_xbar_read_power()
-						self.PE_xbar_read_power += self.PE_xbar_list[i][0].xbar_read_power/self.input_demux/self.output_mux
-						self.PE_xbar_list[i][1].calculate_xbar_read_power()
-						self.PE_xbar_read_power += self.PE_xbar_list[i][1].xbar_read_power/self.input_demux/self.output_mux
 					self.PE_DAC_read_power += math.ceil(self.PE_xbar_list[i][0].xbar_num_read_row/self.input_demux)*self.DAC_power
 					self.PE_ADC_read_power += math.ceil(self.PE_xbar_list[i][0].xbar_num_read_column/self.output_mux)*self.ADC_power
 					self.PE_iReg_read_power += math.ceil(self.PE_xbar_list[i][0].xbar_num_read_row/self.input_demux)*self.PE_iReg.shiftreg_power
@@ -652,7 +668,7 @@ class ProcessElement(crossbar, DAC, ADC):
 			self.PE_digital_read_power = self.input_demux_read_power + self.output_mux_read_power + self.PE_adder_read_power + self.PE_shiftreg_read_power + self.PE_iReg_read_power
 			self.PE_read_power = self.PE_xbar_read_power + self.PE_DAC_read_power + self.PE_ADC_read_power + self.PE_digital_read_power
 
-	'''def calculate_PE_write_power(self):
+	def calculate_PE_write_power(self):
 		# unit: W
 		# Notice: before calculating latency, PE_write_config must be executed
 		self.calculate_DAC_power()
@@ -683,10 +699,10 @@ class ProcessElement(crossbar, DAC, ADC):
 					self.PE_ADC_write_power += 0
 					# Assume ADCs are idle in write process
 					self.input_demux_write_power += math.ceil(self.PE_xbar_list[i][0].xbar_num_write_row/self.input_demux)*self.input_demux_power
-			self.PE_digital_write_power = self.input_demux_write_power + self.output_mux_read_power + self.PE_adder_read_power + self.PE_shiftreg_read_power
+			self.PE_digital_write_power = self.input_demux_write_power + self.output_mux_write_power + self.PE_adder_write_power + self.PE_shiftreg_write_power
 			self.PE_write_power = self.PE_xbar_write_power + self.PE_DAC_write_power + self.PE_ADC_write_power + self.PE_digital_write_power
 
-	def calculate_PE_read_energy(self):
+	'''def calculate_PE_read_energy(self):
 		# unit: nJ
 		# Notice: before calculating energy, PE_read_config and calculate_PE_read_power must be executed
 		self.PE_xbar_read_energy = self.PE_xbar_read_latency * self.PE_xbar_read_power
@@ -698,7 +714,7 @@ class ProcessElement(crossbar, DAC, ADC):
 		self.output_mux_read_energy = self.output_mux_read_power * self.output_mux_read_latency
 		self.PE_digital_read_energy = self.PE_adder_read_energy + self.PE_shiftreg_read_energy + self.input_demux_read_energy + self.output_mux_read_energy
 		self.PE_read_energy = self.PE_xbar_read_energy + self.PE_DAC_read_energy + \
-							  self.PE_ADC_read_energy + self.PE_digital_read_energy
+							  self.PE_ADC_read_energy + self.PE_digital_read_energy'''
 
 	def calculate_PE_write_energy(self):
 		# unit: nJ
@@ -712,7 +728,7 @@ class ProcessElement(crossbar, DAC, ADC):
 		self.output_mux_write_energy = self.output_mux_write_latency * self.output_mux_write_power
 		self.PE_digital_write_energy = self.PE_adder_write_energy + self.PE_shiftreg_write_energy + self.input_demux_write_energy + self.output_mux_write_energy
 		self.PE_write_energy = self.PE_xbar_write_energy + self.PE_DAC_write_energy + \
-							  self.PE_ADC_write_energy + self.PE_digital_write_energy'''
+							  self.PE_ADC_write_energy + self.PE_digital_write_energy
 
 	def PE_output(self):
 		print("---------------------Crossbar Configurations-----------------------")
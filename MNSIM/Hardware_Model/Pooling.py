@@ -3,6 +3,7 @@
 import configparser as cp
 import os
 import math
+from MNSIM.Hardware_Model.Component_library import component_lookup
 test_SimConfig_path = os.path.join(os.path.dirname(os.path.dirname(os.getcwd())),"SimConfig.ini")
 
 class Pooling(object):
@@ -32,50 +33,16 @@ class Pooling(object):
 
     def calculate_Pooling_area(self):
         # unit um^2 Technology & pooling size & unit num
-        Pooling_area_dict = {
-            65: {
-                9: {
-                   64:  83834
-                }
-            }
-        }
-        if self.Pooling_Tech in [65]:
-            if self.Pooling_size in [9]:
-                ''' 线性插值 '''
-                self.Pooling_area = Pooling_area_dict[self.Pooling_Tech][self.Pooling_size][self.Pooling_unit_num]
-        else:
-            self.Pooling_area = Pooling_area_dict[65][9][64] * pow((self.Pooling_Tech/65),2)
-
+        # characterized with 3x3 pooling and 64 units in 65nm, scaled with technology and unit number
+        self.Pooling_area = component_lookup('Pooling', 'area', self.Pooling_Tech, self.Pooling_unit_num)
 
     def calculate_Pooling_power(self):
         # Unit : W
-        Pooling_power_dict = {
-            65: {
-                9: {
-                   64:  18.72*1e-3
-                }
-            }
-        }
-        if self.Pooling_Tech in [65]:
-            if self.Pooling_size in [9]:
-                ''' 线性插值 '''
-                self.Pooling_power = Pooling_power_dict[self.Pooling_Tech][self.Pooling_size][self.Pooling_unit_num]
-        else:
-            self.Pooling_power = Pooling_power_dict[65][9][64] * pow((self.Pooling_Tech/65),2)
+        self.Pooling_power = component_lookup('Pooling', 'power', self.Pooling_Tech, self.Pooling_unit_num)
 
     def calculate_Pooling_latency(self):
         # Unit: ns
-        Pooling_latency_dict = {
-            65: {
-                9: {
-                    64: 10
-                }
-            }
-        }
-        if self.Pooling_Tech in [65]:
-            if self.Pooling_size in [9]:
-                ''' 线性插值 '''
-                self.Pooling_latency = Pooling_latency_dict[self.Pooling_Tech][self.Pooling_size][self.Pooling_unit_num]
+        self.Pooling_latency = component_lookup('Pooling', 'latency', self.Pooling_Tech, self.Pooling_unit_num)
 
     def calculate_Pooling_energy(self):
         #unit mW
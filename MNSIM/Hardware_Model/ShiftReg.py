@@ -3,6 +3,7 @@
 import configparser as cp
 import os
 import math
+from MNSIM.Hardware_Model.Component_library import component_lookup
 test_SimConfig_path = os.path.join(os.path.dirname(os.path.dirname(os.getcwd())),"SimConfig.ini")
 	#Default SimConfig file path: MNSIM_Python/SimConfig.ini
 
@@ -34,33 +35,13 @@ class shiftreg(object):
 	def calculate_shiftreg_area(self):
 		# unit: um^2
 		if self.shiftreg_area == 0:
-			shiftreg_area_dict = {
-				4: 228.96,
-				8: 217.44,
-				16:230.40
-			}
-			if self.max_shiftbase <= 4:
-				self.shiftreg_area = shiftreg_area_dict[4]*pow((self.shiftreg_tech/65),2)
-			elif self.max_shiftbase <= 8:
-				self.shiftreg_area = shiftreg_area_dict[8]*pow((self.shiftreg_tech/65),2)
-			else:
-				self.shiftreg_area = shiftreg_area_dict[16]*pow((self.shiftreg_tech/65),2)
+			self.shiftreg_area = component_lookup('shiftreg', 'area', self.shiftreg_tech, self.max_shiftbase)
 
 
 	def calculate_shiftreg_power(self):
 		# unit: W
 		if self.shiftreg_power == 0:
-			shiftreg_power_dict = {
-				4: 2.13e-4,
-				8: 1.97e-4,
-				16: 1.24e-4
-			}
-			if self.max_shiftbase <= 4:
-				self.shiftreg_power = shiftreg_power_dict[4]*pow((self.shiftreg_tech/65),2)
-			elif self.max_shiftbase <= 8:
-				self.shiftreg_power = shiftreg_power_dict[8]*pow((self.shiftreg_tech/65),2)
-			else:
-				self.shiftreg_power = shiftreg_power_dict[16]*pow((self.shiftreg_tech/65),2)
+			self.shiftreg_power = component_lookup('shiftreg', 'power', self.shiftreg_tech, self.max_shiftbase)
 
 
 	def calculate_shiftreg_energy(self):
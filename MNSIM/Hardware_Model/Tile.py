@@ -3,9 +3,12 @@
 import configparser as cp
 import os
 import math
+import collections
+import hashlib
 from numpy import *
 import numpy as np
 from MNSIM.Hardware_Model.PE import ProcessElement
+from MNSIM.Hardware_Model.Crossbar import segment_sum
 from MNSIM.Hardware_Model.Adder import adder
 from MNSIM.Hardware_Model.Buffer import buffer
 from MNSIM.Hardware_Model.ShiftReg import shiftreg
@@ -14,6 +17,13 @@ from MNSIM.Hardware_Model.Pooling import Pooling
 test_SimConfig_path = os.path.join(os.path.dirname(os.path.dirname(os.getcwd())),"SimConfig.ini")
 # Default SimConfig file path: MNSIM_Python/SimConfig.ini
 
+layer_type_code = {'conv': 0, 'fc': 1, 'pooling': 2}
+	# the type code of each layer used in the columnar (array) estimations
+tile_power_record = collections.namedtuple('tile_power_record',
+	['total', 'xbar', 'ADC', 'DAC', 'digital', 'adder', 'shiftreg', 'iReg', 'input_demux', 'output_mux',
+	 'jointmodule', 'pooling', 'buffer', 'buffer_r', 'buffer_w'])
+	# immutable read power breakdown of one tile, unit: W
+
 
 class tile(ProcessElement):
 	def __init__(self, SimConfig_path):
@@ -245,6 +255,154 @@ class tile(ProcessElement):
 		self.tile_read_power = self.tile_xbar_read_power+self.tile_ADC_read_power+self.tile_DAC_read_power+\
 							   self.tile_digital_read_power+self.tile_pooling_read_power+self.tile_buffer_read_power
 
+	def calculate_tile_read_power_columnar(self, max_column, max_row, max_PE, max_group, layer_type):
+		# columnar version of calculate_tile_read_power_fast, all the arguments are arrays (one element per layer)
+		# layer_type: type code of each layer, 0: conv, 1: fc, 2: pooling (see layer_type_code)
+		# return: an OrderedDict of the tile read power of each component (arrays), unit: W
+		max_column = np.asarray(max_column, dtype = float)
+		max_row = np.asarray(max_row, dtype = float)
+		max_PE = np.asarray(max_PE, dtype = float)
+		max_group = np.asarray(max_group, dtype = float)
+		layer_type = np.asarray(layer_type)
+		# per-config constants
+		self.calculate_DAC_power()
+		self.calculate_ADC_power()
+		self.calculate_demux_power()
+		self.calculate_mux_power()
+		self.PE_shiftreg.calculate_shiftreg_power()
+		self.PE_iReg.calculate_shiftreg_power()
+		self.PE_adder.calculate_adder_power()
+		self.tile_pooling.calculate_Pooling_power()
+		self.tile_buffer.calculate_buf_read_power()
+		self.tile_buffer.calculate_buf_write_power()
+		if self.xbar_simulation_level == 0:
+			xbar_read_power = self.calculate_xbar_read_power_batch(max_row, max_column)
+		else:
+			# the fast estimation uses the default read matrix/vector in estimation level
+			self.xbar_read_config()
+			self.calculate_xbar_read_power()
+			xbar_read_power = self.xbar_read_power * np.ones(max_row.shape)
+		is_xbar_layer = (layer_type == layer_type_code['conv']) | (layer_type == layer_type_code['fc'])
+		row_num = np.ceil(max_row/self.input_demux)
+		column_num = np.ceil(max_column/self.output_mux)
+		tile_power = collections.OrderedDict()
+		tile_power['xbar'] = max_PE*self.PE_multiplex_xbar_num[1]*max_group*xbar_read_power/self.input_demux/self.output_mux
+		tile_power['DAC'] = max_PE*max_group*row_num*self.DAC_power
+		tile_power['ADC'] = max_PE*max_group*column_num*self.ADC_power
+		tile_power['input_demux'] = max_PE*max_group*row_num*self.input_demux_power
+		tile_power['output_mux'] = max_PE*max_group*column_num*self.output_mux_power
+		tile_power['adder'] = max_PE*(max_group-1)*column_num*self.PE_adder.adder_power
+		tile_power['shiftreg'] = max_PE*max_group*column_num*self.PE_shiftreg.shiftreg_power
+		tile_power['iReg'] = max_PE*max_group*row_num*self.PE_iReg.shiftreg_power
+		tile_power['jointmodule'] = (max_PE-1)*column_num*self.tile_jointmodule.jointmodule_power
+		for key in tile_power.keys():
+			tile_power[key] = np.where(is_xbar_layer, tile_power[key], 0)
+		tile_power['pooling'] = np.where(layer_type == layer_type_code['pooling'], self.tile_pooling.Pooling_power, 0)
+		tile_power['buffer_r'] = self.tile_buffer.buf_rpower*1e-3 * np.ones(max_row.shape)
+		tile_power['buffer_w'] = self.tile_buffer.buf_wpower*1e-3 * np.ones(max_row.shape)
+		tile_power['buffer'] = tile_power['buffer_r'] + tile_power['buffer_w']
+		tile_power['digital'] = tile_power['adder'] + tile_power['shiftreg'] + tile_power['iReg'] \
+								+ tile_power['input_demux'] + tile_power['output_mux'] + tile_power['jointmodule']
+		tile_power['total'] = tile_power['xbar'] + tile_power['ADC'] + tile_power['DAC'] + tile_power['digital'] \
+							  + tile_power['pooling'] + tile_power['buffer']
+		return tile_power
+
+	def get_tile_read_power_record(self):
+		# pack the current tile read power into an immutable record
+		# Notice: calculate_tile_read_power or calculate_tile_read_power_fast must be executed before
+		return tile_power_record(total = self.tile_read_power, xbar = self.tile_xbar_read_power,
+								 ADC = self.tile_ADC_read_power, DAC = self.tile_DAC_read_power,
+								 digital = self.tile_digital_read_power, adder = self.tile_adder_read_power,
+								 shiftreg = self.tile_shiftreg_read_power, iReg = self.tile_iReg_read_power,
+								 input_demux = self.tile_input_demux_read_power, output_mux = self.tile_output_mux_read_power,
+								 jointmodule = self.tile_jointmodule_read_power, pooling = self.tile_pooling_read_power,
+								 buffer = self.tile_buffer_read_power, buffer_r = self.tile_buffer_r_read_power,
+								 buffer_w = self.tile_buffer_w_read_power)
+
+	def calculate_tile_read_power_occupancy(self, read_row, read_column):
+		# array version of tile_read_config + calculate_tile_read_power, no PE/crossbar object is configured
+		# read_row and read_column are (#tiles x #PEs in one tile x #groups in one PE) arrays of the occupied
+		# rows/columns of each crossbar, 0 means the PE/group is not occupied
+		# return: an OrderedDict of the read power of each tile (arrays with the length of #tiles), unit: W
+		read_row = np.asarray(read_row, dtype = float)
+		read_column = np.asarray(read_column, dtype = float)
+		group_enable = read_row > 0
+		PE_group_num = group_enable.sum(axis = 2)
+		occupied_PE_num = (PE_group_num > 0).sum(axis = 1)
+		# per-config constants
+		self.calculate_DAC_power()
+		self.calculate_ADC_power()
+		self.calculate_demux_power()
+		self.calculate_mux_power()
+		self.PE_shiftreg.calculate_shiftreg_power()
+		self.PE_iReg.calculate_shiftreg_power()
+		self.PE_adder.calculate_adder_power()
+		self.tile_buffer.calculate_buf_read_power()
+		self.tile_buffer.calculate_buf_write_power()
+		if self.xbar_simulation_level == 0:
+			xbar_read_power = self.calculate_xbar_read_power_batch(read_row.ravel(), read_column.ravel()).reshape(read_row.shape)
+		else:
+			# only the occupancy is known, the default read matrix/vector is used in estimation level
+			self.xbar_read_config()
+			self.calculate_xbar_read_power()
+			xbar_read_power = self.xbar_read_power * np.ones(read_row.shape)
+		xbar_read_power = np.where(group_enable, xbar_read_power, 0)
+		row_num = np.ceil(read_row/self.input_demux)
+		column_num = np.ceil(read_column/self.output_mux)
+		PE_max_column = read_column.max(axis = 2)
+		tile_max_column = np.minimum(PE_max_column.max(axis = 1), self.PE_ADC_num)
+		tile_power = collections.OrderedDict()
+		tile_power['xbar'] = self.PE_multiplex_xbar_num[1]*xbar_read_power.sum(axis = (1, 2))/self.input_demux/self.output_mux
+		tile_power['DAC'] = row_num.sum(axis = (1, 2))*self.DAC_power
+		tile_power['ADC'] = column_num.sum(axis = (1, 2))*self.ADC_power
+		tile_power['input_demux'] = row_num.sum(axis = (1, 2))*self.input_demux_power
+		tile_power['output_mux'] = column_num.sum(axis = (1, 2))*self.output_mux_power
+		tile_power['adder'] = (np.maximum(PE_group_num-1, 0)*PE_max_column/self.output_mux).sum(axis = 1)*self.PE_adder.adder_power
+		tile_power['shiftreg'] = (PE_group_num*PE_max_column/self.output_mux).sum(axis = 1)*self.PE_shiftreg.shiftreg_power
+		tile_power['iReg'] = row_num.sum(axis = (1, 2))*self.PE_iReg.shiftreg_power
+		tile_power['jointmodule'] = np.maximum(occupied_PE_num-1, 0)*np.ceil(tile_max_column/self.output_mux)*self.tile_jointmodule.jointmodule_power
+		tile_power['pooling'] = np.zeros(occupied_PE_num.shape)
+		tile_power['buffer_r'] = np.where(occupied_PE_num > 0, self.tile_buffer.buf_rpower*1e-3, 0)
+		tile_power['buffer_w'] = np.where(occupied_PE_num > 0, self.tile_buffer.buf_wpower*1e-3, 0)
+		tile_power['buffer'] = tile_power['buffer_r'] + tile_power['buffer_w']
+		tile_power['digital'] = tile_power['adder'] + tile_power['shiftreg'] + tile_power['iReg'] \
+								+ tile_power['input_demux'] + tile_power['output_mux'] + tile_power['jointmodule']
+		tile_power['total'] = tile_power['xbar'] + tile_power['ADC'] + tile_power['DAC'] + tile_power['digital'] \
+							  + tile_power['buffer']
+		return tile_power
+
+	def calculate_tile_read_latency_occupancy(self, read_row, read_column, activation_precision, sliding_times):
+		# array version of the PE/tile read latency model, the slowest PE of each tile decides the tile latency
+		# read_row and read_column: see calculate_tile_read_power_occupancy
+		# activation_precision and sliding_times are scalars (the layer mapped on these tiles)
+		# return: an OrderedDict of the read latency of each tile (arrays with the length of #tiles), unit: ns
+		read_row = np.asarray(read_row, dtype = float)
+		read_column = np.asarray(read_column, dtype = float)
+		occupied_PE_num = ((read_row > 0).sum(axis = 2) > 0).sum(axis = 1)
+		self.calculate_xbar_read_latency()
+		self.calculate_DAC_sample_rate()
+		self.calculate_ADC_sample_rate()
+		self.calculate_DAC_latency()
+		self.calculate_ADC_latency()
+		# the multiple times of one crossbar read in the slowest group/PE
+		PE_multiple_time = (np.ceil(read_row/self.PE_group_DAC_num) * np.ceil(read_column/self.PE_group_ADC_num)).max(axis = (1, 2))
+		level = np.ceil(np.log2(np.maximum(occupied_PE_num, 1)))
+		multiple_time = math.ceil(activation_precision/self.DAC_precision) * sliding_times
+		tile_latency = collections.OrderedDict()
+		tile_latency['xbar'] = multiple_time*PE_multiple_time*self.xbar_read_latency
+		tile_latency['ADC'] = multiple_time*PE_multiple_time*self.ADC_latency
+		tile_latency['DAC'] = multiple_time*PE_multiple_time*self.DAC_latency
+		tile_latency['input_demux'] = np.zeros(PE_multiple_time.shape)
+		tile_latency['output_mux'] = np.zeros(PE_multiple_time.shape)
+		tile_latency['adder'] = PE_multiple_time*self.PE_adder.adder_latency*math.ceil(math.log2(self.group_num))
+		tile_latency['shiftreg'] = PE_multiple_time*self.PE_shiftreg.shiftreg_latency
+		tile_latency['jointmodule'] = np.where(occupied_PE_num > 0, sliding_times*level*self.tile_jointmodule.jointmodule_latency, 0)
+		tile_latency['digital'] = np.where(occupied_PE_num > 0, multiple_time*(tile_latency['adder'] + tile_latency['shiftreg']
+										   + self.tile_shiftreg.shiftreg_latency + level*self.tile_adder.adder_latency), 0) \
+								  + tile_latency['jointmodule']
+		tile_latency['total'] = tile_latency['xbar'] + tile_latency['ADC'] + tile_latency['DAC'] + tile_latency['digital']
+		return tile_latency
+
 	def tile_read_config(self, layer_num = 0, activation_precision = 0, sliding_times = 0,
 						 read_row = None, read_column = None, read_matrix = None, read_vector = None):
 		# read_row and read_column are 2D lists with the size of (#occupied_PE x #occupied groups)
@@ -455,9 +613,39 @@ class tile(ProcessElement):
 			self.tile_write_latency = self.tile_xbar_write_latency + self.tile_ADC_write_latency \
 									  + self.tile_DAC_write_latency + self.tile_digital_write_latency'''
 
-	def calculate_tile_read_power(self):
+	def tile_xbar_read_stack(self):
+		# collect the read configurations of all enabled crossbars in this tile
+		# return: read_row, read_column, read_matrix, read_vector (see PE_xbar_read_stack)
+		#         and the index of the enabled PE that each crossbar belongs to
+		read_row = []
+		read_column = []
+		read_matrix = []
+		read_vector = []
+		PE_id = []
+		PE_index = 0
+		for i in range(self.tile_PE_num[0]):
+			for j in range(self.tile_PE_num[1]):
+				if self.tile_PE_enable[i][j] == 1:
+					temp_row, temp_column, temp_matrix, temp_vector = self.tile_PE_list[i][j].PE_xbar_read_stack()
+					read_row.append(temp_row)
+					read_column.append(temp_column)
+					read_matrix.append(temp_matrix)
+					read_vector.append(temp_vector)
+					PE_id.append(np.full(len(temp_row), PE_index, dtype = int))
+					PE_index += 1
+		if PE_index == 0:
+			return np.zeros(0), np.zeros(0), None, None, np.zeros(0, dtype = int)
+		read_row = np.concatenate(read_row)
+		read_column = np.concatenate(read_column)
+		PE_id = np.concatenate(PE_id)
+		if self.tile_simulation_level == 0:
+			return read_row, read_column, None, None, PE_id
+		return read_row, read_column, np.concatenate(read_matrix), np.concatenate(read_vector), PE_id
+
+	def calculate_tile_read_power(self, PE_xbar_read_power = None):
 		# unit: W
 		# Notice: before calculating power, tile_read_config must be executed
+		# PE_xbar_read_power: the crossbar read power of each enabled PE, computed in batch (one einsum for the tile) if None
 		self.tile_read_power = 0
 		self.tile_xbar_read_power = 0
 		self.tile_ADC_read_power = 0
@@ -474,10 +662,16 @@ class tile(ProcessElement):
 
 		max_occupied_column = 0
 		if self.num_occupied_PE != 0:
+			if PE_xbar_read_power is None:
+				read_row, read_column, read_matrix, read_vector, PE_id = self.tile_xbar_read_stack()
+				xbar_read_power = self.calculate_xbar_read_power_batch(read_row, read_column, read_matrix, read_vector)
+				PE_xbar_read_power = segment_sum(xbar_read_power, PE_id, self.num_occupied_PE)
+			PE_index = 0
 			for i in range(self.tile_PE_num[0]):
 				for j in range(self.tile_PE_num[1]):
 					if self.tile_PE_enable[i][j] == 1:
-						self.tile_PE_list[i][j].calculate_PE_read_power()
+						self.tile_PE_list[i][j].calculate_PE_read_power(PE_xbar_read_power[PE_index])
+						PE_index += 1
 						self.tile_xbar_read_power += self.tile_PE_list[i][j].PE_xbar_read_power
 						self.tile_ADC_read_power += self.tile_PE_list[i][j].PE_ADC_read_power
 						self.tile_DAC_read_power += self.tile_PE_list[i][j].PE_DAC_read_power
@@ -675,6 +869,61 @@ class tile(ProcessElement):
 		print("				|---JointModule write energy:", self.tile_jointmodule_write_energy, "nJ")
 		print("-----------------------------------------------------------------")
 	
+def SimConfig_hash(SimConfig_path):
+	# content hash of the config file, used as the key of the memoized estimations
+	# the file is only read again when its size or modification time changes
+	config_stat = os.stat(SimConfig_path)
+	stat_key = (os.path.abspath(SimConfig_path), config_stat.st_mtime_ns, config_stat.st_size)
+	if stat_key not in config_hash_dict:
+		with open(SimConfig_path, 'rb') as f:
+			config_hash_dict[stat_key] = hashlib.sha1(f.read()).hexdigest()
+	config_hash_dict.move_to_end(stat_key)
+	while len(config_hash_dict) > config_tile_dict_size:
+		config_hash_dict.popitem(last = False)
+	return config_hash_dict[stat_key]
+
+config_hash_dict = collections.OrderedDict()
+	# LRU cache: (config path, modification time, size) -> config hash
+config_tile_dict = collections.OrderedDict()
+	# LRU cache: config hash -> tile object used for the memoized estimations
+config_tile_dict_size = 4
+tile_power_cache = collections.OrderedDict()
+	# LRU cache: (config hash, max_column, max_row, max_PE, max_group, layer type code) -> tile_power_record
+tile_power_cache_size = 4096
+
+def calculate_tile_read_power_record(SimConfig_path, occupancy_list, config_hash = None):
+	# memoized tile.calculate_tile_read_power_fast without side effects on the caller
+	# occupancy_list: a list of (max_column, max_row, max_PE, max_group, layer_type)
+	# config_hash: SimConfig_hash(SimConfig_path), computed here if not given
+	# return: a list of tile_power_record with the same length
+	if config_hash is None:
+		config_hash = SimConfig_hash(SimConfig_path)
+	key_list = []
+	for max_column, max_row, max_PE, max_group, layer_type in occupancy_list:
+		if isinstance(layer_type, str):
+			layer_type = layer_type_code[layer_type]
+		key_list.append((config_hash, int(max_column), int(max_row), int(max_PE), int(max_group), int(layer_type)))
+	miss_list = [key for key in dict.fromkeys(key_list) if key not in tile_power_cache]
+	if len(miss_list) > 0:
+		# all the missed occupancies are estimated in one columnar call
+		if config_hash not in config_tile_dict:
+			config_tile_dict[config_hash] = tile(SimConfig_path)
+		config_tile_dict.move_to_end(config_hash)
+		while len(config_tile_dict) > config_tile_dict_size:
+			config_tile_dict.popitem(last = False)
+		miss_array = np.array([key[1:] for key in miss_list])
+		tile_power = config_tile_dict[config_hash].calculate_tile_read_power_columnar(
+			miss_array[:, 0], miss_array[:, 1], miss_array[:, 2], miss_array[:, 3], miss_array[:, 4])
+		for i, key in enumerate(miss_list):
+			tile_power_cache[key] = tile_power_record(*[float(tile_power[field][i]) for field in tile_power_record._fields])
+	record_list = []
+	for key in key_list:
+		tile_power_cache.move_to_end(key)
+		record_list.append(tile_power_cache[key])
+	while len(tile_power_cache) > tile_power_cache_size:
+		tile_power_cache.popitem(last = False)
+	return record_list
+
 def tile_test():
 	print("load file:", test_SimConfig_path)
 	_tile = tile(test_SimConfig_path)
@@ -56,6 +56,20 @@ class QuantizeFunction(Function):
         return grad_output, None, None, None, None
 Quantize = QuantizeFunction.apply
 
+# bit weights of one QuantizeLayer, version changes when any slice is set (the slices are replaced, not changed in place)
+class BitWeights(collections.OrderedDict):
+    def __init__(self, *args, **kwargs):
+        self.version = 0
+        # the weight tensors prepared from the slices on each (device, dtype), with the version they are made from
+        self.device_cache = {}
+        super(BitWeights, self).__init__(*args, **kwargs)
+    def __setitem__(self, key, value):
+        super(BitWeights, self).__setitem__(key, value)
+        self.version += 1
+    def __delitem__(self, key):
+        super(BitWeights, self).__delitem__(key)
+        self.version += 1
+
 # AB = 1
 # N = 512
 # Q = 10
@@ -113,6 +127,8 @@ class QuantizeLayer(nn.Module):
         self.bit_scale_list = nn.Parameter(torch.zeros(3, 2))
         # layer information
         self.layer_info = None
+        # bit weights for SINGLE_FIX_TEST, with the weight versions they are made from
+        self.bit_weights_cache = None
     def structure_forward(self, input):
         # TRADITION
         input_shape = input.shape
@@ -190,7 +206,7 @@ class QuantizeLayer(nn.Module):
             return output
         if METHOD == 'SINGLE_FIX_TEST':
             assert self.training == False
-            bit_weights = self.get_bit_weights()
+            bit_weights = self.get_cached_bit_weights()
             output = self.set_weights_forward(input, bit_weights, adc_action)
             return output
         assert 0, f'not support {METHOD}'
@@ -199,26 +215,60 @@ class QuantizeLayer(nn.Module):
         weight_bit = self.quantize_config['weight_bit']
         weight_scale = self.bit_scale_list[1, 1].item()
         assert weight_bit != 0 and weight_scale != 0, f'weight bit and scale should be given by the params'
-        bit_weights = collections.OrderedDict()
+        assert self.hardware_config['weight_bit'] <= 8, f'the weight slices are stored as uint8'
+        bit_weights = BitWeights()
         for layer_num, l in enumerate(self.layer_list):
             # assert (weight_bit - 1) % self.hardware_config['weight_bit'] == 0, generate weight cycle
             weight_cycle = math.ceil((weight_bit - 1) / self.hardware_config['weight_bit'])
             # transfer part weight
             thres = 2 ** (weight_bit - 1) - 1
-            weight_digit = torch.clamp(torch.round(l.weight / weight_scale), 0 - thres, thres - 0)
-            # split weight into bit
-            sign_weight = torch.sign(weight_digit)
-            weight_digit = torch.abs(weight_digit)
-            base = 1
+            weight_digit = torch.clamp(torch.round(l.weight.detach() / weight_scale), 0 - thres, thres - 0)
+            weight_digit = weight_digit.to(torch.int64)
+            # split weight into bit, (weight_cycle, ...) slices of the absolute value
             step = 2 ** self.hardware_config['weight_bit']
+            shift = torch.arange(weight_cycle, device = weight_digit.device) * self.hardware_config['weight_bit']
+            shift = shift.view(-1, *([1] * weight_digit.dim()))
+            weight_slice = ((torch.abs(weight_digit).unsqueeze(0) >> shift) & (step - 1)).to(torch.uint8)
+            positive = (weight_slice * (weight_digit > 0)).cpu().numpy()
+            negative = (weight_slice * (weight_digit < 0)).cpu().numpy()
             for j in range(weight_cycle):
-                tmp = torch.fmod(weight_digit, base * step) - torch.fmod(weight_digit, base)
-                tmp = torch.mul(sign_weight, tmp)
-                tmp = copy.deepcopy((tmp / base).detach().cpu().numpy())
-                bit_weights[f'split{layer_num}_weight{j}_positive'] = np.where(tmp > 0, tmp, 0)
-                bit_weights[f'split{layer_num}_weight{j}_negative'] = np.where(tmp < 0, -tmp, 0)
-                base = base * step
+                bit_weights[f'split{layer_num}_weight{j}_positive'] = positive[j]
+                bit_weights[f'split{layer_num}_weight{j}_negative'] = negative[j]
         return bit_weights
+    def get_cached_bit_weights(self):
+        # get_bit_weights, made again only when the weights (version counter of the tensors) or the weight scale
+        # change, so that the device cache of the bit weights is kept across the batches
+        weight_version = tuple((id(l.weight), l.weight._version) for l in self.layer_list) + \
+                         (self.bit_scale_list[1, 1].item(),)
+        if self.bit_weights_cache is None or self.bit_weights_cache[0] != weight_version:
+            self.bit_weights_cache = (weight_version, self.get_bit_weights())
+        return self.bit_weights_cache[1]
+    def get_weight_stack(self, bit_weights, device, dtype):
+        # the weight slices of each row split stacked on the output channel dim (see set_weights_forward),
+        # cached on the device in bit_weights (BitWeights) until its version changes
+        cache_key = (device, dtype)
+        if isinstance(bit_weights, BitWeights):
+            cache = bit_weights.device_cache.get(cache_key)
+            if cache is not None and cache[0] == bit_weights.version:
+                return cache[1]
+        # weight_bit = int(self.bit_scale_list[1, 0].item())
+        weight_bit = self.quantize_config['weight_bit']
+        # assert (weight_bit - 1) % self.hardware_config['weight_bit'] == 0, generate weight cycle
+        weight_cycle = math.ceil((weight_bit - 1) / self.hardware_config['weight_bit'])
+        weight_stack_list = []
+        for layer_num in range(len(self.layer_list)):
+            weight_container = []
+            for j in range(weight_cycle):
+                positive = bit_weights[f'split{layer_num}_weight{j}_positive']
+                negative = bit_weights[f'split{layer_num}_weight{j}_negative']
+                # the uint8 slices are subtracted as signed numbers
+                tmp = np.subtract(positive, negative, dtype = np.result_type(positive, negative, np.int16))
+                tmp = torch.from_numpy(tmp)
+                weight_container.append(tmp.to(device = device, dtype = dtype))
+            weight_stack_list.append(torch.cat(weight_container, dim = 0))
+        if isinstance(bit_weights, BitWeights):
+            bit_weights.device_cache[cache_key] = (bit_weights.version, weight_stack_list)
+        return weight_stack_list
     def set_weights_forward(self, input, bit_weights, adc_action):
         assert self.training == False
         output = None
@@ -227,17 +277,10 @@ class QuantizeLayer(nn.Module):
         # weight_bit = int(self.bit_scale_list[1, 0].item())
         weight_bit = self.quantize_config['weight_bit']
         weight_scale = self.bit_scale_list[1, 1].item()
+        weight_stack_list = self.get_weight_stack(bit_weights, input.device, input.dtype)
         for layer_num, l in enumerate(self.layer_list):
             # assert (weight_bit - 1) % self.hardware_config['weight_bit'] == 0, generate weight cycle
             weight_cycle = math.ceil((weight_bit - 1) / self.hardware_config['weight_bit'])
-            weight_container = []
-            base = 1
-            step = 2 ** self.hardware_config['weight_bit']
-            for j in range(weight_cycle):
-                tmp = bit_weights[f'split{layer_num}_weight{j}_positive'] - bit_weights[f'split{layer_num}_weight{j}_negative']
-                tmp = torch.from_numpy(tmp)
-                weight_container.append(tmp.to(device = input.device, dtype = input.dtype))
-                base = base * step
             activation_in_bit = int(self.bit_scale_list[0, 0].item())
             activation_in_scale = self.bit_scale_list[0, 1].item()
             thres = 2 ** (activation_in_bit - 1) - 1
@@ -254,51 +297,59 @@ class QuantizeLayer(nn.Module):
                 tmp = torch.fmod(activation_in_digit, base * step) -  torch.fmod(activation_in_digit, base)
                 activation_in_container.append(torch.mul(sign_activation_in, tmp) / base)
                 base = base * step
-            # calculation and add
+            # calculation, the activation bit-planes stacked on the batch dim and the weight slices stacked on the
+            # output channel dim are computed in one conv / linear
             point_shift = self.quantize_config['point_shift']
             Q = self.hardware_config['quantize_bit']
+            batch_num = input_list[layer_num].shape[0]
+            activation_in_stack = torch.cat(activation_in_container, dim = 0)
+            weight_stack = weight_stack_list[layer_num]
+            if self.layer_config['type'] == 'conv':
+                tmp = F.conv2d(
+                    activation_in_stack, weight_stack, None, \
+                    self.layer_config['stride'], self.layer_config['padding'], 1, 1
+                )
+            elif self.layer_config['type'] == 'fc':
+                tmp = F.linear(activation_in_stack, weight_stack, None)
+            else:
+                assert 0, f'not support {self.layer_config["type"]}'
+            # (activation_in_cycle, batch, weight_cycle, output channel, ...)
+            tmp = tmp.view(activation_in_cycle, batch_num, weight_cycle, -1, *tmp.shape[2:])
+            if adc_action == 'SCALE':
+                tmp = tmp * weight_scale * activation_in_scale
+                tmp = tmp / scale * (2 ** ((activation_in_cycle - 1) * self.hardware_config['input_bit'] + \
+                                           (weight_cycle - 1) * self.hardware_config['weight_bit']))
+                transfer_point = point_shift + (Q - 1)
+                tmp = tmp * (2 ** transfer_point)
+                tmp = torch.clamp(torch.round(tmp), 1 - 2 ** (Q - 1), 2 ** (Q - 1) - 1)
+                tmp = tmp / (2 ** transfer_point)
+            elif adc_action == 'FIX':
+                # fix scale range
+                fix_scale_range = (2 ** self.hardware_config['input_bit'] - 1) * \
+                                  (2 ** self.hardware_config['weight_bit'] - 1) * \
+                                    self.hardware_config['xbar_size']
+                tmp = tmp / fix_scale_range * (2 ** (Q - 1))
+                tmp = torch.clamp(torch.round(tmp), 1 - 2 ** (Q - 1), 2 ** (Q - 1) - 1)
+                tmp = tmp * fix_scale_range / (2 ** (Q - 1))
+                tmp = tmp * weight_scale * activation_in_scale
+                tmp = tmp / scale * (2 ** ((activation_in_cycle - 1) * self.hardware_config['input_bit'] + \
+                                           (weight_cycle - 1) * self.hardware_config['weight_bit']))
+            else:
+                assert 0, f'can not support {adc_action}'
+            # scale
+            scale_point = [[2 ** ((activation_in_cycle - 1 - i) * self.hardware_config['input_bit'] + \
+                                  (weight_cycle - 1 - j) * self.hardware_config['weight_bit'])
+                            for j in range(weight_cycle)] for i in range(activation_in_cycle)]
+            scale_point = torch.tensor(scale_point, device = tmp.device, dtype = tmp.dtype)
+            tmp = tmp / scale_point.view(activation_in_cycle, 1, weight_cycle, *([1] * (tmp.dim() - 3)))
+            tmp = tmp.transpose(1, 2).contiguous()
+            # add, in the order of the bit-serial computation (the float sum depends on the order)
             for i in range(activation_in_cycle):
                 for j in range(weight_cycle):
-                    tmp = None
-                    if self.layer_config['type'] == 'conv':
-                        tmp = F.conv2d(
-                            activation_in_container[i], weight_container[j], None, \
-                            self.layer_config['stride'], self.layer_config['padding'], 1, 1
-                        )
-                    elif self.layer_config['type'] == 'fc':
-                        tmp = F.linear(activation_in_container[i], weight_container[j], None)
-                    else:
-                        assert 0, f'not support {self.layer_config["type"]}'
-                    if adc_action == 'SCALE':
-                        tmp = tmp * weight_scale * activation_in_scale
-                        tmp = tmp / scale * (2 ** ((activation_in_cycle - 1) * self.hardware_config['input_bit'] + \
-                                                   (weight_cycle - 1) * self.hardware_config['weight_bit']))
-                        transfer_point = point_shift + (Q - 1)
-                        tmp = tmp * (2 ** transfer_point)
-                        tmp = torch.clamp(torch.round(tmp), 1 - 2 ** (Q - 1), 2 ** (Q - 1) - 1)
-                        tmp = tmp / (2 ** transfer_point)
-                    elif adc_action == 'FIX':
-                        # fix scale range
-                        fix_scale_range = (2 ** self.hardware_config['input_bit'] - 1) * \
-                                          (2 ** self.hardware_config['weight_bit'] - 1) * \
-                                            self.hardware_config['xbar_size']
-                        tmp = tmp / fix_scale_range * (2 ** (Q - 1))
-                        tmp = torch.clamp(torch.round(tmp), 1 - 2 ** (Q - 1), 2 ** (Q - 1) - 1)
-                        tmp = tmp * fix_scale_range / (2 ** (Q - 1))
-                        tmp = tmp * weight_scale * activation_in_scale
-                        tmp = tmp / scale * (2 ** ((activation_in_cycle - 1) * self.hardware_config['input_bit'] + \
-                                                   (weight_cycle - 1) * self.hardware_config['weight_bit']))
-                    else:
-                        assert 0, f'can not support {adc_action}'
-                    # scale
-                    scale_point = (activation_in_cycle - 1 - i) * self.hardware_config['input_bit'] + \
-                                  (weight_cycle - 1 - j) * self.hardware_config['weight_bit']
-                    tmp = tmp / (2 ** scale_point)
-                    # add
                     if torch.is_tensor(output):
-                        output = output + tmp
+                        output = output + tmp[i, j]
                     else:
-                        output = tmp
+                        output = tmp[i, j]
         # quantize output
         activation_out_bit = int(self.bit_scale_list[0, 0].item())
         activation_out_scale = self.bit_scale_list[0, 1].item()
@@ -6,12 +6,10 @@ import configparser as cp
 work_path = os.path.dirname(os.getcwd())
 sys.path.append(work_path)
 import numpy as np
-import pandas as pd
-from MNSIM.Interface.interface import *
 from MNSIM.Mapping_Model.Tile_connection_graph import TCG
 from MNSIM.Latency_Model.Tile_latency import tile_latency_analysis
 from MNSIM.Latency_Model.Pooling_latency import pooling_latency_analysis
-from MNSIM.NoC.interconnect_estimation import interconnect_estimation
+from MNSIM.NoC.interconnect_estimation import interconnect_estimation, interconnect_timeline_estimation
 
 def merge_interval(interval):
     if len(interval) == 0:
@@ -51,31 +49,12 @@ def Split_map(padding, outputsize, multiple): # 对下一层进行划分
             split.append(base)
     return split
 
-def netstructure_dump(Netstruct):
-    data = []
-    for layer_id in range(len(Netstruct)):
-        layer_dict = Netstruct[layer_id][0][0]
-        if layer_dict['type'] == 'fc':
-            input_size = int(layer_dict['Infeature'])
-            inputchannel = 1
-        else:
-            input_size_list = list(map(int, layer_dict['Inputsize']))
-            input_size = input_size_list[0] * input_size_list[1]
-            inputchannel = int(layer_dict['Inputchannel'])
-        inputbit = int(layer_dict['Inputbit'])
-        data.append(input_size * inputchannel * inputbit)
-    print(data)
-    demo = pd.DataFrame(data)
-    demo.to_csv('MNSIM/NoC/to_interconnect/ip_activation.csv', index=False, header=False)
-
-
 class Model_latency():
     def __init__(self, NetStruct, SimConfig_path, multiple=None, TCG_mapping=None):
         modelL_config = cp.ConfigParser()
         modelL_config.read(SimConfig_path, encoding='UTF-8')
         self.inter_tile_bandwidth = float(modelL_config.get('Tile level', 'Inter_Tile_Bandwidth'))
         self.NetStruct = NetStruct
-        netstructure_dump(self.NetStruct)
         if multiple is None:
             multiple = [1] * len(self.NetStruct)
         if TCG_mapping is None:
@@ -83,16 +62,31 @@ class Model_latency():
         self.graph = TCG_mapping
         self.graph.mapping_net()
         self.graph.calculate_transfer_distance()
-        self.begin_time = []
-        self.finish_time = []
-        self.layer_tile_latency = []
 
-        self.Noc_latency, self.Noc_area, self.Noc_power = interconnect_estimation()
+        if self.graph.noc_input.latency is None:
+            interconnect_estimation(SimConfig_path, self.graph.noc_input)
+        self.Noc_latency = self.graph.noc_input.latency
+        self.Noc_area = self.graph.noc_input.area
+        self.Noc_power = self.graph.noc_input.power
+        self.inter_chip_bandwidth = float(modelL_config.get('Architecture level', 'Inter_Chip_Bandwidth', fallback='25'))
+            # unit: Gbps
+        self.inter_chip_latency = float(modelL_config.get('Architecture level', 'Inter_Chip_Latency', fallback='0'))
+            # unit: ns
+        self.chip_transfer_latency = self.calculate_chip_transfer_latency()
+        self.noc_timeline_iteration = int(modelL_config.get('Architecture level', 'NoC_Timeline_Iteration', fallback='0'))
+            # the maximum number of the fixed-point iterations of the timeline-driven NoC latency, 0: constant traffic
         # print(self.Noc_latency)
         self.SimConfig_path = SimConfig_path
+        self.multiple = multiple
+        self.clear_latency_result()
+
+    def clear_latency_result(self):
+        # the results of calculate_model_latency and calculate_model_latency_nopipe
+        self.begin_time = []
+        self.finish_time = []
+        self.layer_tile_latency = []
         self.compute_interval = []
         self.occupancy = []
-        self.multiple = multiple
 
         self.buffer_latency = []
         self.buffer_r_latency = []
@@ -139,6 +133,82 @@ class Model_latency():
         self.layer_split = []
         self.pre_max_time = 0
 
+    def layer_send_volume(self):
+        # the volume (bit) of one output point of each layer (one pixel of all the channels, or one fc output)
+        send_volume = np.zeros(len(self.NetStruct))
+        for layer_id in range(len(self.NetStruct)):
+            layer_dict = self.NetStruct[layer_id][0][0]
+            if layer_dict['type'] == 'fc':
+                send_volume[layer_id] = int(layer_dict['outputbit'])
+            else:
+                send_volume[layer_id] = int(layer_dict['Outputchannel']) * int(layer_dict['outputbit'])
+        return send_volume
+
+    def noc_timeline_feedback(self, latency_pass, tolerance=1e-3):
+        # latency_pass: one run of the latency model with the NoC latency self.Noc_latency
+        # the NoC latency of each layer transfer is re-estimated from the finish times of the run (the traffic
+        # profile), and the model runs again with it until the NoC latency converges (damped fixed-point iteration)
+        latency_pass()
+        interconnect_latency = None
+        for iteration in range(self.noc_timeline_iteration):
+            Noc_latency = np.array(self.Noc_latency, dtype=np.float64)
+            timeline_latency, interconnect_latency = \
+                interconnect_timeline_estimation(self.SimConfig_path, self.graph.noc_input, self.finish_time,
+                                                 self.layer_send_volume())
+            timeline_latency = np.array(timeline_latency)
+            if np.max(np.abs(timeline_latency - Noc_latency), initial=0) <= \
+                    tolerance * max(np.max(np.abs(Noc_latency), initial=0), 1):
+                break
+            self.Noc_latency = (0.5 * (Noc_latency + timeline_latency)).tolist()
+                # the damping avoids the oscillation between the bursty and the spread-out traffic profiles
+            self.clear_latency_result()
+            latency_pass()
+        if interconnect_latency is not None:
+            # the NoC energy follows the latency of the traffic profile (see save_noc_result)
+            self.graph.noc_input.latency = self.Noc_latency
+            self.graph.noc_input.energy = self.graph.noc_input.power * interconnect_latency
+
+    def calculate_chip_transfer_latency(self):
+        # inter-chip link latency of each output point of the layers before a chip cut (multi-chip partition)
+        # each output point (one pixel of all the channels, or the whole fc output) is sent through the link
+        # unit: ns (bit / Gbps)
+        chip_transfer_latency = np.zeros(len(self.NetStruct))
+        for layer_id in np.flatnonzero(self.graph.chip_transfer_volume):
+            layer_dict = self.NetStruct[layer_id][0][0]
+            if layer_dict['type'] == 'fc':
+                point_num = 1
+            else:
+                point_num = int(layer_dict['Outputsize'][0]) * int(layer_dict['Outputsize'][1])
+            chip_transfer_latency[layer_id] = self.inter_chip_latency + \
+                                              self.graph.chip_transfer_volume[layer_id] / point_num / self.inter_chip_bandwidth
+        return chip_transfer_latency
+
+    def calculate_entire_latency(self):
+        # unit: ns
+        if self.graph.phase_num == 1:
+            return max(max(self.finish_time))
+        # weight reprogramming: the later phases are already scheduled after their previous phase and their
+        # programming (see phase_input_begin), the first phase is programmed before the run
+        return self.graph.phase_write_latency[0] + max(max(layer_finish_time) for layer_finish_time in self.finish_time)
+
+    def phase_input_begin(self, layer_id):
+        # weight reprogramming: the first layer of a phase starts after all the layers of the previous phases have
+        # finished and the weights of the phase are written, the output of the previous phase is then all in the
+        # buffer, so the finish times of the previous layer seen by this layer are replaced by the phase start
+        # return: the finish times of the previous layer to restore by phase_input_end, None if not a phase start
+        if self.graph.phase_num == 1 or layer_id == 0 or \
+                self.graph.layer_chip[layer_id] == self.graph.layer_chip[layer_id-1]:
+            return None
+        phase_begin = max(max(self.finish_time[pre_layer_id]) for pre_layer_id in range(layer_id)) + \
+                      self.graph.phase_write_latency[self.graph.layer_chip[layer_id]]
+        last_finish_time = self.finish_time[layer_id-1]
+        self.finish_time[layer_id-1] = [phase_begin] * len(last_finish_time)
+        return last_finish_time
+
+    def phase_input_end(self, layer_id, last_finish_time):
+        if last_finish_time is not None:
+            self.finish_time[layer_id-1] = last_finish_time
+
     def Judge(self, last_layer_pos, current_layer_id):
         layer_dict = self.NetStruct[current_layer_id][0][0]
         # print(current_layer_id)
@@ -162,7 +232,11 @@ class Model_latency():
             return pos-1*(m != 0) + Row * input_size
 
     def calculate_model_latency_nopipe(self):
+        self.noc_timeline_feedback(self.calculate_model_latency_nopipe_pass)
+
+    def calculate_model_latency_nopipe_pass(self):
         for layer_id in range(len(self.NetStruct)):
+            last_finish_time = self.phase_input_begin(layer_id)
             print(layer_id)
             layer_dict = self.NetStruct[layer_id][0][0]
             if layer_id == 0:
@@ -219,7 +293,7 @@ class Model_latency():
                 # transfer_time = self.graph.transLayer_distance[0][layer_id] * (
                 #             outputchannel * outputbit / self.inter_tile_bandwidth)
                 if layer_id != len(self.NetStruct) - 1:
-                    transfer_time = self.Noc_latency[layer_id]
+                    transfer_time = self.Noc_latency[layer_id] + self.chip_transfer_latency[layer_id]
                 else:
                     transfer_time = 0
 
@@ -394,7 +468,7 @@ class Model_latency():
                     # transfer_time = self.graph.transLayer_distance[0][layer_id] * (
                     #         outputchannel * outputbit / self.inter_tile_bandwidth)
                     if layer_id != len(self.NetStruct) - 1:
-                        transfer_time = self.Noc_latency[layer_id]
+                        transfer_time = self.Noc_latency[layer_id] + self.chip_transfer_latency[layer_id]
                     else:
                         transfer_time = 0
                     # Todo: update transfer data volume
@@ -576,7 +650,7 @@ class Model_latency():
                     # transfer_time = self.graph.transLayer_distance[0][layer_id] * (
                     #         output_size * outputbit / self.inter_tile_bandwidth)
                     if layer_id != len(self.NetStruct) - 1:
-                        transfer_time = self.Noc_latency[layer_id]
+                        transfer_time = self.Noc_latency[layer_id] + self.chip_transfer_latency[layer_id]
                     else:
                         transfer_time = 0
 
@@ -654,7 +728,7 @@ class Model_latency():
                     # transfer_time = self.graph.transLayer_distance[0][layer_id] * (
                     #         outputchannel * outputbit / self.inter_tile_bandwidth)
                     if layer_id != len(self.NetStruct) - 1:
-                        transfer_time = self.Noc_latency[layer_id]
+                        transfer_time = self.Noc_latency[layer_id] + self.chip_transfer_latency[layer_id]
                     else:
                         transfer_time = 0
                     # Todo: update transfer data volume
@@ -802,6 +876,7 @@ class Model_latency():
             self.total_pooling_latency.append(sum(self.pooling_latency[layer_id]))
             self.total_buffer_r_latency.append(sum(self.buffer_r_latency[layer_id]))
             self.total_buffer_w_latency.append(sum(self.buffer_w_latency[layer_id]))
+            self.phase_input_end(layer_id, last_finish_time)
 
     def Latency_stall_calculate(self):
         ''' should be used after the calculate_model '''
@@ -851,7 +926,8 @@ class Model_latency():
                     input_channel_PE = self.graph.layer_tileinfo[layer_id]['max_row'] / (kernelsize ** 2)
                     ''' get the point number of this layer and then go back to the previous layer '''
                     # TODO: update the tile usage of this
-                    tile_num = self.graph.layer_tileinfo[layer_id]['tilenum']
+                    tile_num = self.graph.layer_tileinfo[layer_id]['tile_share']
+                        # the output buffer of a shared tile (tile packing) is split by the PE numbers
                     pre_point = 0
                     cur_point = 0
                     res = 0
@@ -955,11 +1031,19 @@ class Model_latency():
                           "%.2f" % (100 * self.total_tile_transfer_latency[i] / total_latency), '%)')
                 print('----------------------------------------------')
         # print("Latency simulation finished!")
-        print("Entire latency:", max(max(self.finish_time)), "ns")
+        if self.graph.chip_num > 1:
+            print("Inter chip link latency (per output point):", self.chip_transfer_latency.sum(), "ns")
+        if self.graph.phase_num > 1:
+            print("Weight programming latency:", sum(self.graph.phase_write_latency), "ns")
+        print("Entire latency:", self.calculate_entire_latency(), "ns")
 
     def calculate_model_latency(self, mode=0):
         ''' merge the latency_0 and latency_1 '''
+        self.noc_timeline_feedback(lambda: self.calculate_model_latency_pass(mode))
+
+    def calculate_model_latency_pass(self, mode=0):
         for layer_id in range(len(self.NetStruct)):
+            last_finish_time = self.phase_input_begin(layer_id)
             layer_dict = self.NetStruct[layer_id][0][0]
             if layer_id == 0:
                 # for the first layer, first layer must be conv layer
@@ -1018,7 +1102,7 @@ class Model_latency():
                 # transfer_time = self.graph.transLayer_distance[0][layer_id] * (
                 #         outputchannel * outputbit / self.inter_tile_bandwidth)
                 if layer_id != len(self.NetStruct)-1 :
-                    transfer_time = self.Noc_latency[layer_id]
+                    transfer_time = self.Noc_latency[layer_id] + self.chip_transfer_latency[layer_id]
                 else:
                     transfer_time = 0
 
@@ -1224,7 +1308,7 @@ class Model_latency():
                     # transfer_time = self.graph.transLayer_distance[0][layer_id] * (
                     #         outputchannel * outputbit / self.inter_tile_bandwidth)
                     if layer_id != len(self.NetStruct) - 1:
-                        transfer_time = self.Noc_latency[layer_id]
+                        transfer_time = self.Noc_latency[layer_id] + self.chip_transfer_latency[layer_id]
                     else:
                         transfer_time = 0
                     # Todo: update transfer data volume
@@ -1433,7 +1517,7 @@ class Model_latency():
                         # transfer_time = self.graph.transLayer_distance[0][layer_id] * (
                         #         output_size * outputbit / self.inter_tile_bandwidth)
                         if layer_id != len(self.NetStruct) - 1:
-                            transfer_time = self.Noc_latency[layer_id]
+                            transfer_time = self.Noc_latency[layer_id] + self.chip_transfer_latency[layer_id]
                         else:
                             transfer_time = 0
                         begin_time = self.finish_time[layer_id - 1][-1]
@@ -1509,7 +1593,7 @@ class Model_latency():
                         # transfer_time = self.graph.transLayer_distance[0][layer_id] * (
                         #         outputchannel * outputbit / self.inter_tile_bandwidth)
                         if layer_id != len(self.NetStruct) - 1:
-                            transfer_time = self.Noc_latency[layer_id]
+                            transfer_time = self.Noc_latency[layer_id] + self.chip_transfer_latency[layer_id]
                         else:
                             transfer_time = 0
                         # Todo: update transfer data volume
@@ -1696,8 +1780,10 @@ class Model_latency():
             self.total_pooling_latency.append(sum(self.pooling_latency[layer_id]))
             self.total_buffer_r_latency.append(sum(self.buffer_r_latency[layer_id]))
             self.total_buffer_w_latency.append(sum(self.buffer_w_latency[layer_id]))
+            self.phase_input_end(layer_id, last_finish_time)
 
 if __name__ == '__main__':
+    from MNSIM.Interface.interface import TrainTestInterface
     test_SimConfig_path = os.path.join(os.path.dirname(os.path.dirname(os.getcwd())), "SimConfig.ini")
     test_weights_file_path = os.path.join(os.path.dirname(os.path.dirname(os.getcwd())),
                                           "alexnet_params.pth")
@@ -1,6 +1,5 @@
 #!/usr/bin/python
 # -*-coding:utf-8-*-
-import torch
 import sys
 import os
 import math
@@ -9,7 +8,6 @@ work_path = os.path.dirname(os.getcwd())
 sys.path.append(work_path)
 from MNSIM.Hardware_Model.PE import ProcessElement
 from MNSIM.Hardware_Model.Buffer import buffer
-from MNSIM.Interface.interface import *
 
 
 class PE_latency_analysis():
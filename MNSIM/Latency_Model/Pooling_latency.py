@@ -1,6 +1,5 @@
 #!/usr/bin/python
 # -*-coding:utf-8-*-
-import torch
 import sys
 import os
 import math
@@ -8,7 +7,6 @@ import configparser as cp
 work_path = os.path.dirname(os.getcwd())
 sys.path.append(work_path)
 from MNSIM.Hardware_Model.Buffer import buffer
-from MNSIM.Interface.interface import *
 
 class pooling_latency_analysis():
     def __init__(self, SimConfig_path, indata=0, rdata=0):
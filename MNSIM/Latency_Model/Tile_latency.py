@@ -1,13 +1,11 @@
 #!/usr/bin/python
 # -*-coding:utf-8-*-
-import torch
 import sys
 import os
 import math
 import configparser as cp
 work_path = os.path.dirname(os.getcwd())
 sys.path.append(work_path)
-from MNSIM.Interface.interface import *
 from MNSIM.Latency_Model.PE_latency import PE_latency_analysis
 
 
@@ -1,16 +1,16 @@
 #!/usr/bin/python
 # -*-coding:utf-8-*-
-import torch
 import sys
 import os
 import math
+import collections
 import configparser as cp
+import numpy as np
 work_path = os.path.dirname(os.getcwd())
 # print("ok", work_path)
 sys.path.append(work_path)
 from MNSIM.Hardware_Model import *
-from MNSIM.Hardware_Model.Tile import tile
-from MNSIM.Interface.interface import *
+from MNSIM.Hardware_Model.Tile import tile, tile_power_record
 
 
 class behavior_mapping(tile):
@@ -23,7 +23,11 @@ class behavior_mapping(tile):
         self.net_structure = NetStruct
         self.arch_config = SimConfig_path
         self.total_layer_num = len(self.net_structure)
-        self.tile_list = []
+        self.tile_read_row = []
+        self.tile_read_column = []
+            # the occupied rows/columns of the crossbars in each tile, (#tiles x #PEs in one tile x #groups in one PE) arrays
+        self.tile_power_dict = {}
+            # tile occupancy (read_row and read_column bytes) -> tile_power_record, tiles with the same occupancy share the estimation
         self.kernel_length = self.total_layer_num*[0]
         self.sliding_times = self.total_layer_num*[0]
         self.output_channel = self.total_layer_num*[0]
@@ -33,7 +37,8 @@ class behavior_mapping(tile):
         self.PE_num = self.total_layer_num*[0]
         self.tile_num = self.total_layer_num * [0]
         for i in range(self.total_layer_num):
-            self.tile_list.append([])
+            self.tile_read_row.append(np.zeros((0, self.tile_PE_total_num, self.group_num)))
+            self.tile_read_column.append(np.zeros((0, self.tile_PE_total_num, self.group_num)))
 
         self.arch_area = self.total_layer_num*[0]
         self.arch_xbar_area = self.total_layer_num*[0]
@@ -172,7 +177,8 @@ class behavior_mapping(tile):
             xbar_used_length = inputchannel_xbar * (kernelsize**2)
                 # The number of used row (length of the used cells in one column)
             # Mapping procedure start:
-            tile_index = 0
+            layer_read_row = []
+            layer_read_column = []
             current_PE_num = 0
             read_column = []
             read_row = []
@@ -206,20 +212,14 @@ class behavior_mapping(tile):
                         if current_PE_num == self.tile_PE_total_num or \
                                 ((kernel_length_2bsplit==0)&(channel_width_2bsplit==0)&(weight_precision_2bsplit==0)):
                             # print("yes")
-                            __temp_tile = tile(self.SimConfig_path)
-                            self.tile_list[layer_id].append(__temp_tile)
-                            self.tile_list[layer_id][tile_index].tile_read_config(
-                                layer_num=layer_id,
-                                activation_precision=self.activation_precision[layer_id],
-                                sliding_times=self.sliding_times[layer_id],
-                                read_row=read_row,
-                                read_column=read_column
-                            )
-                            tile_index += 1
+                            layer_read_row.append(read_row)
+                            layer_read_column.append(read_column)
                             current_PE_num = 0
                             read_column = []
                             read_row = []
-            # print(layer_id,':',self.PE_num[layer_id],self.tile_num[layer_id],tile_index)
+            self.tile_read_row[layer_id] = occupancy_array(layer_read_row, self.tile_PE_total_num, self.group_num)
+            self.tile_read_column[layer_id] = occupancy_array(layer_read_column, self.tile_PE_total_num, self.group_num)
+            # print(layer_id,':',self.PE_num[layer_id],self.tile_num[layer_id],len(layer_read_row))
 
     def behavior_mapping_area(self):
         # Notice: before calculating area, config_behavior_mapping must be executed
@@ -247,33 +247,32 @@ class behavior_mapping(tile):
 
     def behavior_mapping_utilization(self):
         # Notice: before calculating utilization, config_behavior_mapping must be executed
+        total_utilization = 0
         for i in range(self.total_layer_num):
-            for j in range(self.tile_num[i]):
-                self.arch_utilization[i] += self.tile_list[i][j].tile_utilization
-                self.arch_total_utilization += self.tile_list[i][j].tile_utilization
-            self.arch_utilization[i] /= self.tile_num[i]
-        self.arch_total_utilization /= sum(self.tile_num)
+            tile_utilization = (self.tile_read_row[i] * self.tile_read_column[i]).sum(axis=(1, 2)) \
+                               / (self.xbar_row * self.xbar_column * self.group_num * self.tile_PE_total_num)
+            self.arch_utilization[i] = tile_utilization.mean()
+            total_utilization += tile_utilization.sum()
+        self.arch_total_utilization = total_utilization / sum(self.tile_num)
 
     def behavior_mapping_latency(self):
         # Notice: before calculating latency, config_behavior_mapping must be executed
         # unit: ns
         # TODO: add arch level adder tree estimation
         for i in range(self.total_layer_num):
-            temp_latency = 0
-            latency_index = 0
-            for j in range(self.tile_num[i]):
-                self.tile_list[i][j].calculate_tile_read_latency()
-                if self.tile_list[i][j].tile_read_latency > temp_latency:
-                    latency_index = j
-            self.arch_latency[i] = self.tile_list[i][latency_index].tile_read_latency
-            self.arch_xbar_latency[i] = self.tile_list[i][latency_index].tile_xbar_read_latency
-            self.arch_ADC_latency[i] = self.tile_list[i][latency_index].tile_ADC_read_latency
-            self.arch_DAC_latency[i] = self.tile_list[i][latency_index].tile_DAC_read_latency
-            self.arch_digital_latency[i] = self.tile_list[i][latency_index].tile_digital_read_latency
-            self.arch_adder_latency[i] = self.tile_list[i][latency_index].tile_adder_read_latency
-            self.arch_shiftreg_latency[i] = self.tile_list[i][latency_index].tile_shiftreg_read_latency
-            self.arch_input_demux_latency[i] = self.tile_list[i][latency_index].tile_input_demux_read_latency
-            self.arch_output_mux_latency[i] = self.tile_list[i][latency_index].tile_output_mux_read_latency
+            tile_latency = self.calculate_tile_read_latency_occupancy(self.tile_read_row[i], self.tile_read_column[i],
+                                                                      self.activation_precision[i], self.sliding_times[i])
+            # the slowest tile decides the layer latency
+            latency_index = np.argmax(tile_latency['total'])
+            self.arch_latency[i] = tile_latency['total'][latency_index]
+            self.arch_xbar_latency[i] = tile_latency['xbar'][latency_index]
+            self.arch_ADC_latency[i] = tile_latency['ADC'][latency_index]
+            self.arch_DAC_latency[i] = tile_latency['DAC'][latency_index]
+            self.arch_digital_latency[i] = tile_latency['digital'][latency_index]
+            self.arch_adder_latency[i] = tile_latency['adder'][latency_index]
+            self.arch_shiftreg_latency[i] = tile_latency['shiftreg'][latency_index]
+            self.arch_input_demux_latency[i] = tile_latency['input_demux'][latency_index]
+            self.arch_output_mux_latency[i] = tile_latency['output_mux'][latency_index]
         self.arch_total_latency = sum(self.arch_latency)
         self.arch_total_xbar_latency = sum(self.arch_xbar_latency)
         self.arch_total_ADC_latency = sum(self.arch_ADC_latency)
@@ -284,22 +283,42 @@ class behavior_mapping(tile):
         self.arch_total_input_demux_latency = sum(self.arch_input_demux_latency)
         self.arch_total_output_mux_latency = sum(self.arch_output_mux_latency)
 
+    def get_tile_read_power_occupancy(self, layer_id):
+        # read power of each tile of this layer, only the first tile of each new occupancy is estimated
+        # return: an OrderedDict of the read power of each tile (arrays with the length of #tiles), unit: W
+        tile_occupancy = np.concatenate((self.tile_read_row[layer_id], self.tile_read_column[layer_id]), axis=1)
+        tile_occupancy = tile_occupancy.reshape(len(tile_occupancy), 2*self.tile_PE_total_num*self.group_num)
+        unique_occupancy, tile_index = np.unique(tile_occupancy, axis=0, return_inverse=True)
+        key_list = [occupancy.tobytes() for occupancy in unique_occupancy]
+        new_occupancy = [j for j in range(len(key_list)) if key_list[j] not in self.tile_power_dict]
+        if len(new_occupancy) > 0:
+            # all the new occupancies of this layer are estimated in one array call
+            new_tile = unique_occupancy[new_occupancy].reshape(len(new_occupancy), 2*self.tile_PE_total_num, self.group_num)
+            tile_power = self.calculate_tile_read_power_occupancy(new_tile[:, :self.tile_PE_total_num],
+                                                                  new_tile[:, self.tile_PE_total_num:])
+            for index, j in enumerate(new_occupancy):
+                self.tile_power_dict[key_list[j]] = tile_power_record(
+                    *[float(tile_power[field][index]) for field in tile_power_record._fields])
+        record_array = np.array([self.tile_power_dict[key] for key in key_list])
+        record_array = record_array.reshape(len(key_list), len(tile_power_record._fields))
+        tile_index = tile_index.ravel()
+        return collections.OrderedDict((field, record_array[tile_index, k]) for k, field in enumerate(tile_power_record._fields))
+
     def behavior_mapping_power(self):
         # Notice: before calculating power, config_behavior_mapping must be executed
         # unit: W
         # TODO: add arch level adder tree estimation
         for i in range(self.total_layer_num):
-            for j in range(self.tile_num[i]):
-                self.tile_list[i][j].calculate_tile_read_power()
-                self.arch_power[i] += self.tile_list[i][j].tile_read_power
-                self.arch_xbar_power[i] += self.tile_list[i][j].tile_xbar_read_power
-                self.arch_ADC_power[i] += self.tile_list[i][j].tile_ADC_read_power
-                self.arch_DAC_power[i] += self.tile_list[i][j].tile_DAC_read_power
-                self.arch_digital_power[i] += self.tile_list[i][j].tile_digital_read_power
-                self.arch_adder_power[i] += self.tile_list[i][j].tile_adder_read_power
-                self.arch_shiftreg_power[i] += self.tile_list[i][j].tile_shiftreg_read_power
-                self.arch_input_demux_power[i] += self.tile_list[i][j].tile_input_demux_read_power
-                self.arch_output_mux_power[i] += self.tile_list[i][j].tile_output_mux_read_power
+            tile_power = self.get_tile_read_power_occupancy(i)
+            self.arch_power[i] = tile_power['total'].sum()
+            self.arch_xbar_power[i] = tile_power['xbar'].sum()
+            self.arch_ADC_power[i] = tile_power['ADC'].sum()
+            self.arch_DAC_power[i] = tile_power['DAC'].sum()
+            self.arch_digital_power[i] = tile_power['digital'].sum()
+            self.arch_adder_power[i] = tile_power['adder'].sum()
+            self.arch_shiftreg_power[i] = tile_power['shiftreg'].sum()
+            self.arch_input_demux_power[i] = tile_power['input_demux'].sum()
+            self.arch_output_mux_power[i] = tile_power['output_mux'].sum()
         self.arch_total_power = sum(self.arch_power)
         self.arch_total_xbar_power = sum(self.arch_xbar_power)
         self.arch_total_ADC_power = sum(self.arch_ADC_power)
@@ -315,17 +334,23 @@ class behavior_mapping(tile):
         # unit: nJ
         # TODO: add arch level adder tree estimation
         for i in range(self.total_layer_num):
-            for j in range(self.tile_num[i]):
-                self.tile_list[i][j].calculate_tile_read_energy()
-                self.arch_energy[i] += self.tile_list[i][j].tile_read_energy
-                self.arch_xbar_energy[i] += self.tile_list[i][j].tile_xbar_read_energy
-                self.arch_ADC_energy[i] += self.tile_list[i][j].tile_ADC_read_energy
-                self.arch_DAC_energy[i] += self.tile_list[i][j].tile_DAC_read_energy
-                self.arch_digital_energy[i] += self.tile_list[i][j].tile_digital_read_energy
-                self.arch_adder_energy[i] += self.tile_list[i][j].tile_adder_read_energy
-                self.arch_shiftreg_energy[i] += self.tile_list[i][j].tile_shiftreg_read_energy
-                self.arch_input_demux_energy[i] += self.tile_list[i][j].tile_input_demux_read_energy
-                self.arch_output_mux_energy[i] += self.tile_list[i][j].tile_output_mux_read_energy
+            tile_power = self.get_tile_read_power_occupancy(i)
+            tile_latency = self.calculate_tile_read_latency_occupancy(self.tile_read_row[i], self.tile_read_column[i],
+                                                                      self.activation_precision[i], self.sliding_times[i])
+            tile_energy = dict((key, tile_power[key] * tile_latency[key]) for key in
+                               ['xbar', 'ADC', 'DAC', 'adder', 'shiftreg', 'jointmodule', 'input_demux', 'output_mux'])
+            tile_energy['digital'] = tile_energy['adder'] + tile_energy['shiftreg'] + tile_energy['input_demux'] \
+                                     + tile_energy['output_mux'] + tile_energy['jointmodule']
+            self.arch_xbar_energy[i] = tile_energy['xbar'].sum()
+            self.arch_ADC_energy[i] = tile_energy['ADC'].sum()
+            self.arch_DAC_energy[i] = tile_energy['DAC'].sum()
+            self.arch_digital_energy[i] = tile_energy['digital'].sum()
+            self.arch_adder_energy[i] = tile_energy['adder'].sum()
+            self.arch_shiftreg_energy[i] = tile_energy['shiftreg'].sum()
+            self.arch_input_demux_energy[i] = tile_energy['input_demux'].sum()
+            self.arch_output_mux_energy[i] = tile_energy['output_mux'].sum()
+            self.arch_energy[i] = self.arch_xbar_energy[i] + self.arch_ADC_energy[i] + self.arch_DAC_energy[i] \
+                                  + self.arch_digital_energy[i] + self.tile_num[i] * self.tile_buffer.buf_renergy
         self.arch_total_energy = sum(self.arch_energy)
         self.arch_total_xbar_energy = sum(self.arch_xbar_energy)
         self.arch_total_ADC_energy = sum(self.arch_ADC_energy)
@@ -422,7 +447,21 @@ class behavior_mapping(tile):
         print("Hardware energy efficiency:", self.arch_energy_efficiency, " GOPs/W")
 
 
+def occupancy_array(occupancy, PE_num, group_num):
+    # pack the occupancy lists of the mapped tiles into one array
+    # occupancy: a list (#tiles) of 2D lists (#occupied PEs x #occupied groups) of occupied rows or columns
+    # return: a (#tiles x PE_num x group_num) array, the unoccupied PEs and groups are 0
+    occupancy_matrix = np.zeros((len(occupancy), PE_num, group_num))
+    for i, tile_occupancy in enumerate(occupancy):
+        assert len(tile_occupancy) <= PE_num, "The length of read_row exceeds the PE number in one tile"
+        for j, PE_occupancy in enumerate(tile_occupancy):
+            assert len(PE_occupancy) <= group_num, "The length of read_row exceeds the group number in one PE"
+            occupancy_matrix[i, j, :len(PE_occupancy)] = PE_occupancy
+    return occupancy_matrix
+
+
 if __name__ == '__main__':
+    from MNSIM.Interface.interface import TrainTestInterface
     test_SimConfig_path = os.path.join(os.path.dirname(os.path.dirname(os.getcwd())), "SimConfig.ini")
     test_weights_file_path = os.path.join(os.path.dirname(os.path.dirname(os.getcwd())),
                                           "alexnet_channels_bit/alexnet_16_5_params.pth")
@@ -1,18 +1,19 @@
 #!/usr/bin/python
 # -*-coding:utf-8-*-
-import torch
 import sys
 import os
 import math
+import functools
 import configparser as cp
+import numpy as np
 work_path = os.path.dirname(os.getcwd())
 sys.path.append(work_path)
 from MNSIM.Hardware_Model import *
 from MNSIM.Hardware_Model.Crossbar import crossbar
-from MNSIM.Hardware_Model.Tile import tile
-from MNSIM.Interface.interface import *
+from MNSIM.Hardware_Model.Tile import tile, layer_type_code
+from MNSIM.Latency_Model.Pooling_latency import pooling_latency_analysis
+from MNSIM.NoC.interconnect_estimation import NoC_input, layer_ip_activation
 import collections
-import pandas as pd
 
 class PE_node():
     def __init__(self, PE_id = 0, ltype='conv', lnum = 0):
@@ -57,142 +58,114 @@ class Merge_node():
             self.outMerge_list.sort()
 
 def generate_normal_matrix(row, column):
-    matrix = np.zeros([row,column])
-    start = 0
-    for i in range(row):
-        for j in range(column):
-            matrix[i][j] = start
-            start += 1
-    return matrix
+    return np.arange(row*column, dtype=float).reshape(row, column)
 
 def generate_snake_matrix (row, column):
-    matrix = np.zeros([row,column])
-    start = 0
-    for i in range(row):
-        for j in range(column):
-            if i % 2:
-                matrix[i][column - j - 1] = start
-            else:
-                matrix[i][j] = start
-            start += 1
+    matrix = generate_normal_matrix(row, column)
+    matrix[1::2] = matrix[1::2, ::-1]
+        # the odd rows are placed from right to left
     return matrix
 
 def generate_hui_matrix (row, column):
-    matrix = np.zeros([row,column])
-    state = 0
-    stride = 1
-    step = 0
-    start = 0
-    dl = 0
-    ru = 0
-    i = 0
-    j = 0
-    for x in range(row*column):
-        if x == 0:
-            matrix[i][j] = start
-        else:
-            if state == 0:
-                j += 1
-                matrix[i][j] = start
-                state = 1
-            elif state == 1:
-                if dl == 0:
-                    i += 1
-                    matrix[i][j] = start
-                    step += 1
-                    if step == stride:
-                        dl = 1
-                        step = 0
-                elif dl == 1:
-                    j -= 1
-                    matrix[i][j] = start
-                    step += 1
-                    if step == stride:
-                        dl = 0
-                        step = 0
-                        stride += 1
-                        state = 2
-            elif state == 2:
-                i += 1
-                matrix[i][j] = start
-                state = 3
-            elif state == 3:
-                if ru == 0:
-                    j += 1
-                    matrix[i][j] = start
-                    step += 1
-                    if step == stride:
-                        ru = 1
-                        step = 0
-                elif ru == 1:
-                    i -= 1
-                    matrix[i][j] = start
-                    step += 1
-                    if step == stride:
-                        ru = 0
-                        step = 0
-                        stride += 1
-                        state = 0
-        start += 1
-    return matrix
+    # square shells (i or j == m) are placed one by one, alternating between
+    # right-down-left (m is odd: top to bottom, then right to left) and down-right-up (m is even)
+    # in non-square tile arrays the positions of the shells outside the tile array are skipped
+    i, j = np.indices([row, column])
+    m = np.maximum(i, j)
+    odd_shell_offset = np.where(j == m, i, 2*m - j)
+    even_shell_offset = np.where(i == m, j, 2*m - i)
+    shell_order = (m**2 + np.where(m % 2, odd_shell_offset, even_shell_offset)).ravel()
+    matrix = np.zeros(row*column)
+    matrix[np.argsort(shell_order, kind='stable')] = np.arange(row*column)
+    return matrix.reshape(row, column)
 
 def generate_zigzag_matrix(row, column):
-    matrix = np.zeros([row,column])
-    state = 0
-    stride = 1
-    step = 0
-    i = 0
-    j = 0
-    start = 0
-    for x in range(row*column):
-        if x == 0:
-            matrix[i][j] = start
-        else:
-            if state == 0:
-                if j < column-1:
-                    j += 1
-                    matrix[i][j] = start
-                else:
-                    i += 1
-                    matrix[i][j] = start
-                state = 1
-            elif state == 1:
-                i += 1
-                j -= 1
-                matrix[i][j] = start
-                step += 1
-                if i == row-1:
-                    state = 2
-                    stride -= 1
-                    step = 0
-                elif step == stride:
-                    state = 2
-                    stride += 1
-                    step = 0
-            elif state == 2:
-                if i < row-1:
-                    i += 1
-                    matrix[i][j] = start
-                else:
-                    j += 1
-                    matrix[i][j] = start
-                state = 3
-            elif state ==3:
-                j += 1
-                i -= 1
-                matrix[i][j] = start
-                step += 1
-                if j == column-1:
-                    state = 0
-                    stride -= 1
-                    step = 0
-                elif step == stride:
-                    state = 0
-                    stride += 1
-                    step = 0
-        start += 1
+    # anti-diagonals (i+j) are placed in order, downwards on the odd diagonals and upwards on the even ones
+    i, j = np.indices([row, column])
+    diagonal = (i + j).ravel()
+    order = np.lexsort((np.where(diagonal % 2, i.ravel(), -i.ravel()), diagonal))
+    matrix = np.zeros(row*column)
+    matrix[order] = np.arange(row*column)
+    return matrix.reshape(row, column)
+
+def generate_hilbert_matrix(row, column):
+    # the tiles are placed along the Hilbert curve of the smallest 2^k x 2^k array covering the tile array,
+    # the positions outside the tile array are skipped
+    n = 1 << max(row - 1, column - 1, 1).bit_length()
+    x, y = np.indices([row, column])
+    x = x.ravel()
+    y = y.ravel()
+    d = np.zeros(row*column, dtype=np.int64)
+    s = n // 2
+    while s > 0:
+        rx = (x & s) > 0
+        ry = (y & s) > 0
+        d += s * s * ((3 * rx) ^ ry)
+        # rotate the quadrant
+        flip = (~ry) & rx
+        x = np.where(flip, s - 1 - x, x)
+        y = np.where(flip, s - 1 - y, y)
+        x, y = np.where(~ry, y, x), np.where(~ry, x, y)
+        x = x % s
+        y = y % s
+        s //= 2
+    matrix = np.zeros(row*column)
+    matrix[np.argsort(d, kind='stable')] = np.arange(row*column)
+    return matrix.reshape(row, column)
+
+mapping_order_generator = {
+    0: generate_normal_matrix,
+    1: generate_snake_matrix,
+    2: generate_hui_matrix,
+    3: generate_zigzag_matrix,
+    4: generate_hilbert_matrix
+}
+
+@functools.lru_cache(maxsize=64)
+def generate_mapping_order(row, column, tile_connection):
+    # the mapping order only depends on the tile array size and the tile connection, it is generated once
+    # return: a read-only (row x column) matrix, copy it before modification
+    assert tile_connection in mapping_order_generator, "Tile connection must be 0, 1, 2, 3 or 4"
+    matrix = mapping_order_generator[tile_connection](row, column)
+    matrix.flags.writeable = False
     return matrix
 
+def max_manhattan_distance(src_pos, dst_pos):
+    # src_pos: (n x 2) array, dst_pos: (m x 2) array of tile positions
+    # return: the max Manhattan distance from each tile in src_pos to the tiles in dst_pos (0 if dst_pos is empty)
+    # |dx|+|dy| = max(|du|, |dv|) with u = x+y and v = x-y, so only the extremes of u and v in dst_pos are needed
+    if len(dst_pos) == 0:
+        return np.zeros(len(src_pos), dtype=int)
+    src_u = src_pos[:, 0] + src_pos[:, 1]
+    src_v = src_pos[:, 0] - src_pos[:, 1]
+    dst_u = dst_pos[:, 0] + dst_pos[:, 1]
+    dst_v = dst_pos[:, 0] - dst_pos[:, 1]
+    return np.maximum.reduce([src_u - dst_u.min(), dst_u.max() - src_u, src_v - dst_v.min(), dst_v.max() - src_v])
+
+def layer_buffer_demand(layer_dict):
+    # the input data of one layer kept in the tile buffer, unit: Byte
+    # conv/pooling: the line buffer of Kernelsize input rows, fc: the input vector
+    if layer_dict['type'] == 'fc':
+        return int(layer_dict['Infeature']) * int(layer_dict['Inputbit']) / 8
+    return int(layer_dict['Inputsize'][1]) * int(layer_dict['Kernelsize']) * int(layer_dict['Inputchannel']) \
+           * int(layer_dict['Inputbit']) / 8
+
+def layer_output_volume(layer_dict):
+    # the output data of one layer, unit: bit
+    if layer_dict['type'] == 'fc':
+        return int(layer_dict['Outfeature']) * int(layer_dict['outputbit'])
+    return int(layer_dict['Outputsize'][0]) * int(layer_dict['Outputsize'][1]) * int(layer_dict['Outputchannel']) \
+           * int(layer_dict['outputbit'])
+
+def aggregate_distance(src_pos, dst_pos):
+    # choose the aggregate node of a layer (src_pos) which minimizes the sum of the max distance to the other
+    # tiles of this layer and the max distance to the tiles of the next layer (dst_pos)
+    # return: maxdis_in, maxdis_out, and the index of the aggregate node in src_pos
+    maxdis_in = max_manhattan_distance(src_pos, src_pos)
+    maxdis_out = max_manhattan_distance(src_pos, dst_pos)
+    A = np.argmin(maxdis_in + maxdis_out)
+    return maxdis_in[A], maxdis_out[A], A
+
 class TCG():
     def __init__(self, NetStruct, SimConfig_path, multiple=None):
         # NetStruct: layer structure, SimConfig_path: Hardware config path, multiple: allocate more resources for some layers
@@ -201,11 +174,24 @@ class TCG():
         if multiple is None:
             multiple = [1] * len(NetStruct)
         self.tile = tile(SimConfig_path)
+        self.SimConfig_path = SimConfig_path
         self.net = NetStruct
         self.layer_num = len(self.net)
         self.layer_tileinfo = []
         self.xbar_polarity = int(TCG_config.get('Process element level', 'Xbar_Polarity'))
         self.tile_connection = int(TCG_config.get('Architecture level', 'Tile_Connection'))
+        self.placement_optimization = int(TCG_config.get('Architecture level', 'Placement_Optimization', fallback='0'))
+        self.tile_packing = int(TCG_config.get('Architecture level', 'Tile_Packing', fallback='0'))
+        self.tile_buffer_capacity = float(TCG_config.get('Architecture level', 'Buffer_Capacity'))
+        if self.tile_buffer_capacity == 0:
+            self.tile_buffer_capacity = 16
+        self.tile_buffer_capacity *= 1024
+            # unit: Byte
+        self.open_tile = None
+            # the last tile whose PEs can still be shared by the next layer (tile packing)
+        self.max_chip_num = int(TCG_config.get('Architecture level', 'Chip_Num', fallback='1'))
+        assert self.max_chip_num > 0, "Chip number < 1"
+        self.weight_reprogramming = int(TCG_config.get('Architecture level', 'Weight_Reprogramming', fallback='0'))
         self.tile_num = list(map(int, TCG_config.get('Architecture level', 'Tile_Num').split(',')))
         if self.tile_num[0] == 0:
             self.tile_num[0] = 8
@@ -213,10 +199,7 @@ class TCG():
         assert self.tile_num[0] > 0, "Tile number < 0"
         assert self.tile_num[1] > 0, "Tile number < 0"
         self.tile_total_num = self.tile_num[0] * self.tile_num[1]
-        self.mapping_order = -1*np.ones(self.tile_num)
-        self.mapping_result = -1*np.ones(self.tile_num)
-        start_tileid = 0
-            # the start PEid
+            # tile number of one chip
         self.trans_time = np.ones([1, self.layer_num])
 
         num = []
@@ -229,7 +212,6 @@ class TCG():
             else:
                 assert self.xbar_polarity == 2, "Crossbar polarity must be 1 or 2"
                 weight_precision = int(layer_dict['Weightbit']) - 1
-            tmp_tileinfo['startid'] = start_tileid
             if layer_type == 'conv':
                 tmp_tileinfo['type'] = 'conv'
                 tmp_tileinfo['mx'] = math.ceil(weight_precision / self.tile.group_num) * \
@@ -280,93 +262,445 @@ class TCG():
             # print(layer_id, tmp_tileinfo['my'])
             # print(layer_id, tmp_tileinfo['PEnum'])
             # print("-----------")
-            tmp_tileinfo['tilenum'] = math.ceil(tmp_tileinfo['PEnum'] / self.tile.tile_PE_total_num)
             tmp_tileinfo['max_PE'] = min(tmp_tileinfo['PEnum'], self.tile.tile_PE_total_num)
-            start_tileid += tmp_tileinfo['tilenum']
             self.layer_tileinfo.append(tmp_tileinfo)
-        res = pd.DataFrame(num)
-        res.to_csv('MNSIM/NoC/to_interconnect/num_tiles_per_layer.csv', index=False, header=False)
+        self.noc_input = NoC_input(num, layer_ip_activation(self.net))
+            # the inputs of the NoC model, the NoC results are saved in it by interconnect_estimation
+        # the layers are partitioned into continuous segments, one segment on each chip
+        # (the tile number without tile packing is an upper bound of the tiles needed by a segment)
+        # weight reprogramming: the segments are the weight-loading phases which run one by one on the same chip,
+        # layer_chip/chip_num then refer to the phases
+        layer_tile_demand = [math.ceil(tmp_tileinfo['PEnum'] / self.tile.tile_PE_total_num)
+                             for tmp_tileinfo in self.layer_tileinfo]
+        if self.weight_reprogramming:
+            self.calculate_layer_write_cost()
+            self.layer_chip = self.partition_phase(layer_tile_demand)
+        else:
+            self.layer_chip = self.partition_chip(layer_tile_demand, [layer_output_volume(self.net[layer_id][0][0])
+                                                                      for layer_id in range(self.layer_num)])
+        self.chip_num = self.layer_chip[-1] + 1
+        self.phase_num = self.chip_num if self.weight_reprogramming else 1
+        if self.phase_num > 1:
+            self.phase_write_latency = [float(self.layer_write_latency[np.array(self.layer_chip) == phase_id].max())
+                                        for phase_id in range(self.phase_num)]
+                # the layers of one phase are programmed in parallel, unit: ns
+        self.chip_transfer_volume = np.zeros(self.layer_num)
+            # the output data of each layer sent to the next chip, unit: bit
+        self.chip_startid = []
+            # the first tile id of each chip
+        start_tileid = 0
+            # the start tile id
+        for layer_id, tmp_tileinfo in enumerate(self.layer_tileinfo):
+            if layer_id == 0 or self.layer_chip[layer_id] != self.layer_chip[layer_id-1]:
+                self.chip_startid.append(start_tileid)
+                self.open_tile = None
+                    # the tiles are never shared across chips
+            if not self.weight_reprogramming and layer_id < self.layer_num-1 and \
+                    self.layer_chip[layer_id] != self.layer_chip[layer_id+1]:
+                self.chip_transfer_volume[layer_id] = layer_output_volume(self.net[layer_id][0][0])
+            tmp_tileinfo['chip'] = self.layer_chip[layer_id]
+            if self.tile_packing:
+                start_tileid = self.pack_layer_tile(tmp_tileinfo, start_tileid,
+                                                    layer_buffer_demand(self.net[layer_id][0][0]))
+            else:
+                tmp_tileinfo['startid'] = start_tileid
+                tmp_tileinfo['tilenum'] = math.ceil(tmp_tileinfo['PEnum'] / self.tile.tile_PE_total_num)
+                tmp_tileinfo['PE_placement'] = [(start_tileid + i, 0, min(self.tile.tile_PE_total_num,
+                                                 tmp_tileinfo['PEnum'] - i * self.tile.tile_PE_total_num))
+                                                for i in range(tmp_tileinfo['tilenum'])]
+                    # PE_placement: (tile id, first PE, PE number) of each tile used by this layer
+                start_tileid += tmp_tileinfo['tilenum']
+        self.mapping_order = -1*np.ones([self.chip_num] + self.tile_num)
+        self.mapping_result = -1*np.ones([self.chip_num] + self.tile_num)
+            # the tile array of each chip
         self.tile_num = start_tileid
-        assert self.tile_num <= self.tile_total_num, "Tile number is not enough"
+            # used tile number of all the chips
+        self.chip_tile_num = np.diff(self.chip_startid + [self.tile_num])
+        assert (self.chip_tile_num <= self.tile_total_num).all(), "Tile number is not enough"
+        # the tiles shared by several layers are shared in proportion to their PE numbers
+        tile_PE_num = np.zeros(self.tile_num)
+        for tmp_tileinfo in self.layer_tileinfo:
+            for tile_id, _, PE_num in tmp_tileinfo['PE_placement']:
+                tile_PE_num[tile_id] += PE_num
+        for tmp_tileinfo in self.layer_tileinfo:
+            tmp_tileinfo['tile_share'] = sum(PE_num / tile_PE_num[tile_id] for tile_id, _, PE_num in tmp_tileinfo['PE_placement'])
+                # tile_share: the (fractional) number of tiles used by this layer, equal to tilenum without tile packing
         self.inLayer_distance = np.ones([1, self.layer_num])
         self.transLayer_distance = np.ones([1, self.layer_num])
         self.aggregate_arg = np.zeros([self.layer_num,2])
 
+    def get_layer_tileinfo_array(self):
+        # columnar form of layer_tileinfo: each key maps to a numpy array with one element per layer
+        tileinfo_array = collections.OrderedDict()
+        for key in ['startid', 'tilenum', 'PEnum', 'max_PE', 'max_group', 'max_row', 'max_column', 'mx', 'my', 'chip']:
+            tileinfo_array[key] = np.array([tmp_tileinfo[key] for tmp_tileinfo in self.layer_tileinfo], dtype=int)
+        tileinfo_array['type'] = np.array([layer_type_code[tmp_tileinfo['type']] for tmp_tileinfo in self.layer_tileinfo], dtype=int)
+        tileinfo_array['tile_share'] = np.array([tmp_tileinfo['tile_share'] for tmp_tileinfo in self.layer_tileinfo], dtype=float)
+        return tileinfo_array
+
+    def partition_chip(self, layer_tile_demand, cut_volume):
+        # multi-chip partition: split the layer sequence into the least continuous segments fitting one chip each,
+        # among them choose the one with the least inter-chip data (the output volume of the layers before the cuts),
+        # and then the least tile number of the most used chip (balanced tile usage)
+        # layer_tile_demand: tile number of each layer, cut_volume: output volume of each layer (unit: bit)
+        # return: the chip id of each layer
+        assert max(layer_tile_demand) <= self.tile_total_num, "Tile number is not enough"
+        prefix = np.cumsum([0] + layer_tile_demand)
+        cost = {0: (0, 0)}
+            # cost[i]: (inter-chip data, max chip tile number) of the best split of the first i layers
+        boundary = []
+            # boundary[k][i]: the first layer on chip k in the best split of the first i layers
+        for chip_id in range(self.max_chip_num):
+            new_cost = dict()
+            new_boundary = dict()
+            for i in range(1, self.layer_num+1):
+                for j, (volume, max_tile) in cost.items():
+                    if j >= i or prefix[i] - prefix[j] > self.tile_total_num:
+                        continue
+                    candidate = (volume + (cut_volume[j-1] if j > 0 else 0), max(max_tile, prefix[i] - prefix[j]))
+                    if i not in new_cost or candidate < new_cost[i]:
+                        new_cost[i] = candidate
+                        new_boundary[i] = j
+            cost = new_cost
+            boundary.append(new_boundary)
+            if self.layer_num in cost:
+                break
+        assert self.layer_num in cost, "Tile number is not enough, increase Chip_Num"
+        layer_chip = [0] * self.layer_num
+        i = self.layer_num
+        for chip_id in range(len(boundary)-1, -1, -1):
+            j = boundary[chip_id][i]
+            layer_chip[j:i] = [chip_id] * (i-j)
+            i = j
+        return layer_chip
+
+    def calculate_layer_write_cost(self):
+        # weight programming cost of each layer with the crossbar write path (PE_write_config),
+        # the tiles are programmed in parallel and the PEs in one tile one by one
+        # layer_write_latency: unit: ns, layer_write_energy: unit: nJ
+        self.layer_write_latency = np.zeros(self.layer_num)
+        self.layer_write_energy = np.zeros(self.layer_num)
+        for layer_id, tmp_tileinfo in enumerate(self.layer_tileinfo):
+            if tmp_tileinfo['type'] == 'pooling':
+                continue
+            self.tile.PE_write_config(write_row=[tmp_tileinfo['max_row']] * tmp_tileinfo['max_group'],
+                                      write_column=[tmp_tileinfo['max_column']] * tmp_tileinfo['max_group'])
+            self.tile.calculate_PE_write_latency()
+            self.tile.calculate_PE_write_power()
+            self.tile.calculate_PE_write_energy()
+            self.layer_write_latency[layer_id] = self.tile.PE_write_latency * tmp_tileinfo['max_PE']
+            self.layer_write_energy[layer_id] = self.tile.PE_write_energy * tmp_tileinfo['PEnum']
+
+    def partition_phase(self, layer_tile_demand):
+        # weight reprogramming: split the layer sequence into continuous weight-loading phases fitting the chip,
+        # minimizing the total latency sum(phase write latency + phase computing latency)
+        # the computing latency of one phase is estimated from the tile latency of one output point (the pooling
+        # latency for the pooling layers): layer l starts after the previous layers of the phase have produced
+        # trans_time points, and lasts for all its output points
+        # the partition with fewer phases is taken when the latencies are the same
+        # return: the phase id of each layer
+        assert max(layer_tile_demand) <= self.tile_total_num, "Tile number is not enough"
+        point_latency = np.zeros(self.layer_num)
+        point_num = np.ones(self.layer_num)
+        for layer_id, tmp_tileinfo in enumerate(self.layer_tileinfo):
+            layer_dict = self.net[layer_id][0][0]
+            if layer_dict['type'] != 'fc':
+                point_num[layer_id] = int(layer_dict['Outputsize'][0]) * int(layer_dict['Outputsize'][1])
+            if layer_dict['type'] == 'pooling':
+                # one output point in the steady state (see Model_latency)
+                inputchannel = int(layer_dict['Inputchannel'])
+                inputbit = int(layer_dict['Inputbit'])
+                stride = int(layer_dict['Stride'])
+                kernelsize = int(layer_dict['Kernelsize'])
+                temp_pooling_latency = pooling_latency_analysis(SimConfig_path=self.SimConfig_path, indata=0, rdata=0)
+                temp_pooling_latency.update_pooling_latency(actual_num=stride ** 2, layer_size=kernelsize,
+                                                            indata=inputchannel * stride ** 2 * inputbit / 8,
+                                                            rdata=stride * kernelsize * inputchannel * inputbit / 8)
+                point_latency[layer_id] = temp_pooling_latency.pooling_latency
+                continue
+            read_row = np.zeros([1, self.tile.tile_PE_total_num, self.tile.group_num])
+            read_column = np.zeros([1, self.tile.tile_PE_total_num, self.tile.group_num])
+            read_row[0, :tmp_tileinfo['max_PE'], :tmp_tileinfo['max_group']] = tmp_tileinfo['max_row']
+            read_column[0, :tmp_tileinfo['max_PE'], :tmp_tileinfo['max_group']] = tmp_tileinfo['max_column']
+            point_latency[layer_id] = self.tile.calculate_tile_read_latency_occupancy(
+                read_row, read_column, int(layer_dict['Inputbit']), 1)['total'][0]
+        fill_prefix = np.cumsum(np.append(0, self.trans_time[0] * point_latency))
+            # fill_prefix[l]: the start time of layer l if the phase starts from layer 0
+        finish = fill_prefix[:-1] + point_latency * point_num
+        prefix = np.cumsum([0] + layer_tile_demand)
+        cost = np.append(0, np.inf * np.ones(self.layer_num))
+            # cost[i]: the least latency of the first i layers
+        boundary = np.zeros(self.layer_num+1, dtype=int)
+            # boundary[i]: the first layer of the last phase in the best partition of the first i layers
+        phase_count = np.zeros(self.layer_num+1, dtype=int)
+            # phase_count[i]: the phase number of the best partition of the first i layers
+        for i in range(1, self.layer_num+1):
+            for j in range(i-1, -1, -1):
+                if prefix[i] - prefix[j] > self.tile_total_num:
+                    break
+                phase_latency = self.layer_write_latency[j:i].max() + finish[j:i].max() - fill_prefix[j]
+                new_cost = cost[j] + phase_latency
+                if new_cost < cost[i] * (1 - 1e-9) or \
+                        (new_cost <= cost[i] * (1 + 1e-9) and phase_count[j] + 1 < phase_count[i]):
+                    cost[i] = new_cost
+                    boundary[i] = j
+                    phase_count[i] = phase_count[j] + 1
+        segment = []
+        i = self.layer_num
+        while i > 0:
+            segment.append((boundary[i], i))
+            i = boundary[i]
+        layer_chip = [0] * self.layer_num
+        for phase_id, (j, i) in enumerate(reversed(segment)):
+            layer_chip[j:i] = [phase_id] * (i-j)
+        return layer_chip
+
+    def pack_layer_tile(self, tileinfo, start_tileid, buffer_demand):
+        # next-fit tile packing: the remaining PEs of a layer (PEnum % PE number in one tile) share the last tile
+        # of the previous layer when they fit in it, so that the tiles of each layer are still continuous in id
+        # the joint modules merge the PE outputs along an H-tree, so the PEs of one layer in a shared tile are
+        # aligned to a subtree (power-of-two block), and the buffer data of the layers in a shared tile must fit
+        # the tile buffer (buffer_demand: unit: Byte)
+        # return: the next free tile id
+        PE_total_num = self.tile.tile_PE_total_num
+        full_tile = tileinfo['PEnum'] // PE_total_num
+        remain_PE = tileinfo['PEnum'] % PE_total_num
+        if remain_PE > 0 and self.open_tile is not None:
+            block = 2 ** math.ceil(math.log2(remain_PE))
+            offset = math.ceil(self.open_tile['used_PE'] / block) * block
+            if offset + block <= PE_total_num and \
+                    self.open_tile['buffer'] + buffer_demand <= self.tile_buffer_capacity:
+                tileinfo['startid'] = self.open_tile['id']
+                tileinfo['PE_placement'] = [(self.open_tile['id'], offset, remain_PE)] + \
+                                           [(start_tileid + i, 0, PE_total_num) for i in range(full_tile)]
+                tileinfo['tilenum'] = full_tile + 1
+                self.open_tile['used_PE'] = offset + block
+                self.open_tile['buffer'] += buffer_demand
+                if full_tile > 0:
+                    self.open_tile = None
+                return start_tileid + full_tile
+        tileinfo['startid'] = start_tileid
+        tileinfo['PE_placement'] = [(start_tileid + i, 0, PE_total_num) for i in range(full_tile)]
+        if remain_PE > 0:
+            tileinfo['PE_placement'].append((start_tileid + full_tile, 0, remain_PE))
+            self.open_tile = {'id': start_tileid + full_tile, 'used_PE': 2 ** math.ceil(math.log2(remain_PE)),
+                              'buffer': buffer_demand}
+        else:
+            self.open_tile = None
+        tileinfo['tilenum'] = len(tileinfo['PE_placement'])
+        return start_tileid + tileinfo['tilenum']
+
+    def layer_tile_mask(self, layer_id, mapping_order=None):
+        # the positions of the tiles used by one layer (tile id in [startid, startid + tilenum)),
+        # the tiles shared by several layers (tile packing) belong to all of them
+        if mapping_order is None:
+            mapping_order = self.mapping_order
+        startid = self.layer_tileinfo[layer_id]['startid']
+        return (mapping_order >= startid) & (mapping_order < startid + self.layer_tileinfo[layer_id]['tilenum'])
+
     def mapping_matrix_gen(self):
-        if self.tile_connection == 0:
-            self.mapping_order = generate_normal_matrix(self.mapping_order.shape[0], self.mapping_order.shape[1])
-        elif self.tile_connection == 1:
-            self.mapping_order = generate_snake_matrix(self.mapping_order.shape[0], self.mapping_order.shape[1])
-        elif self.tile_connection == 2:
-            self.mapping_order = generate_hui_matrix(self.mapping_order.shape[0], self.mapping_order.shape[1])
-        elif self.tile_connection == 3:
-            self.mapping_order = generate_zigzag_matrix(self.mapping_order.shape[0], self.mapping_order.shape[1])
+        # all the chips use the same tile order, the tile ids on chip c start from chip_startid[c]
+        order = generate_mapping_order(self.mapping_order.shape[1], self.mapping_order.shape[2], self.tile_connection)
+        self.mapping_order = np.where(order < self.chip_tile_num[:, None, None],
+                                      order + np.array(self.chip_startid)[:, None, None], -1).astype(float)
+            # -1: unused tile
+
+    def update_mapping_result(self):
+        # the layer of each tile is the last layer whose startid <= mapping order (layers own [startid, next startid)),
+        # a tile shared by several layers is marked with the last one (see layer_tile_mask)
+        startid = np.array([tmp_tileinfo['startid'] for tmp_tileinfo in self.layer_tileinfo])
+        layer_id = np.searchsorted(startid, self.mapping_order, side='right') - 1
+        self.mapping_result = np.where(self.mapping_order >= 0, layer_id, -1).astype(float)
+            # -1: unused tile
+        self.noc_input.set_placement([np.flatnonzero(self.layer_tile_mask(layer_id)) for layer_id in range(self.layer_num)],
+                                     self.mapping_order.shape[1:], self.layer_chip,
+                                     1 if self.weight_reprogramming else self.chip_num)
+            # the weight-loading phases run on the same chip
 
     def mapping_net(self):
         self.mapping_matrix_gen()
-        for i in range(self.mapping_order.shape[0]):
-            for j in range(self.mapping_order.shape[1]):
-                if self.mapping_order[i][j] < self.tile_num:
-                    for layer_id in range(self.layer_num-1):
-                        if ((self.mapping_order[i][j] >= self.layer_tileinfo[layer_id]['startid']) &
-                            (self.mapping_order[i][j] < self.layer_tileinfo[layer_id + 1]['startid'])):
-                            self.mapping_result[i][j] = layer_id
-                            break
-                        elif self.mapping_order[i][j] >= self.layer_tileinfo[self.layer_num - 1]['startid']:
-                            self.mapping_result[i][j] = self.layer_num-1
+        self.update_mapping_result()
+        if self.placement_optimization != 0:
+            self.optimize_placement(method=self.placement_optimization)
+
+    def optimize_placement(self, method=2, iteration=None, seed=0):
+        # search the tile placement (mapping_order) minimizing the total transfer distance
+        # sum(trans_time * (inLayer_distance + transLayer_distance)) by swapping the positions of two tiles
+        # method: 1: greedy swap (only accept the improving swaps), 2: simulated annealing (range-limited swaps)
+        # iteration: number of the candidate swaps, default: 20 x tile number of the accelerator
+        # Notice: mapping_net must be executed before, the best placement is written back to mapping_order/mapping_result
+        # return: the best cost (the weighted transfer distance plus the hop tie-breaker, which is < 1)
+        assert method in [1, 2], "Placement optimization method must be 1 (greedy) or 2 (annealing)"
+        random_state = np.random.RandomState(seed)
+        position = np.argwhere(np.ones(self.mapping_order.shape))[:, 1:]
+            # the position of each tile in its chip (in flat index order)
+        tile_order = self.mapping_order.ravel().astype(int)
+        total_tile = len(tile_order)
+        if iteration is None:
+            iteration = 20 * total_tile
+        startid = [tmp_tileinfo['startid'] for tmp_tileinfo in self.layer_tileinfo]
+        layer_tile = [np.flatnonzero(self.layer_tile_mask(layer_id, tile_order)) for layer_id in range(self.layer_num)]
+        for layer_id in range(self.layer_num):
+            # sorted by tile id: the tile with id x is layer_tile[layer_id][x - startid]
+            layer_tile[layer_id] = layer_tile[layer_id][np.argsort(tile_order[layer_tile[layer_id]])]
+        tile_layer = [[] for _ in range(self.tile_num + 1)]
+            # the layers using each tile id (the last one: unused tile, id -1)
+        for layer_id in range(self.layer_num):
+            for tile_id in tile_order[layer_tile[layer_id]]:
+                tile_layer[tile_id].append(layer_id)
+
+        array_row, array_column = self.mapping_order.shape[1:]
+        hop_weight = 0.5 / (total_tile * (array_row + array_column))
+            # tie-breaker: the total hops from the tiles of each layer to its aggregate node, weighted such that
+            # the sum over all layers stays below 1 (the smallest change of the weighted transfer distance)
+        def layer_cost(layer_id):
+            # the weighted transfer distance of one layer only depends on the tiles of this layer and the next layer
+            if len(layer_tile[layer_id]) == 0:
+                return 0
+            if layer_id < self.layer_num-1 and self.layer_chip[layer_id+1] == self.layer_chip[layer_id]:
+                dst_pos = position[layer_tile[layer_id+1]]
+            else:
+                dst_pos = np.zeros([0, 2], dtype=int)
+            src_pos = position[layer_tile[layer_id]]
+            maxdis_in, maxdis_out, A = aggregate_distance(src_pos, dst_pos)
+            return self.trans_time[0][layer_id] * (maxdis_in + maxdis_out) \
+                   + hop_weight * np.abs(src_pos - src_pos[A]).sum()
+
+        def swap(p, q):
+            for layer_id in tile_layer[tile_order[p]]:
+                layer_tile[layer_id][tile_order[p] - startid[layer_id]] = q
+            for layer_id in tile_layer[tile_order[q]]:
+                layer_tile[layer_id][tile_order[q] - startid[layer_id]] = p
+            tile_order[p], tile_order[q] = tile_order[q], tile_order[p]
+
+        def random_swap(radius=None):
+            # swap two random tiles of one chip, return the affected layers, their new cost and the cost change
+            # (None if the two tiles belong to the same layers)
+            # radius: the maximum row/column offset of the second tile (None: any tile of the chip)
+            p, q = random_state.randint(total_tile, size=2)
+            q = p - p % self.tile_total_num + q % self.tile_total_num
+                # the tiles are only swapped in one chip
+            if radius is not None:
+                offset = random_state.randint(-radius, radius+1, size=2)
+                q_row = min(max(position[p][0] + offset[0], 0), array_row-1)
+                q_column = min(max(position[p][1] + offset[1], 0), array_column-1)
+                q = p - p % self.tile_total_num + q_row * array_column + q_column
+            if tile_layer[tile_order[p]] == tile_layer[tile_order[q]]:
+                return p, q, None, None, 0
+            affected_layer = set()
+            for layer_id in tile_layer[tile_order[p]] + tile_layer[tile_order[q]]:
+                affected_layer |= {layer_id-1, layer_id}
+            affected_layer &= set(range(self.layer_num))
+            swap(p, q)
+            # incremental update: only the layers using the swapped tiles and their previous layers change
+            new_cost = dict((layer_id, layer_cost(layer_id)) for layer_id in affected_layer)
+            delta = sum(new_cost[layer_id] - cost[layer_id] for layer_id in affected_layer)
+            return p, q, affected_layer, new_cost, delta
+
+        cost = np.array([layer_cost(layer_id) for layer_id in range(self.layer_num)], dtype=float)
+        total_cost = cost.sum()
+        best_cost = total_cost
+        best_tile_order = tile_order.copy()
+        initial_temperature = 0
+        if method == 2:
+            # the initial temperature is the median cost change of a sample of neighbour swaps (undone after the
+            # measurement), a typical uphill swap of one hop is accepted with the probability of 1/e at the beginning
+            sample_delta = []
+            for k in range(min(iteration, 200)):
+                p, q, affected_layer, _, delta = random_swap(1)
+                if affected_layer is not None:
+                    swap(p, q)
+                    if delta != 0:
+                        sample_delta.append(abs(delta))
+            initial_temperature = np.median(sample_delta) if len(sample_delta) > 0 else self.trans_time.max()
+        for k in range(iteration):
+            temperature = initial_temperature * 1e-3 ** (k / iteration)
+                # exponential cooling down to 1/1000 of the initial temperature
+            radius = None
+            if method == 2:
+                radius = max(1, int(round(max(array_row, array_column) * 1e-3 ** (k / iteration))))
+                    # the swap range shrinks with the temperature, from the whole chip to the neighbour tiles
+            p, q, affected_layer, new_cost, delta = random_swap(radius)
+            if affected_layer is None:
+                continue
+            if delta < 0 or (method == 2 and random_state.rand() < math.exp(-delta / temperature)):
+                # the greedy swap rejects the zero-cost swaps, they only drift the tiles of a layer apart
+                for layer_id in affected_layer:
+                    cost[layer_id] = new_cost[layer_id]
+                total_cost += delta
+                if total_cost < best_cost:
+                    best_cost = total_cost
+                    best_tile_order = tile_order.copy()
+            else:
+                swap(p, q)
+        self.mapping_order = best_tile_order.reshape(self.mapping_order.shape).astype(float)
+        self.update_mapping_result()
+        return best_cost
+
+    def mapping_output(self, layer_information = 1):
+        if self.weight_reprogramming:
+            print("Weight-loading phase number:", self.phase_num)
+        else:
+            print("Used chip number:", self.chip_num)
+        print("Used tile number:", self.tile_num, "/", self.tile_total_num * self.chip_num)
+        if layer_information:
+            for layer_id in range(self.layer_num):
+                print("Layer", layer_id, ":")
+                print("     Phase:" if self.weight_reprogramming else "     Chip:", self.layer_chip[layer_id])
+                print("     Tile share:", self.layer_tileinfo[layer_id]['tile_share'])
+                print("     PE placement (tile id, first PE, PE number):", self.layer_tileinfo[layer_id]['PE_placement'])
 
     def calculate_transfer_distance(self):
-        for layer_id in range(self.layer_num-1):
-            # Determine the aggregate node for layer 0~N-1
-            src_pos = np.argwhere(self.mapping_result == layer_id)
-            dst_pos = np.argwhere(self.mapping_result == layer_id+1)
-            if len(src_pos) == 1:
-                self.inLayer_distance[0][layer_id] = 0
-                self.aggregate_arg[layer_id] = src_pos[0]
-                maxdis = 0
-                for i in range(len(dst_pos)):
-                    dis = abs(src_pos[0][0]-dst_pos[i][0]) + abs(src_pos[0][1]-dst_pos[i][1])
-                    if dis > maxdis:
-                        maxdis = dis
-                self.transLayer_distance[0][layer_id] = maxdis
+        for layer_id in range(self.layer_num):
+            # Determine the aggregate node for each layer
+            src_pos = np.argwhere(self.layer_tile_mask(layer_id))[:, 1:]
+            if len(src_pos) == 0:
+                continue
+            if layer_id < self.layer_num-1 and self.layer_chip[layer_id+1] == self.layer_chip[layer_id]:
+                dst_pos = np.argwhere(self.layer_tile_mask(layer_id+1))[:, 1:]
             else:
-                mindis_total = 100
-                for A in range(len(src_pos)):
-                    maxdis_in = 0
-                    for i in range(len(src_pos)):
-                        if i != A:
-                            dis_in = abs(src_pos[A][0]-src_pos[i][0]) + abs(src_pos[A][1]-src_pos[i][1])
-                            if dis_in > maxdis_in:
-                                maxdis_in = dis_in
-                    maxdis_out = 0
-                    for j in range(len(dst_pos)):
-                        dis_out = abs(src_pos[A][0] - dst_pos[j][0]) + abs(src_pos[A][1] - dst_pos[j][1])
-                        if dis_out > maxdis_out:
-                            maxdis_out= dis_out
-                    tempdis = maxdis_in + maxdis_out
-                    if tempdis < mindis_total:
-                        self.inLayer_distance[0][layer_id] = maxdis_in
-                        self.transLayer_distance[0][layer_id] = maxdis_out
-                        self.aggregate_arg[layer_id] = src_pos[A]
-                        mindis_total = tempdis
-        final_pos = np.argwhere(self.mapping_result == self.layer_num-1)
-            # Determine the aggregate node for layer N (output layer)
-        mindis = 100
-        for i in range(len(final_pos)):
-            maxdis = 0
-            for j in range(len(final_pos)):
-                if j != i:
-                    dis = abs(final_pos[i][0]-final_pos[j][0])+abs(final_pos[i][1]-final_pos[j][1])
-                    if dis > maxdis:
-                        maxdis = dis
-            if maxdis < mindis:
-                mindis = maxdis
-                self.inLayer_distance[0][self.layer_num-1] = mindis
-                self.aggregate_arg[self.layer_num-1] = final_pos[i]
-                self.transLayer_distance[0][self.layer_num-1] = 0
+                dst_pos = np.zeros([0, 2], dtype=int)
+                # the output layer (and the layer before a chip cut, see chip_transfer_volume) has no destination tiles
+            # all the candidate aggregate nodes are evaluated at once
+            maxdis_in, maxdis_out, A = aggregate_distance(src_pos, dst_pos)
+            self.inLayer_distance[0][layer_id] = maxdis_in
+            self.transLayer_distance[0][layer_id] = maxdis_out
+            self.aggregate_arg[layer_id] = src_pos[A]
         self.total_distance = sum(sum(self.trans_time * (self.inLayer_distance+self.transLayer_distance)))
 
+def hui_walk_matrix(row, column):
+    # reference of generate_hui_matrix: the step-by-step walk of the original generator
+    # return: None if the walk leaves the tile array before all the tiles are placed (the original generator failed)
+    matrix = np.zeros([row, column])
+    x = 0
+    m = 0
+    while x < row*column:
+        if m % 2:
+            shell = [(i, m) for i in range(m+1)] + [(m, j) for j in range(m-1, -1, -1)]
+        else:
+            shell = [(m, j) for j in range(m+1)] + [(i, m) for i in range(m-1, -1, -1)]
+        for i, j in shell[:row*column-x]:
+            if i >= row or j >= column:
+                return None
+            matrix[i][j] = x
+            x += 1
+        m += 1
+    return matrix
+
+def mapping_order_test(max_size=32):
+    # the closed-form hui order is identical to the original walk on every tile array the walk can fill
+    for row in range(1, max_size+1):
+        for column in range(1, max_size+1):
+            matrix = generate_hui_matrix(row, column)
+            assert sorted(matrix.ravel()) == list(range(row*column)), "Hui mapping order is not a permutation"
+            reference = hui_walk_matrix(row, column)
+            assert reference is None or np.array_equal(matrix, reference), \
+                "Hui mapping order differs from the original walk on " + str((row, column))
+    print("mapping order test passed")
+
 if __name__ == '__main__':
+    mapping_order_test()
+    from MNSIM.Interface.interface import TrainTestInterface
     test_SimConfig_path = os.path.join(os.path.dirname(os.path.dirname(os.getcwd())), "SimConfig.ini")
     test_weights_file_path = os.path.join(os.path.dirname(os.path.dirname(os.getcwd())),
                                           "vgg8_params.pth")
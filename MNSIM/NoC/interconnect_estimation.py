@@ -1,311 +1,1157 @@
 # Interconnect estimation of SIAM tool
-import os, re, glob, sys, math
+import os, re, sys, math
+import concurrent.futures
+import hashlib
+import json
+import warnings
+import subprocess
+import tempfile
+import configparser as cp
 import numpy as np
-import pandas as pd
 from subprocess import call
 from pathlib import Path
-import math
 
 
-def interconnect_estimation():
-    homepath = os.getcwd()
-    print(homepath)
-    homepath = homepath + '/MNSIM/NoC'
-    num_layers, num_tiles_per_layer, ip_activation_per_tile, volume_per_tile = create_injection_rate(homepath)
-    latency_array, Noc_latency = interconnect_latency_estimation(homepath)
+class NoC_input():
+    # In-memory inputs of interconnect_estimation, and its results after the estimation
+    def __init__(self, num_tiles_per_layer, ip_activation, fps=2000):
+        # num_tiles_per_layer: the number of the PEs of each layer (see TCG)
+        # ip_activation: the input activation volume of each layer, unit: bit
+        # fps: frame rate of the inference
+        self.num_tiles_per_layer = np.array(num_tiles_per_layer, dtype=np.int64).reshape(-1)
+        self.ip_activation = np.array(ip_activation, dtype=np.float64).reshape(-1)
+        self.fps = float(fps)
+        assert len(self.num_tiles_per_layer) == len(self.ip_activation), \
+            "The tile number and the input activation must be given for each layer"
+        # results of interconnect_estimation, None before the estimation
+        self.latency = None
+            # the NoC latency of each layer transfer (list)
+        self.area = None
+            # unit: um^2
+        self.power = None
+            # unit: W
+        self.energy = None
+            # unit: pJ
+        # tile placement (see set_placement), None: the tiles of each layer transfer are mapped on a separate mesh
+        self.layer_nodes = None
+        self.mesh_shape = None
+        self.layer_chip = None
+        self.chip_num = 1
+
+    def set_placement(self, layer_nodes, mesh_shape, layer_chip, chip_num=1):
+        # layer_nodes: the mesh nodes of the tiles of each layer, node id = (chip * row_num + row) * column_num + column
+        # mesh_shape: the tile array of one chip (row_num, column_num), the chips are stacked in the row direction
+        # layer_chip: the chip of each layer, only the transfers in one chip go through the NoC
+        # chip_num: the number of the chips which have a NoC (area and power)
+        self.layer_nodes = [np.array(nodes, dtype=np.int64).reshape(-1) for nodes in layer_nodes]
+        self.mesh_shape = (int(mesh_shape[0]), int(mesh_shape[1]))
+        self.layer_chip = list(layer_chip)
+        self.chip_num = int(chip_num)
+        assert len(self.layer_nodes) == len(self.num_tiles_per_layer), "The tile placement must be given for each layer"
+        # the results of the former placement are invalid
+        self.latency = None
+        self.area = None
+        self.power = None
+        self.energy = None
+
+
+def layer_ip_activation(NetStruct):
+    # the input activation volume (bit) of each layer of NetStruct
+    data = []
+    for layer_id in range(len(NetStruct)):
+        layer_dict = NetStruct[layer_id][0][0]
+        if layer_dict['type'] == 'fc':
+            input_size = int(layer_dict['Infeature'])
+            inputchannel = 1
+        else:
+            input_size_list = list(map(int, layer_dict['Inputsize']))
+            input_size = input_size_list[0] * input_size_list[1]
+            inputchannel = int(layer_dict['Inputchannel'])
+        inputbit = int(layer_dict['Inputbit'])
+        data.append(input_size * inputchannel * inputbit)
+    return data
+
+
+def read_noc_input(homepath):
+    # the NoC inputs dumped in <homepath>/to_interconnect
+    num_tiles_per_layer = np.loadtxt(homepath + '/to_interconnect/num_tiles_per_layer.csv', ndmin=1)
+    ip_activation = np.loadtxt(homepath + '/to_interconnect/ip_activation.csv', ndmin=1)
+    fps = np.loadtxt(homepath + '/to_interconnect/fps.csv', ndmin=1)[0]
+    return NoC_input(num_tiles_per_layer, ip_activation, fps)
+
+
+def dump_noc_input(homepath, noc_input):
+    os.makedirs(homepath + '/to_interconnect', exist_ok=True)
+    np.savetxt(homepath + '/to_interconnect/num_tiles_per_layer.csv', noc_input.num_tiles_per_layer, fmt='%d')
+    np.savetxt(homepath + '/to_interconnect/ip_activation.csv', noc_input.ip_activation, fmt='%.15g')
+    np.savetxt(homepath + '/to_interconnect/fps.csv', [noc_input.fps], fmt='%.15g')
+
+
+def read_noc_placement(noc_config, noc_model):
+    # the placement-aware NoC traffic is used when NoC_Placement = 1, or by the analytic model when the placement
+    # is optimized (Placement_Optimization != 0), otherwise the optimized placement would not change the latency
+    noc_placement = int(noc_config.get('Architecture level', 'NoC_Placement', fallback='0'))
+    placement_optimization = int(noc_config.get('Architecture level', 'Placement_Optimization', fallback='0'))
+    return int(noc_placement != 0 or (noc_model == 0 and placement_optimization != 0))
+
+
+def interconnect_estimation(SimConfig_path=None, noc_input=None):
+    # noc_input: NoC_input of the network, the results are also saved in it,
+    # default: read from the files in MNSIM/NoC/to_interconnect
+    # NoC_Model (Architecture level): 0: analytic mesh model (in-process), 1: booksim (./booksim in MNSIM/NoC),
+    # 2: cycle-level mesh simulation (in-process, mesh_cycle_simulation)
+    # NoC_Jobs: number of the concurrent booksim jobs, 0: CPU number
+    # NoC_Cache_Size: size limit of the booksim result cache (MB), 0: no cache
+    # NoC_Cache_Dir: directory of the booksim result cache, default: the user cache directory (see noc_cache_dir)
+    # NoC_Dump: 1: write the inputs, the injection rates and the results to files in MNSIM/NoC (for debugging)
+    # NoC_Placement: 1: the traffic of all layers is mapped on the chip mesh at the tile positions of TCG
+    # (analytic model only, the placement is set by TCG), 0: each layer transfer on its own minimal mesh
+    # (the analytic model uses the placement anyway when Placement_Optimization is enabled, see read_noc_placement)
+    # NoC_Topology: mesh, torus, cmesh, htree or bus (analytic model only)
+    # NoC_Saturation_Load: valid range of the analytic model, see analytic_layer_latency
+    noc_model = 0
+    noc_topology = 'mesh'
+    noc_placement = 0
+    saturation_load = 0.9
+    noc_jobs = 0
+    cache_size = 64
+    cache_dir = ''
+    noc_dump = 0
+    if SimConfig_path is not None:
+        noc_config = cp.ConfigParser()
+        noc_config.read(SimConfig_path, encoding='UTF-8')
+        noc_model = int(noc_config.get('Architecture level', 'NoC_Model', fallback='0'))
+        noc_jobs = int(noc_config.get('Architecture level', 'NoC_Jobs', fallback='0'))
+        cache_size = float(noc_config.get('Architecture level', 'NoC_Cache_Size', fallback='64'))
+        cache_dir = noc_config.get('Architecture level', 'NoC_Cache_Dir', fallback='').strip()
+        noc_dump = int(noc_config.get('Architecture level', 'NoC_Dump', fallback='0'))
+        noc_placement = read_noc_placement(noc_config, noc_model)
+        noc_topology = noc_config.get('Architecture level', 'NoC_Topology', fallback='mesh').strip()
+        saturation_load = float(noc_config.get('Architecture level', 'NoC_Saturation_Load', fallback='0.9'))
+    assert noc_model in [0, 1, 2], "NoC model must be 0 (analytic), 1 (booksim) or 2 (cycle-level simulation)"
+    assert noc_topology in NoC_topology, "NoC topology must be one of " + ', '.join(NoC_topology)
+    assert noc_model == 0 or noc_topology == 'mesh', "Booksim and the cycle-level simulation only support the mesh"
+    homepath = os.path.dirname(os.path.abspath(__file__))
+    if noc_input is None:
+        noc_input = read_noc_input(homepath)
+    elif noc_dump:
+        dump_noc_input(homepath, noc_input)
+    cache_dir = noc_cache_dir(cache_dir)
+    cache_size = int(cache_size * 1024 * 1024) if noc_model == 1 else 0
+        # unit: B, only the booksim results are cached, the in-process models are not slower than the cache
+    if noc_placement and noc_input.layer_nodes is not None:
+        assert noc_model == 0, "The placement-aware NoC traffic is only supported by the analytic model"
+        num_layers, ip_activation_per_tile, volume_per_tile, flow_list = \
+            create_placement_traffic(noc_input, homepath + '/inj_dir' if noc_dump else None)
+        latency_array, Noc_latency, avg_const_delay = analytic_placement_latency(flow_list, noc_input.mesh_shape,
+                                                                                 max(noc_input.layer_chip) + 1,
+                                                                                 noc_topology,
+                                                                                 warning_load=saturation_load)
+            # one network for each chip (or weight-loading phase), no flow crosses the chips
+        interconnect_latency, per_layer_latency = postprocess_latency_array(num_layers, noc_input.num_tiles_per_layer,
+                                                                            ip_activation_per_tile, volume_per_tile,
+                                                                            latency_array, avg_const_delay)
+        interconnect_area, interconnect_power = analytic_area_power_estimation(homepath, noc_input.mesh_shape,
+                                                                              noc_topology)
+        interconnect_area = interconnect_area * noc_input.chip_num
+        interconnect_power = interconnect_power * noc_input.chip_num
+        return save_noc_result(homepath, noc_input, noc_dump, Noc_latency, interconnect_latency,
+                               interconnect_area, interconnect_power)
+    num_layers, num_tiles_per_layer, ip_activation_per_tile, volume_per_tile, lambda_list = \
+        create_injection_rate(noc_input, homepath + '/inj_dir' if noc_dump else None)
+    if noc_model == 0:
+        model_config = 'analytic M/D/1 ' + noc_topology + ' model'
+        latency_estimation = lambda layer_lambda_list, layer_index: \
+            analytic_latency_estimation(layer_lambda_list, noc_topology, saturation_load, layer_index)
+    elif noc_model == 2:
+        model_config = 'cycle-level mesh simulation'
+        latency_estimation = lambda layer_lambda_list, layer_index: simulation_latency_estimation(layer_lambda_list)
+    else:
+        model_config = booksim_model_config(homepath, 'mesh_config_inj_rate')
+        latency_estimation = lambda layer_lambda_list, layer_index: \
+            interconnect_latency_estimation(homepath, layer_lambda_list, noc_jobs if noc_jobs > 0 else None, layer_index)
+    latency_array, Noc_latency = cached_latency_estimation(cache_dir, cache_size, model_config, lambda_list,
+                                                           latency_estimation)
+    avg_const_delay = None if noc_topology == 'mesh' else analytic_const_delay(lambda_list, noc_topology)
+        # the constant delay of the other topologies is given by their routing distance
     interconnect_latency, per_layer_latency = postprocess_latency_array(num_layers, num_tiles_per_layer,
                                                                         ip_activation_per_tile, volume_per_tile,
-                                                                        latency_array)
-    interconnect_area, interconnect_power = interconnect_area_power_estimation(num_tiles_per_layer)
-
-    # area_file = open('./Final_Results/area.csv', 'a')
-    area_file = open(homepath + '/Final_Results/area.csv', 'a')
-    area_file.write('NoC area,' + str(float(interconnect_area) * float(1e6)) + ',um^2')
+                                                                        latency_array, avg_const_delay)
+    if noc_model != 1:
+        # the cycle-level simulation only estimates the latency
+        mesh_size = max(int(math.sqrt(np.sum(num_tiles_per_layer))), 1)
+        interconnect_area, interconnect_power = analytic_area_power_estimation(homepath, (mesh_size, mesh_size),
+                                                                              noc_topology)
+    else:
+        # the booksim area and power only depend on the mesh size
+        mesh_size = int(math.sqrt(np.sum(num_tiles_per_layer)))
+        key = noc_cache_key(booksim_model_config(homepath, 'mesh_config_dummy') + ' k=' + str(mesh_size))
+        result = noc_cache_get(cache_dir, key) if cache_size > 0 else None
+        if result is None:
+            result = interconnect_area_power_estimation(homepath, num_tiles_per_layer)
+            if cache_size > 0 and result[0] != '' and result[1] != '':
+                noc_cache_put(cache_dir, key, result)
+        interconnect_area, interconnect_power = result
+    if cache_size > 0:
+        noc_cache_evict(cache_dir, cache_size)
+    return save_noc_result(homepath, noc_input, noc_dump, Noc_latency, interconnect_latency,
+                           interconnect_area, interconnect_power)
+
+
+def save_noc_result(homepath, noc_input, noc_dump, Noc_latency, interconnect_latency, interconnect_area,
+                    interconnect_power):
+    # interconnect_area: unit: mm^2, interconnect_power: unit: W
+    noc_input.latency = Noc_latency
+    noc_input.area = float(interconnect_area) * float(1e6)
+    noc_input.power = float(interconnect_power)
+    noc_input.energy = float(interconnect_power) * float(interconnect_latency)
+
+    if noc_dump:
+        os.makedirs(homepath + '/Final_Results', exist_ok=True)
+        # area_file = open('./Final_Results/area.csv', 'a')
+        area_file = open(homepath + '/Final_Results/area.csv', 'a')
+        area_file.write('NoC area,' + str(noc_input.area) + ',um^2')
+
+        area_file.close()
+
+        power_file = open(homepath + '/Final_Results/Energy.csv', 'a')
+        power_file.write('NoC Energy,' + str(noc_input.energy) + ', pJ')
+        power_file.close()
+
+        latency_file = open(homepath + '/Final_Results/Latency.csv', 'a')
+        latency_file.write('NoC latency,' + str(interconnect_latency) + ',ns')
+        latency_file.close()
 
-    area_file.close()
+    # return interconnect_latency, interconnect_area, interconnect_power
+    return Noc_latency, interconnect_area, interconnect_power
 
-    power_file = open(homepath + '/Final_Results/Energy.csv', 'a')
-    power_file.write('NoC Energy,' + str(float(interconnect_power) * float(interconnect_latency)) + ', pJ')
-    power_file.close()
 
-    latency_file = open(homepath + '/Final_Results/Latency.csv', 'a')
-    latency_file.write('NoC latency,' + str(interconnect_latency) + ',ns')
-    latency_file.close()
+def interconnect_timeline_estimation(SimConfig_path, noc_input, send_time, send_volume):
+    # the NoC latency of each layer transfer under the traffic profile of the latency model instead of the constant
+    # rate given by noc_input.fps: the run is cut into NoC_Timeline_Window windows, the injection rate of each layer
+    # transfer in each window is given by the output points the layer finishes in the window, the latency of each
+    # layer transfer is the average of its window latencies weighted by the volume it sends in each window
+    # send_time: the finish time (ns) of each output point of each layer, the point is sent to the next layer
+    # send_volume: the volume (bit) of one output point of each layer
+    # noc_input: estimated by interconnect_estimation, analytic model only, the results are not changed
+    # return: the NoC latency of each layer transfer (list, see NoC_input.latency), and the total latency
+    # (for the NoC energy, see save_noc_result)
+    noc_model = 0
+    noc_topology = 'mesh'
+    noc_placement = 0
+    saturation_load = 0.9
+    window_num = 16
+    if SimConfig_path is not None:
+        noc_config = cp.ConfigParser()
+        noc_config.read(SimConfig_path, encoding='UTF-8')
+        noc_model = int(noc_config.get('Architecture level', 'NoC_Model', fallback='0'))
+        noc_placement = read_noc_placement(noc_config, noc_model)
+        noc_topology = noc_config.get('Architecture level', 'NoC_Topology', fallback='mesh').strip()
+        window_num = int(noc_config.get('Architecture level', 'NoC_Timeline_Window', fallback='16'))
+        saturation_load = float(noc_config.get('Architecture level', 'NoC_Saturation_Load', fallback='0.9'))
+    assert noc_model == 0, "The timeline-driven NoC traffic is only supported by the analytic model"
+    assert window_num > 0, "The number of the NoC timeline windows must be positive"
+    quantization_bit = 1
+    bus_width = 32
 
-    # return interconnect_latency, interconnect_area, interconnect_power
-    return Noc_latency, interconnect_area, interconnect_power
+    num_layers = len(noc_input.num_tiles_per_layer)
+    assert len(send_time) == num_layers and len(send_volume) == num_layers, \
+        "The send times and the send volume must be given for each layer"
+    end_time = max([max(send_time[layer_idx]) for layer_idx in range(num_layers - 1) if len(send_time[layer_idx]) > 0],
+                   default=0)
+    window_volume = np.zeros((num_layers - 1, window_num))
+        # the volume (bit) sent by each layer transfer in each window, with one header for each layer transfer as in
+        # create_injection_rate (shared by the windows in proportion to the points)
+    for layer_idx in range(num_layers - 1):
+        layer_time = np.asarray(send_time[layer_idx], dtype=np.float64)
+        if len(layer_time) == 0 or end_time <= 0:
+            continue
+        window = np.minimum((layer_time / end_time * window_num).astype(np.int64), window_num - 1)
+        point_num = np.bincount(window, minlength=window_num)
+        window_volume[layer_idx] = point_num * send_volume[layer_idx] * quantization_bit + \
+                                   bus_width * point_num / len(layer_time)
+    window_length = end_time / window_num * 1e-9
+        # unit: s
+    frame_volume = (noc_input.ip_activation[1:] * quantization_bit + bus_width) * noc_input.fps
+        # the rate (bit/s) of the constant traffic of create_injection_rate and create_placement_traffic
+    scale = window_volume / max(window_length, 1e-300) / np.maximum(frame_volume, 1e-300)[:, None]
+
+    if noc_placement and noc_input.layer_nodes is not None:
+        num_layers, ip_activation_per_tile, volume_per_tile, flow_list = create_placement_traffic(noc_input)
+        network_num = max(noc_input.layer_chip) + 1
+
+        def window_latency(window):
+            window_flow = [(src, dst, rate * scale[layer_idx, window])
+                           for layer_idx, (src, dst, rate) in enumerate(flow_list)]
+            latency_array, _, avg_const_delay = analytic_placement_latency(window_flow, noc_input.mesh_shape,
+                                                                           network_num, noc_topology,
+                                                                           warning_load=saturation_load)
+            return latency_array, postprocess_latency_array(num_layers, noc_input.num_tiles_per_layer,
+                                                            ip_activation_per_tile, volume_per_tile, latency_array,
+                                                            avg_const_delay)[1]
+    else:
+        num_layers, num_tiles_per_layer, ip_activation_per_tile, volume_per_tile, lambda_list = \
+            create_injection_rate(noc_input)
+        avg_const_delay = None if noc_topology == 'mesh' else analytic_const_delay(lambda_list, noc_topology)
+
+        def window_latency(window):
+            latency_array = np.full(num_layers - 1, float('nan'))
+            for layer_idx in np.flatnonzero(scale[:, window] > 0):
+                latency_array[layer_idx] = analytic_layer_latency(lambda_list[layer_idx] * scale[layer_idx, window],
+                                                                  noc_topology, saturation_load, layer_idx)
+            return latency_array, postprocess_latency_array(num_layers, num_tiles_per_layer, ip_activation_per_tile,
+                                                            volume_per_tile, latency_array, avg_const_delay)[1]
+
+    window_result = [window_latency(window) for window in range(window_num)]
+    total_volume = np.sum(window_volume, axis=1)
+    weight = window_volume / np.maximum(total_volume, 1e-300)[:, None]
+    latency_array = np.stack([result[0] for result in window_result], axis=1)
+    latency_array = np.sum(np.where(weight > 0, latency_array, 0) * weight, axis=1)
+    Noc_latency = np.where(total_volume > 0, latency_array, np.asarray(noc_input.latency, dtype=np.float64))
+        # no output point is sent: the result of the constant traffic
+    per_layer_latency = np.sum(np.stack([result[1] for result in window_result], axis=1) * weight, axis=1)
+    return Noc_latency.tolist(), float(np.sum(per_layer_latency))
 
 
 # Area and power estimation for interconnect
-def interconnect_area_power_estimation(num_tiles_per_layer):
+def interconnect_area_power_estimation(homepath, num_tiles_per_layer):
     num_tile_total = np.sum(num_tiles_per_layer)
     # mesh_size = 10
     mesh_size = int(math.sqrt(num_tile_total))
 
-    # Open read file handle of config file
-    fp = open('./mesh_config_dummy', 'r')
-
-    # Set path to config file
-    config_file = 'mesh_config'
-
-    # Open write file handle for config file
-    outfile = open(config_file, 'w')
-
-    for line in fp:
-
-        line = line.strip()
-
-        # Search for pattern
-        matchobj = re.match(r'^k=', line)
+    # Run Booksim with the dummy config (k = mesh size) and save log
+    os.makedirs(homepath + '/logs', exist_ok=True)
+    output = run_booksim(homepath, homepath + '/mesh_config_dummy', mesh_size)
+    with open(homepath + '/logs/dummy_output.log', 'w') as log_file:
+        log_file.write(output)
 
-        # Set size of mesh if line in file corresponds to mesh size
-        if matchobj:
-            line = 'k=' + str(mesh_size) + ';'
-
-        # Write config to file
-        outfile.write(line + '\n')
-
-    # Close file handles
-    fp.close()
-    outfile.close()
-
-    # Run Booksim with config file and save log
-    log_file = 'dummy_output.log'
-    booksim_command = './booksim ' + config_file + ' > ' + log_file
-    os.system(booksim_command)
-
-    # Grep for area
-    # latency = os.popen('grep "Packet latency average" ' + log_file + ' | tail -1 | awk \'{print $5}\'').read().strip()
-    area = os.popen('grep "Total Area" ' + log_file + ' | tail -1 | awk \'{print $4}\'').read().strip()
+    area = parse_booksim_output(output, 'Total Area', 3)
 
     print('[ INFO] Area: ' + area + '\n')
 
-    power = os.popen('grep "Total Power" ' + log_file + ' | tail -1 | awk \'{print $4}\'').read().strip()
+    power = parse_booksim_output(output, 'Total Power', 3)
 
     print('[ INFO] Power: ' + power + '\n')
 
     return area, power
 
 
-# Latency estimation for interconnect
-def interconnect_latency_estimation(homepath):
-    # trace_file_dir = "trace_dir"
-
-    inj_rate_dir = "inj_dir"
-    NoC_latency = []
-
-    # Initialize dictionary to hold latency values
-    latency_dict = dict()
-
-    # Get a list of all files in directory
-    files = glob.glob(inj_rate_dir + '/*txt')
-
-    # Initialize file counter
-    file_counter = 0
-
-    # Create directory to store config files
-    os.system('mkdir -p' + homepath + '/logs/configs')
-
-    # Iterate over all files
-    for file in files:
-
-        # Increment file counter
-        file_counter += 1
-
-        print('[ INFO] Processing file ' + file + ' ...')
-
-        # Extract file name without extension and absolute path from filename
-        run_name = os.path.splitext(os.path.basename(file))[0]
-
-        # Extract first line of file
-        line1 = os.popen('head -1 ' + file).read()
-
-        # Extract size of mesh
-        line1 = line1.strip()
-        values = line1.split()
-        mesh_size = int(math.sqrt(len(values)))
-
-        # Open read file handle of config file
-        fp = open(homepath + '/mesh_config_inj_rate', 'r')
-
-        # Set path to config file
-        config_file = homepath + '/logs/configs/' + run_name + '_mesh_config'
-
-        # Open write file handle for config file
-        outfile = open(config_file, 'w')
-
-        # Iterate over file and set size of mesh in config file
+# Run one booksim simulation in its own temporary directory, return the stdout of booksim
+def run_booksim(homepath, config_template, mesh_size, lambda_array=None):
+    # config_template: booksim config file, the mesh size (k) is replaced and the tech file is given by absolute path
+    # lambda_array: the injection rate matrix of custom traffic, saved as inj_rate.txt in the working directory
+    with tempfile.TemporaryDirectory(prefix='booksim_') as work_dir:
+        config_file = os.path.join(work_dir, 'mesh_config')
+        with open(config_template, 'r') as fp, open(config_file, 'w') as outfile:
+            for line in fp:
+                line = line.strip()
+                # Set size of mesh if line in file corresponds to mesh size
+                if re.match(r'^k=', line):
+                    line = 'k=' + str(mesh_size) + ';'
+                elif re.match(r'^tech_file\s*=', line):
+                    line = 'tech_file = ' + homepath + '/techfile.txt;'
+                outfile.write(line + '\n')
+        if lambda_array is not None:
+            np.savetxt(os.path.join(work_dir, 'inj_rate.txt'), lambda_array, fmt='%.12f')
+        result = subprocess.run([homepath + '/booksim', config_file], cwd=work_dir,
+                                stdout=subprocess.PIPE, stderr=subprocess.STDOUT, universal_newlines=True)
+    return result.stdout
+
+
+# The field (split by space) of the last line containing key in the booksim output, '' if not found
+def parse_booksim_output(output, key, field):
+    value = ''
+    for line in output.splitlines():
+        if key in line:
+            fields = line.split()
+            if len(fields) > field:
+                value = fields[field]
+    return value
+
+
+# Read the key = value; lines of a booksim config file (or tech file), // starts a comment
+def read_booksim_config(config_file):
+    config = dict()
+    with open(config_file, 'r') as fp:
         for line in fp:
-
-            line = line.strip()
-
-            # Search for pattern
-            matchobj = re.match(r'^k=', line)
-
-            # Set size of mesh if line in file corresponds to mesh size
+            line = line.split('//')[0].strip()
+            matchobj = re.match(r'^(\w+)\s*=\s*([^;]*);', line)
             if matchobj:
-                line = 'k=' + str(mesh_size) + ';'
-
-            # Write config to file
-            outfile.write(line + '\n')
-
-        # Close file handles
-        fp.close()
-        outfile.close()
-
-        # Set path to log file
-        log_file = homepath + '/logs/' + run_name + '.log'
-
-        # Copy injection rate matrix file
-        os.system('cp ' + file + ' ' + homepath + '/inj_rate.txt')
-
-        # Run Booksim with config file and save log
-        booksim_command = homepath + '/booksim ' + config_file + ' > ' + log_file
-        os.system(booksim_command)
-
-        # Grep for packet latency average from log file
-        latency = os.popen(
-            'grep "Packet latency average" ' + log_file + ' | tail -1 | awk \'{print $5}\'').read().strip()
-        # latency = os.popen('grep "Trace is finished in" ' + log_file + ' | tail -1 | awk \'{print $5}\'').read().strip()
-
-        print('[ INFO] Latency: ' + latency + '\n')
+                config[matchobj.group(1)] = matchobj.group(2).strip()
+    return config
+
+
+# Load of each link of a mesh with dimension-order (XY) routing
+def mesh_link_load(lambda_array, mesh_size):
+    # lambda_array: injection rate (packet/cycle) from each source node to each destination node,
+    # node id = row * mesh_size + column (booksim numbering)
+    src, dst = np.nonzero(lambda_array)
+    return mesh_flow_load(src, dst, lambda_array[src, dst], (mesh_size, mesh_size))
+
+
+def mesh_flow_load(src, dst, rate, mesh_shape):
+    # src, dst, rate: the flows (sparse traffic), node id = row * column_num + column
+    # return: dict of the link loads (packet/cycle), east[r, c]: (r, c) -> (r, c+1), west[r, c]: (r, c+1) -> (r, c),
+    # south[c, r]: (r, c) -> (r+1, c), north[c, r]: (r+1, c) -> (r, c), inject/eject: the local port of each node
+    row_num, column_num = mesh_shape
+    src_row, src_col = np.divmod(src, column_num)
+    dst_row, dst_col = np.divmod(dst, column_num)
+    load = dict()
+    # x first on the source row, then y on the destination column
+    load['east'] = line_link_load(src_row, src_col, dst_col, rate, row_num, column_num)
+    load['west'] = line_link_load(src_row, column_num-1-src_col, column_num-1-dst_col, rate,
+                                  row_num, column_num)[:, ::-1]
+    load['south'] = line_link_load(dst_col, src_row, dst_row, rate, column_num, row_num)
+    load['north'] = line_link_load(dst_col, row_num-1-src_row, row_num-1-dst_row, rate, column_num, row_num)[:, ::-1]
+    load['inject'] = np.bincount(src, weights=rate, minlength=row_num*column_num)
+    load['eject'] = np.bincount(dst, weights=rate, minlength=row_num*column_num)
+    return load
+
+
+def line_link_load(line, start, end, rate, line_num, line_length):
+    # the flows from start to end (only end > start) on each line use the links i -> i+1 with start <= i < end
+    diff = np.zeros((line_num, line_length))
+    forward = end > start
+    np.add.at(diff, (line[forward], start[forward]), rate[forward])
+    np.add.at(diff, (line[forward], end[forward]), -rate[forward])
+    return np.cumsum(diff, axis=1)[:, :-1]
+
+
+def line_path_sum(value, line, start, end):
+    # sum of the link values i -> i+1 (start <= i < end) of each flow, value: (#lines x #links in one line)
+    prefix = np.concatenate((np.zeros((value.shape[0], 1)), np.cumsum(value, axis=1)), axis=1)
+    return np.where(end > start, prefix[line, np.maximum(end, start)] - prefix[line, np.minimum(end, start)], 0)
+
+
+def md1_wait(load, saturation_load=0.99):
+    # the waiting time (cycle) of an M/D/1 queue served in one cycle under the load (packet/cycle)
+    rho = np.minimum(load, saturation_load)
+        # the M/D/1 waiting time diverges at saturation, the loads are clipped
+    return rho / (2 * (1 - rho))
+
+
+def mesh_flow_delay(src, dst, load, mesh_shape, saturation_load=0.99):
+    # return: the queueing delay and the constant delay (cycle) of each flow under the link loads
+    # every link (and local port) is an M/D/1 queue served in one cycle
+    # the constant delays follow mesh_config_inj_rate: 4 router pipeline stages, 1 cycle per link, 3 cycles
+    # for the source and the sink (see postprocess_latency_array)
+    row_num, column_num = mesh_shape
+    wait = dict()
+    for key in load:
+        wait[key] = md1_wait(load[key], saturation_load)
+    src_row, src_col = np.divmod(src, column_num)
+    dst_row, dst_col = np.divmod(dst, column_num)
+    queue_delay = line_path_sum(wait['east'], src_row, src_col, dst_col) + \
+                  line_path_sum(wait['west'][:, ::-1], src_row, column_num-1-src_col, column_num-1-dst_col) + \
+                  line_path_sum(wait['south'], dst_col, src_row, dst_row) + \
+                  line_path_sum(wait['north'][:, ::-1], dst_col, row_num-1-src_row, row_num-1-dst_row) + \
+                  wait['inject'][src] + wait['eject'][dst]
+    const_dist = np.abs(src_row - dst_row) + np.abs(src_col - dst_col)
+    const_delay = const_dist + 4 * (const_dist + 1) + 3
+    return queue_delay, const_delay
+
+
+NoC_topology = ['mesh', 'torus', 'cmesh', 'htree', 'bus']
+    # the topologies of the analytic NoC model (NoC_Topology in SimConfig)
+
+
+def cmesh_router(node, node_shape):
+    # concentrated mesh: 4 tiles (2 x 2) share one router and its local port
+    # return: the router of each node (the networks are stacked in the row direction), the router array of one network
+    row_num, column_num = node_shape
+    router_shape = (math.ceil(row_num / 2), math.ceil(column_num / 2))
+    network, local = np.divmod(node, row_num * column_num)
+    row, column = np.divmod(local, column_num)
+    router = (network * router_shape[0] + row // 2) * router_shape[1] + column // 2
+    return router, router_shape
+
+
+def ring_path_links(line, start, end, length, line_num):
+    # the links of the shorter way from start to end on each ring (forward for a tie),
+    # forward link i of a ring: i -> i+1, backward link i: i -> i-1 (ids from line_num * length)
+    # return: flow index and link id of each used link, hops of each flow
+    forward_hops = np.mod(end - start, length)
+    backward_hops = np.mod(start - end, length)
+    forward = forward_hops <= backward_hops
+    hops = np.where(forward, forward_hops, backward_hops)
+    flow_index = np.repeat(np.arange(len(line)), hops)
+    step = np.arange(len(flow_index)) - np.repeat(np.cumsum(hops) - hops, hops)
+    direction = np.where(forward[flow_index], 1, -1)
+    position = np.mod(start[flow_index] + direction * step, length)
+    link_id = np.where(direction > 0, 0, line_num * length) + line[flow_index] * length + position
+    return flow_index, link_id, hops
+
+
+def morton_code(row, column, bit_num):
+    # the leaf order of the H-tree: the bits of row and column interleaved
+    code = np.zeros_like(row)
+    for bit in range(bit_num):
+        code = code | (((column >> bit) & 1) << (2 * bit)) | (((row >> bit) & 1) << (2 * bit + 1))
+    return code
+
+
+def topology_flow_links(topology, src, dst, node_shape):
+    # the links used by the flows of the torus, the H-tree and the bus (the mesh and the cmesh: mesh_flow_load)
+    # src, dst: node ids in one network, node id = row * column_num + column
+    # return: dict, flow_index/link_id: one entry for each link used by a flow, link_num,
+    # link_length: the length of each link (unit: tile pitch), const_delay: the constant delay (cycle) of each flow,
+    # router_num: the router number of the network
+    row_num, column_num = node_shape
+    links = dict()
+    if topology == 'torus':
+        # x first on the source row, then y on the destination column, the shorter way on each ring,
+        # the links of a folded torus span two tiles
+        src_row, src_col = np.divmod(src, column_num)
+        dst_row, dst_col = np.divmod(dst, column_num)
+        x_flow, x_link, x_hops = ring_path_links(src_row, src_col, dst_col, column_num, row_num)
+        y_flow, y_link, y_hops = ring_path_links(dst_col, src_row, dst_row, row_num, column_num)
+        links['flow_index'] = np.concatenate((x_flow, y_flow))
+        links['link_id'] = np.concatenate((x_link, y_link + 2 * row_num * column_num))
+        links['link_num'] = 4 * row_num * column_num
+        x_length = 0 if column_num == 1 else (1 if column_num == 2 else 2)
+        y_length = 0 if row_num == 1 else (1 if row_num == 2 else 2)
+        links['link_length'] = np.repeat([x_length, y_length], 2 * row_num * column_num).astype(float)
+        hops = x_hops + y_hops
+        links['const_delay'] = hops + 4 * (hops + 1) + 3
+        links['router_num'] = row_num * column_num
+    elif topology == 'htree':
+        # binary tree with the tiles as leaves (Morton order), heap numbering: the leaf of node x is
+        # 2^level_num + x, the parent of node v is v // 2, up link of node v: v, down link of node v: 2^(level_num+1) + v
+        side_bit = max(int(math.ceil(math.log2(max(row_num, column_num)))), 0)
+        level_num = 2 * side_bit
+        leaf_src = morton_code(src // column_num, src % column_num, side_bit) + 2 ** level_num
+        leaf_dst = morton_code(dst // column_num, dst % column_num, side_bit) + 2 ** level_num
+        _, common_level = np.frexp((leaf_src ^ leaf_dst).astype(float))
+            # up to the lowest common ancestor and down again
+        flow_index = np.repeat(np.arange(len(src)), common_level)
+        level = np.arange(len(flow_index)) - np.repeat(np.cumsum(common_level) - common_level, common_level)
+        links['flow_index'] = np.concatenate((flow_index, flow_index))
+        links['link_id'] = np.concatenate((leaf_src[flow_index] >> level,
+                                           2 ** (level_num + 1) + (leaf_dst[flow_index] >> level)))
+        links['link_num'] = 2 ** (level_num + 2)
+        node_level = level_num - np.floor(np.log2(np.maximum(np.arange(2 ** (level_num + 1)), 1)))
+            # the level of the link from a node to its parent (0: leaf)
+        node_length = np.where(np.arange(2 ** (level_num + 1)) >= 2, 0.5 * 2 ** (node_level // 2), 0)
+            # the H-tree links double every two levels
+        links['link_length'] = np.concatenate((node_length, node_length))
+        hops = 2 * common_level
+        links['const_delay'] = hops + 4 * np.maximum(hops - 1, 0) + 3
+        links['router_num'] = max(2 ** level_num - 1, 1)
+    elif topology == 'bus':
+        # one shared bus, a transfer takes 1 cycle on the bus and 2 cycles of arbitration
+        remote = np.flatnonzero(src != dst)
+        links['flow_index'] = remote
+        links['link_id'] = np.zeros(len(remote), dtype=np.int64)
+        links['link_num'] = 1
+        links['link_length'] = np.array([max(row_num * column_num - 1, 1)], dtype=float)
+        hops = (src != dst).astype(np.int64)
+        links['const_delay'] = 3 * hops + 3
+        links['router_num'] = row_num * column_num
+            # bus interfaces
+    else:
+        assert 0, "NoC topology not supported"
+    return links
+
+
+def topology_flow_delay(topology, src, dst, rate, node_shape, network_num=1, saturation_load=0.99):
+    # the queueing delay and the constant delay (cycle) of each flow, all the flows share the network
+    # src, dst: node ids, node id = (network * row_num + row) * column_num + column (see NoC_input.set_placement)
+    row_num, column_num = node_shape
+    if topology == 'mesh':
+        stacked_shape = (row_num * network_num, column_num)
+        load = mesh_flow_load(src, dst, rate, stacked_shape)
+        return mesh_flow_delay(src, dst, load, stacked_shape, saturation_load)
+    if topology == 'cmesh':
+        router_src, router_shape = cmesh_router(src, node_shape)
+        router_dst, _ = cmesh_router(dst, node_shape)
+        stacked_shape = (router_shape[0] * network_num, router_shape[1])
+        load = mesh_flow_load(router_src, router_dst, rate, stacked_shape)
+        return mesh_flow_delay(router_src, router_dst, load, stacked_shape, saturation_load)
+    node_num = row_num * column_num
+    network, local_src = np.divmod(src, node_num)
+    links = topology_flow_links(topology, local_src, dst % node_num, node_shape)
+    link_id = links['link_id'] + network[links['flow_index']] * links['link_num']
+    load = np.bincount(link_id, weights=rate[links['flow_index']], minlength=links['link_num'] * network_num)
+    inject = np.bincount(src, weights=rate, minlength=node_num * network_num)
+    eject = np.bincount(dst, weights=rate, minlength=node_num * network_num)
+    queue_delay = np.bincount(links['flow_index'], weights=md1_wait(load, saturation_load)[link_id],
+                              minlength=len(src)) + \
+                  md1_wait(inject, saturation_load)[src] + md1_wait(eject, saturation_load)[dst]
+    return queue_delay, links['const_delay']
+
+
+def topology_max_load(topology, src, dst, rate, node_shape, network_num=1):
+    # the maximum load (packet/cycle) of the links and the local ports under the flows, see topology_flow_delay
+    if len(rate) == 0:
+        return 0
+    row_num, column_num = node_shape
+    if topology in ['mesh', 'cmesh']:
+        if topology == 'cmesh':
+            src, (row_num, column_num) = cmesh_router(src, node_shape)
+            dst, _ = cmesh_router(dst, node_shape)
+        load = mesh_flow_load(src, dst, rate, (row_num * network_num, column_num))
+        return max(np.max(value, initial=0) for value in load.values())
+    node_num = row_num * column_num
+    network, local_src = np.divmod(src, node_num)
+    links = topology_flow_links(topology, local_src, dst % node_num, node_shape)
+    link_id = links['link_id'] + network[links['flow_index']] * links['link_num']
+    load = np.bincount(link_id, weights=rate[links['flow_index']], minlength=links['link_num'] * network_num)
+    inject = np.bincount(src, weights=rate, minlength=node_num * network_num)
+    eject = np.bincount(dst, weights=rate, minlength=node_num * network_num)
+    return max(load.max(initial=0), inject.max(), eject.max())
+
+
+# Analytic latency estimation of one lambda matrix (nodes on a square array)
+def analytic_packet_latency(lambda_array, saturation_load=0.99, topology='mesh'):
+    # return: the average packet latency (cycle) weighted by the injection rates, the same metric as the
+    # "Packet latency average" of booksim, nan if there is no traffic
+    mesh_size = int(math.sqrt(lambda_array.shape[0]))
+    src, dst = np.nonzero(lambda_array)
+    rate = lambda_array[src, dst]
+    if len(rate) == 0:
+        return float('nan')
+    queue_delay, const_delay = topology_flow_delay(topology, src, dst, rate, (mesh_size, mesh_size),
+                                                   saturation_load=saturation_load)
+    return float(np.sum(rate * (queue_delay + const_delay)) / np.sum(rate))
+
+
+def analytic_layer_latency(lambda_array, topology='mesh', saturation_load=0.9, layer_index=0):
+    # the M/D/1 estimation is far below the simulation near saturation (e.g., 38 vs 115 cycles at the load of 1),
+    # the layer transfers whose maximum link (or local port) load reaches saturation_load (packet/cycle) are
+    # estimated by mesh_cycle_simulation on the mesh, and flagged with a warning on the other topologies
+    mesh_size = int(math.sqrt(lambda_array.shape[0]))
+    src, dst = np.nonzero(lambda_array)
+    max_load = topology_max_load(topology, src, dst, lambda_array[src, dst], (mesh_size, mesh_size))
+    if max_load >= saturation_load:
+        warn_saturation('layer transfer ' + str(layer_index), saturation_load, topology == 'mesh')
+        if topology == 'mesh':
+            return mesh_cycle_simulation(lambda_array)
+    return analytic_packet_latency(lambda_array, topology=topology)
+
+
+def analytic_latency_estimation(lambda_list, topology='mesh', saturation_load=0.9, layer_index=None):
+    # the analytic counterpart of interconnect_latency_estimation (one lambda matrix for each layer)
+    # layer_index: the layer id of each lambda matrix (for the warnings), default: 0, 1, ...
+    if layer_index is None:
+        layer_index = list(range(len(lambda_list)))
+    latency_array = np.array([analytic_layer_latency(lambda_array, topology, saturation_load, layer_index[index])
+                              for index, lambda_array in enumerate(lambda_list)])
+    NoC_latency = latency_array.tolist()
+    return latency_array, NoC_latency
 
-        # Add key, value to dictionary
-        latency_dict[run_name] = latency
 
-        # Stop if 3 files are read
-    # if file_counter == 3:
-    #    break
+def warn_saturation(name, saturation_load, simulation=False):
+    # simulation: the traffic is estimated by the cycle-level simulation instead of the analytic model
+    # warnings.warn shows each message once, the message does not contain the load
+    warnings.warn('NoC ' + name + ' is near saturation (link load >= ' + str(saturation_load) + '), ' +
+                  ('it is estimated by the cycle-level simulation' if simulation else
+                   'the analytic latency is underestimated'), RuntimeWarning)
+
+
+def analytic_const_delay(lambda_list, topology='mesh'):
+    # the average constant delay (cycle) of each lambda matrix (nodes on a square array)
+    avg_const_delay = np.zeros(len(lambda_list))
+    for layer_idx, lambda_array in enumerate(lambda_list):
+        mesh_size = int(math.sqrt(lambda_array.shape[0]))
+        src, dst = np.nonzero(lambda_array)
+        rate = lambda_array[src, dst]
+        if np.sum(rate) > 0:
+            _, const_delay = topology_flow_delay(topology, src, dst, rate, (mesh_size, mesh_size))
+            avg_const_delay[layer_idx] = np.sum(rate * const_delay) / np.sum(rate)
+    return avg_const_delay
+
+
+def analytic_placement_latency(flow_list, mesh_shape, network_num=1, topology='mesh', saturation_load=0.99,
+                               warning_load=None):
+    # flow_list: the flows (src, dst, rate) of each layer transfer on the networks of the chips (see NoC_input),
+    # all the layer transfers share the links (superposed traffic)
+    # warning_load: warn if the maximum link load reaches it (no simulation fallback for the superposed traffic)
+    # return: the average packet latency of each layer transfer, its list, and the average constant delay of each
+    # layer transfer (both 0 if there is no traffic, e.g., the transfer between two chips)
+    latency_array = np.zeros(len(flow_list))
+    avg_const_delay = np.zeros(len(flow_list))
+    if len(flow_list) == 0:
+        return latency_array, latency_array.tolist(), avg_const_delay
+    flow_num = np.cumsum([0] + [len(flow[2]) for flow in flow_list])
+    rate = np.concatenate([flow[2] for flow in flow_list])
+    src = np.concatenate([flow[0] for flow in flow_list])
+    dst = np.concatenate([flow[1] for flow in flow_list])
+    if warning_load is not None and topology_max_load(topology, src, dst, rate, mesh_shape, network_num) >= warning_load:
+        warn_saturation('placement-aware traffic', warning_load)
+    queue_delay, const_delay = topology_flow_delay(topology, src, dst, rate, mesh_shape, network_num, saturation_load)
+    for layer_idx in range(len(flow_list)):
+        layer_flow = slice(flow_num[layer_idx], flow_num[layer_idx + 1])
+        layer_rate = rate[layer_flow]
+        if np.sum(layer_rate) == 0:
+            continue
+        latency_array[layer_idx] = np.sum(layer_rate * (queue_delay[layer_flow] + const_delay[layer_flow])) / \
+                                   np.sum(layer_rate)
+        avg_const_delay[layer_idx] = np.sum(layer_rate * const_delay[layer_flow]) / np.sum(layer_rate)
+    return latency_array, latency_array.tolist(), avg_const_delay
+
+
+# First-order area and power model of the network described by mesh_config_dummy with the parameters of techfile.txt
+def analytic_area_power_estimation(homepath, mesh_shape, topology='mesh'):
+    # mesh_shape: (row_num, column_num) of the tiles
+    row_num, column_num = mesh_shape
+    config = read_booksim_config(homepath + '/mesh_config_dummy')
+    tech = read_booksim_config(homepath + '/techfile.txt')
+    tech = dict((key, float(value)) for key, value in tech.items())
+    channel_width = int(config['channel_width'])
+    buf_size = int(config['buf_size'])
+    freq = 500000000
+    node_num = row_num * column_num
+    # the uniform traffic of the injection rate in mesh_config_dummy
+    sample_num = 2 ** 20
+    if node_num * (node_num - 1) <= sample_num:
+        src, dst = np.nonzero(1 - np.eye(node_num))
+        rate = np.full(len(src), float(config['injection_rate']) / max(node_num - 1, 1))
+    else:
+        # a uniform sample of the node pairs of the large networks (the same expected link loads)
+        random_state = np.random.RandomState(0)
+        src = random_state.randint(node_num, size=sample_num)
+        dst = (src + random_state.randint(1, node_num, size=sample_num)) % node_num
+        rate = np.full(sample_num, float(config['injection_rate']) * node_num / sample_num)
+    if topology in ['mesh', 'cmesh']:
+        if topology == 'mesh':
+            port_num = int(config['in_ports'])
+            router_src, router_dst, router_shape, pitch = src, dst, mesh_shape, 1
+        else:
+            port_num = int(config['in_ports']) + 3
+                # 4 local ports
+            router_src, router_shape = cmesh_router(src, mesh_shape)
+            router_dst, _ = cmesh_router(dst, mesh_shape)
+            pitch = 2
+        load = mesh_flow_load(router_src, router_dst, rate, router_shape)
+        link_load = np.concatenate([load[key].ravel() for key in ['east', 'west', 'south', 'north']])
+            # directed links
+        link_length = np.full(len(link_load), pitch, dtype=float)
+        router_num = router_shape[0] * router_shape[1]
+        router_flit = link_load.sum() + load['inject'].sum()
+            # each flit passes one more router than links
+    else:
+        links = topology_flow_links(topology, src, dst, mesh_shape)
+        port_num = dict(torus=int(config['in_ports']), htree=3, bus=1)[topology]
+        link_load = np.bincount(links['link_id'], weights=rate[links['flow_index']], minlength=links['link_num'])
+        link_length = links['link_length']
+        router_num = links['router_num']
+        router_flit = link_load.sum() + rate.sum() if topology != 'bus' else rate.sum()
+            # the bus interfaces only buffer the flits once
+    # area, unit: mm^2 (LAMBDA: um, MetalPitch and wire_length: mm)
+    link_area = link_length.sum() * channel_width * tech['MetalPitch'] * tech['wire_length']
+    buffer_area = router_num * port_num * buf_size * channel_width * \
+                  tech['W_DFQD1'] * tech['H_DFQD1'] * tech['LAMBDA'] ** 2 * 1e-6
+    switch_area = router_num * (port_num * channel_width * tech['MetalPitch']) ** 2
+    area = link_area + buffer_area + switch_area
+    # power, unit: W
+    link_flit = np.sum(link_load * link_length)
+        # flit x tile pitch
+    link_bit_energy = 0.5 * (tech['Cw_gnd'] + 2 * tech['Cw_cpl']) * tech['wire_length'] * tech['Vdd'] ** 2
+    router_bit_energy = 0.5 * (2 * (tech['Cg_pwr'] + tech['Cd_pwr']) + port_num * tech['Cd_pwr'] + tech['Cg_pwr']) \
+                        * tech['Vdd'] ** 2
+        # buffer write and read, crossbar traversal (activity factor: 0.5)
+    dynamic_power = (link_flit * link_bit_energy + router_flit * router_bit_energy) * channel_width * freq
+    leakage_power = router_num * port_num * buf_size * channel_width * 20 * \
+                    (tech['IoffN'] + tech['IoffP']) / 2 * tech['Vdd']
+        # about 20 transistors in one flip-flop
+    power = dynamic_power + leakage_power
+    return float(area), float(power)
+
+
+def group_first(sorted_key):
+    # the first element of each group of equal keys (sorted_key: sorted array)
+    return np.concatenate((np.ones(min(len(sorted_key), 1), dtype=bool), sorted_key[1:] != sorted_key[:-1]))
+
+
+# Cycle-level simulation of one lambda matrix on a square mesh (1-flit packets, XY routing)
+def mesh_cycle_simulation(lambda_array, buf_depth=8, warmup_cycles=1000, sample_cycles=10000, drain_cycles=None,
+                          seed=0):
+    # every router has 5 input FIFOs of buf_depth packets (from the east, west, south and north neighbours and from
+    # the local source queue), a packet only leaves its FIFO if the downstream FIFO has a free slot (credit),
+    # one packet passes each output port in each cycle (random priority), each source injects at most one packet
+    # in each cycle from its unbounded source queue
+    # the delays follow mesh_config_inj_rate: 4 router pipeline stages, 1 cycle per link, 3 cycles for the source
+    # and the sink (the zero-load latency is the constant delay of postprocess_latency_array)
+    # drain_cycles: the cycles simulated after the sample period for the sampled packets, default: sample_cycles
+    # return: the average latency (cycle, from the creation of the packet) of the packets created in the sample
+    # period, the same metric as the "Packet latency average" of booksim, nan if there is no traffic
+    router_delay = 4
+    link_delay = 1
+    source_sink_delay = 3
+    port_num = 5
+        # input/output port: 0: east, 1: west, 2: south, 3: north (travelling direction), 4: local
+    mesh_size = int(math.sqrt(lambda_array.shape[0]))
+    node_num = mesh_size * mesh_size
+    if drain_cycles is None:
+        drain_cycles = sample_cycles
+    random_state = np.random.RandomState(seed)
+    total_cycles = warmup_cycles + sample_cycles
+
+    # all the packets (Bernoulli injection of each source, destination by the lambda row), sorted by source and time
+    src_rate = lambda_array.sum(axis=1)
+    packet_num = random_state.binomial(total_cycles, np.minimum(src_rate, 1))
+    inject_src = np.repeat(np.arange(node_num), packet_num)
+    inject_time = random_state.randint(total_cycles, size=len(inject_src))
+    row_cdf = np.cumsum(lambda_array, axis=1) / np.maximum(src_rate, 1e-300)[:, None]
+    flat_cdf = (row_cdf + np.arange(node_num)[:, None]).ravel()
+    inject_dst = np.searchsorted(flat_cdf, inject_src + random_state.random_sample(len(inject_src)))
+    inject_dst = np.minimum(inject_dst - inject_src * node_num, node_num - 1)
+    order = np.lexsort((inject_time, inject_src))
+    inject_src, inject_dst, inject_time = inject_src[order], inject_dst[order], inject_time[order]
+    sample = (inject_time >= warmup_cycles)
+    if np.sum(sample) == 0:
+        return float('nan')
+    source_next = np.searchsorted(inject_src, np.arange(node_num))
+        # the next packet in the source queue of each node
+    source_end = np.searchsorted(inject_src, np.arange(node_num), side='right')
+
+    # the packets in the network
+    node = np.zeros(0, dtype=np.int64)
+    dst = np.zeros(0, dtype=np.int64)
+    create = np.zeros(0, dtype=np.int64)
+    ready = np.zeros(0, dtype=np.int64)
+        # the cycle from which the packet can leave its FIFO
+    buf = np.zeros(0, dtype=np.int64)
+        # FIFO id: router * port_num + input port
+    seq = np.zeros(0, dtype=np.int64)
+        # arrival order in the FIFO
+    seq_counter = 0
+    latency_sum = 0
+    delivered_num = 0
+    sample_num = int(np.sum(sample))
+    step = np.array([1, -1, mesh_size, -mesh_size, 0])
+    now = 0
+    while now < total_cycles + drain_cycles:
+        occupancy = np.bincount(buf, minlength=node_num * port_num)
+        # injection from the source queues
+        pending = np.flatnonzero(source_next < source_end)
+        if len(node) == 0 and len(pending) == 0:
+            break
+        inject = pending[(inject_time[source_next[pending]] <= now) & (occupancy[pending * port_num + 4] < buf_depth)]
+        if len(inject) > 0:
+            new = source_next[inject]
+            source_next[inject] += 1
+            node = np.concatenate((node, inject))
+            dst = np.concatenate((dst, inject_dst[new]))
+            create = np.concatenate((create, inject_time[new]))
+            ready = np.concatenate((ready, np.full(len(new), now + router_delay)))
+            buf = np.concatenate((buf, inject * port_num + 4))
+            seq = np.concatenate((seq, seq_counter + np.arange(len(new))))
+            seq_counter += len(new)
+        # the ready packets at the head of their FIFOs
+        fifo_order = np.lexsort((seq, buf))
+        head = fifo_order[group_first(buf[fifo_order])]
+        candidate = head[ready[head] <= now]
+        # XY routing and credits
+        row, column = np.divmod(node[candidate], mesh_size)
+        dst_row, dst_column = np.divmod(dst[candidate], mesh_size)
+        out_port = np.select([dst_column > column, dst_column < column, dst_row > row, dst_row < row], [0, 1, 2, 3], 4)
+        next_node = node[candidate] + step[out_port]
+        next_buf = next_node * port_num + out_port
+        credit = (out_port == 4) | (occupancy[next_buf] < buf_depth)
+        candidate, out_port, next_node, next_buf = candidate[credit], out_port[credit], next_node[credit], next_buf[credit]
+        # switch allocation: one winner for each output port
+        output = node[candidate] * port_num + out_port
+        priority_order = np.lexsort((random_state.random_sample(len(candidate)), output))
+        winner = priority_order[group_first(output[priority_order])]
+        eject = out_port[winner] == 4
+        # ejection
+        done = candidate[winner[eject]]
+        measured = (create[done] >= warmup_cycles) & (create[done] < total_cycles)
+        latency_sum += np.sum(now + source_sink_delay - create[done][measured])
+        delivered_num += int(np.sum(measured))
+        # link traversal
+        move = candidate[winner[~eject]]
+        node[move] = next_node[winner[~eject]]
+        buf[move] = next_buf[winner[~eject]]
+        ready[move] = now + link_delay + router_delay
+        seq[move] = seq_counter + np.arange(len(move))
+        seq_counter += len(move)
+        if len(done) > 0:
+            keep = np.ones(len(node), dtype=bool)
+            keep[done] = False
+            node, dst, create, ready, buf, seq = node[keep], dst[keep], create[keep], ready[keep], buf[keep], seq[keep]
+        if delivered_num == sample_num:
+            break
+        # skip the cycles in which no packet can move
+        pending = np.flatnonzero(source_next < source_end)
+        next_time = np.inf
+        if len(node) > 0:
+            next_time = np.min(ready)
+        if len(pending) > 0:
+            next_time = min(next_time, np.min(inject_time[source_next[pending]]))
+        now = int(max(now + 1, next_time)) if next_time < np.inf else now + 1
+    # the sampled packets not delivered at the end of the simulation (saturation) count with their current age
+    remain = (create >= warmup_cycles) & (create < total_cycles)
+    unsent = (np.arange(len(inject_src)) >= source_next[inject_src]) & sample
+    latency_sum += np.sum(now + source_sink_delay - create[remain]) + \
+                   np.sum(now + source_sink_delay - inject_time[unsent])
+    return float(latency_sum / (delivered_num + int(np.sum(remain)) + int(np.sum(unsent))))
+
+
+def simulation_latency_estimation(lambda_list):
+    # the cycle-level counterpart of interconnect_latency_estimation (one lambda matrix for each layer)
+    latency_array = np.array([mesh_cycle_simulation(lambda_array) for lambda_array in lambda_list])
+    NoC_latency = latency_array.tolist()
+    return latency_array, NoC_latency
 
-    # Open output file handle
-    outfile = open(homepath + '/logs/latency_mesh.csv', 'w')
 
-    latency_array = np.zeros(file_counter)
+# Latency estimation for interconnect
+def interconnect_latency_estimation(homepath, lambda_list, max_workers=None, layer_index=None):
+    # one booksim job for each layer, dispatched over a pool of max_workers threads (default: CPU number),
+    # every job runs in its own temporary directory so that the jobs (and the simulations) can run concurrently
+    # layer_index: the layer id of each lambda matrix (for the log names), default: 0, 1, ...
+    os.makedirs(homepath + '/logs', exist_ok=True)
+    if layer_index is None:
+        layer_index = list(range(len(lambda_list)))
+
+    def layer_latency(index):
+        run_name = 'inj_rate_' + str(layer_index[index])
+        mesh_size = int(math.sqrt(lambda_list[index].shape[0]))
+        output = run_booksim(homepath, homepath + '/mesh_config_inj_rate', mesh_size, lambda_list[index])
+        with open(homepath + '/logs/' + run_name + '.log', 'w') as log_file:
+            log_file.write(output)
+        # Packet latency average from the output of booksim
+        latency = parse_booksim_output(output, 'Packet latency average', 4)
+        print('[ INFO] Latency of ' + run_name + ': ' + latency + '\n')
+        return float(latency) if latency != '' else float('nan')
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        latency_array = np.array(list(executor.map(layer_latency, range(len(lambda_list)))))
 
     # Write latencies to CSV
-    for index in range(file_counter):
-        run_name = 'inj_rate_' + str(index)
-        outfile.write(latency_dict[run_name] + '\n')
-        NoC_latency.append(float(latency_dict[run_name]))
-        # total_latency = total_latency + int(latency_dict[run_name])
-        latency_array[index] = latency_dict[run_name]
-    outfile.close()
+    np.savetxt(homepath + '/logs/latency_mesh.csv', latency_array)
+    NoC_latency = latency_array.tolist()
 
     return latency_array, NoC_latency
 
 
-def create_injection_rate(homepath):
+# Content-addressed cache of the NoC results, one JSON file for each key: <cache_dir>/<key[:2]>/<key>.json
+# the files are touched on every hit, the least recently used ones are evicted beyond the size limit
+def noc_cache_key(model_config, lambda_array=None):
+    # model_config: string which identifies the NoC model (config template, tech file, simulator)
+    key = hashlib.sha256(model_config.encode('utf-8'))
+    if lambda_array is not None:
+        lambda_array = np.ascontiguousarray(lambda_array, dtype=np.float64)
+        key.update(str(lambda_array.shape).encode('utf-8'))
+        key.update(lambda_array.tobytes())
+    return key.hexdigest()
+
+
+def noc_cache_dir(cache_dir=''):
+    # cache_dir: the configured cache directory, '': <XDG_CACHE_HOME or ~/.cache>/MNSIM/noc
+    if cache_dir != '':
+        return os.path.abspath(os.path.expanduser(cache_dir))
+    user_cache_dir = os.environ.get('XDG_CACHE_HOME', '') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(user_cache_dir, 'MNSIM', 'noc')
+
+
+def noc_cache_path(cache_dir, key):
+    return os.path.join(cache_dir, key[:2], key + '.json')
+
+
+def noc_cache_get(cache_dir, key):
+    # return: the cached value, None if not found
+    path = noc_cache_path(cache_dir, key)
+    try:
+        with open(path, 'r') as fp:
+            value = json.load(fp)['value']
+        os.utime(path)
+    except (OSError, ValueError, KeyError):
+        return None
+    return value
+
+
+def noc_cache_put(cache_dir, key, value):
+    # the result is not cached if the cache directory is not writable
+    path = noc_cache_path(cache_dir, key)
+    temp_path = path + '.' + str(os.getpid()) + '.tmp'
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(temp_path, 'w') as fp:
+            json.dump({'value': value}, fp)
+        os.replace(temp_path, path)
+            # atomic, concurrent runs never read a partial file
+    except OSError:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+
+
+def noc_cache_evict(cache_dir, max_size):
+    # max_size: unit: B, the files which can not be read or removed are skipped
+    entries = []
+    for root, dirs, files in os.walk(cache_dir, onerror=lambda error: None):
+        for name in files:
+            if name.endswith('.json'):
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+    total_size = sum(entry[1] for entry in entries)
+    for mtime, size, path in sorted(entries):
+        if total_size <= max_size:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        total_size -= size
+
+
+def booksim_model_config(homepath, config_name):
+    # the booksim results depend on the config template, the tech file and the booksim binary
+    model_config = 'booksim'
+    for name in [config_name, 'techfile.txt']:
+        with open(homepath + '/' + name, 'r') as fp:
+            model_config += '\n' + fp.read()
+    if os.path.exists(homepath + '/booksim'):
+        stat = os.stat(homepath + '/booksim')
+        model_config += '\n' + str(stat.st_size) + ' ' + str(stat.st_mtime)
+    return model_config
+
+
+def cached_latency_estimation(cache_dir, cache_size, model_config, lambda_list, latency_estimation):
+    # latency_estimation(lambda_list, layer_index): the estimation of the layers which are not in the cache
+    # cache_size: unit: B, 0: no cache
+    if cache_size <= 0:
+        return latency_estimation(lambda_list, None)
+    keys = [noc_cache_key(model_config, lambda_array) for lambda_array in lambda_list]
+    latency_array = np.zeros(len(lambda_list))
+    miss_index = []
+    for index, key in enumerate(keys):
+        latency = noc_cache_get(cache_dir, key)
+        if latency is None:
+            miss_index.append(index)
+        else:
+            latency_array[index] = latency
+    print('[ INFO] NoC cache: ' + str(len(lambda_list) - len(miss_index)) + '/' + str(len(lambda_list)) + ' hits\n')
+    if len(miss_index) > 0:
+        miss_latency, _ = latency_estimation([lambda_list[index] for index in miss_index], miss_index)
+        for index, latency in zip(miss_index, miss_latency):
+            latency_array[index] = latency
+            if not math.isnan(latency):
+                noc_cache_put(cache_dir, keys[index], float(latency))
+    return latency_array, latency_array.tolist()
+
+
+def create_injection_rate(noc_input, injection_directory_name=None):
+    # injection_directory_name: the directory to save the injection rate matrices, None: not saved
     network_type = 'mesh'
-    injection_directory_name = homepath + '/inj_dir'
-    dir_exist = os.path.isdir(injection_directory_name)
-    if dir_exist == True:
-        os.system('rm -rf ' + injection_directory_name)
-    os.mkdir(injection_directory_name)
+    if injection_directory_name is not None:
+        dir_exist = os.path.isdir(injection_directory_name)
+        if dir_exist == True:
+            os.system('rm -rf ' + injection_directory_name)
+        os.mkdir(injection_directory_name)
 
     quantization_bit = 1
     bus_width = 32
     freq = 500000000
 
-    num_tiles_per_layer = pd.read_csv(homepath + '/to_interconnect/num_tiles_per_layer.csv', header=None)
-    ip_activation = pd.read_csv(homepath + '/to_interconnect/ip_activation.csv', header=None)
-    fps = pd.read_csv(homepath + '/to_interconnect/fps.csv', header=None)
+    num_tiles_per_layer = noc_input.num_tiles_per_layer
+    ip_activation = noc_input.ip_activation
+    fps = noc_input.fps
     num_layers = num_tiles_per_layer.size
-    total_tiles = num_tiles_per_layer.sum()
-    volume_per_tile = np.zeros(num_layers - 1)
-
-    for layer_idx in range(num_layers - 1):
-        volume_per_tile[layer_idx] = ((ip_activation.loc[layer_idx + 1][0] * quantization_bit + bus_width) * fps.loc[0][
-            0]) / \
-                                     (num_tiles_per_layer.loc[layer_idx][0] * num_tiles_per_layer.loc[layer_idx + 1][
-                                         0]);
-
-    ip_activation_per_tile = np.zeros(num_layers - 1);
-    for layer_idx in range(num_layers - 1):
-        ip_activation_per_tile[layer_idx] = ip_activation.loc[layer_idx + 1][0] / (
-                    num_tiles_per_layer.loc[layer_idx][0] * num_tiles_per_layer.loc[layer_idx + 1][0]);
+    # the tiles of each layer send to all the tiles of the next layer
+    tile_pair_num = num_tiles_per_layer[:-1] * num_tiles_per_layer[1:]
+    volume_per_tile = (ip_activation[1:] * quantization_bit + bus_width) * fps / tile_pair_num
+    ip_activation_per_tile = ip_activation[1:] / tile_pair_num
 
-    # assert(num_tiles_per_layer.size()) == num_layers);
+    lambda_list = []
 
     for layer_idx in range(0, num_layers - 1):
+        num_src_tiles = num_tiles_per_layer[layer_idx]
+        num_dest_tiles = num_tiles_per_layer[layer_idx + 1]
+        NO_OF_ROWS, NO_OF_COLS, num_node = layer_network_size(network_type, num_src_tiles, num_dest_tiles)
 
-        num_src_tiles = num_tiles_per_layer.loc[layer_idx][0];
-        num_dest_tiles = num_tiles_per_layer.loc[layer_idx + 1][0];
-
-        if (network_type == 'mesh'):
-            NO_OF_ROWS = math.ceil(math.sqrt(num_src_tiles + num_dest_tiles));
-            NO_OF_COLS = NO_OF_ROWS;
-            num_node = NO_OF_ROWS * NO_OF_COLS;
-        elif (network_type == 'htree'):
-            NO_OF_ROWS = math.ceil(math.log2(num_src_tiles + num_dest_tiles));
-            NO_OF_COLS = NO_OF_ROWS;
-            num_node = 2 ^ NO_OF_ROWS;
-        else:
-            assert (0, 'Network type not supported');
+        # src nodes: 0 ~ num_src_tiles-1, dest nodes: num_src_tiles ~ num_src_tiles+num_dest_tiles-1
+        lambda_array = np.zeros((num_node, num_node))
+        lambda_array[0:num_src_tiles, num_src_tiles:num_src_tiles + num_dest_tiles] = \
+            (volume_per_tile[layer_idx] / bus_width) / freq
 
-        lambda_array = np.zeros((num_node, num_node));
+        lambda_list.append(lambda_array)
+        if injection_directory_name is not None:
+            filename = injection_directory_name + '/inj_rate_' + str(layer_idx) + '.txt'
+            np.savetxt(filename, lambda_array, fmt='%.12f')
 
-        for src_node in range(0, num_src_tiles):
-            for dest_node in range((num_src_tiles), (num_src_tiles + num_dest_tiles)):
-                lambda_array[src_node, dest_node] = (volume_per_tile[layer_idx] / bus_width) / freq;
+    return num_layers, num_tiles_per_layer, ip_activation_per_tile, volume_per_tile, lambda_list
 
-        os.chdir(injection_directory_name);
-        filename = 'inj_rate_' + str(layer_idx) + '.txt'
-        np.savetxt(filename, lambda_array, fmt='%.12f')
-        os.chdir("..")
 
-    return num_layers, num_tiles_per_layer, ip_activation_per_tile, volume_per_tile
+def create_placement_traffic(noc_input, injection_directory_name=None):
+    # the flows of each layer transfer between the tiles placed by TCG (see NoC_input.set_placement)
+    # return: layer number, input activation and volume per tile pair, list of the flows (src, dst, rate)
+    quantization_bit = 1
+    bus_width = 32
+    freq = 500000000
+    if injection_directory_name is not None:
+        if os.path.isdir(injection_directory_name):
+            os.system('rm -rf ' + injection_directory_name)
+        os.mkdir(injection_directory_name)
+
+    layer_nodes = noc_input.layer_nodes
+    num_layers = len(layer_nodes)
+    tile_num = np.array([len(nodes) for nodes in layer_nodes])
+    tile_pair_num = tile_num[:-1] * tile_num[1:]
+    volume_per_tile = (noc_input.ip_activation[1:] * quantization_bit + bus_width) * noc_input.fps / tile_pair_num
+    ip_activation_per_tile = noc_input.ip_activation[1:] / tile_pair_num
+
+    flow_list = []
+    for layer_idx in range(0, num_layers - 1):
+        src_nodes = layer_nodes[layer_idx]
+        dest_nodes = layer_nodes[layer_idx + 1]
+        if noc_input.layer_chip[layer_idx] != noc_input.layer_chip[layer_idx + 1]:
+            src_nodes = dest_nodes = np.zeros(0, dtype=np.int64)
+                # the data goes through the inter-chip link
+        src = np.repeat(src_nodes, len(dest_nodes))
+        dst = np.tile(dest_nodes, len(src_nodes))
+        rate = np.full(len(src), (volume_per_tile[layer_idx] / bus_width) / freq)
+        flow_list.append((src, dst, rate))
+        if injection_directory_name is not None:
+            filename = injection_directory_name + '/inj_flow_' + str(layer_idx) + '.txt'
+            np.savetxt(filename, np.stack((src, dst, rate), axis=1), fmt=['%d', '%d', '%.12f'])
+
+    return num_layers, ip_activation_per_tile, volume_per_tile, flow_list
+
+
+def layer_network_size(network_type, num_src_tiles, num_dest_tiles):
+    # return: the row number, the column number and the node number of the network of one layer transfer
+    if (network_type == 'mesh'):
+        NO_OF_ROWS = math.ceil(math.sqrt(num_src_tiles + num_dest_tiles))
+        NO_OF_COLS = NO_OF_ROWS
+        num_node = NO_OF_ROWS * NO_OF_COLS
+    elif (network_type == 'htree'):
+        NO_OF_ROWS = math.ceil(math.log2(num_src_tiles + num_dest_tiles))
+        NO_OF_COLS = NO_OF_ROWS
+        num_node = 2 ** NO_OF_ROWS
+    else:
+        assert 0, "Network type not supported"
+    return NO_OF_ROWS, NO_OF_COLS, num_node
 
 
-def postprocess_latency_array(num_layers, num_tiles_per_layer, ip_activation_per_tile, volume_per_tile, latency_array):
+def postprocess_latency_array(num_layers, num_tiles_per_layer, ip_activation_per_tile, volume_per_tile, latency_array,
+                              avg_const_delay=None):
+    # avg_const_delay: the average constant delay of each layer transfer, None: computed on the mesh of
+    # create_injection_rate
     network_type = 'mesh'
     quantization_bit = 1
     bus_width = 32
     freq = 500000000
 
-    avg_const_delay = np.zeros(num_layers - 1)
+    if avg_const_delay is None:
+        avg_const_delay = np.zeros(num_layers - 1)
+        for layer_idx in range(0, num_layers - 1):
+            avg_const_delay[layer_idx] = layer_avg_const_delay(network_type, num_tiles_per_layer[layer_idx],
+                                                               num_tiles_per_layer[layer_idx + 1],
+                                                               volume_per_tile[layer_idx], bus_width, freq)
     per_layer_latency = np.zeros(num_layers - 1)
     effective_delay = np.zeros(num_layers - 1)
 
     for layer_idx in range(0, num_layers - 1):
-        num_src_tiles = num_tiles_per_layer.loc[layer_idx][0]
-        num_dest_tiles = num_tiles_per_layer.loc[layer_idx + 1][0]
-
         avg_latency_layer = latency_array[layer_idx]
 
-        if (network_type == 'mesh'):
-            NO_OF_ROWS = math.ceil(math.sqrt(num_src_tiles + num_dest_tiles));
-            NO_OF_COLS = NO_OF_ROWS;
-            num_node = NO_OF_ROWS * NO_OF_COLS;
-        elif (network_type == 'htree'):
-            NO_OF_ROWS = math.ceil(math.log2(num_src_tiles + num_dest_tiles));
-            NO_OF_COLS = NO_OF_ROWS;
-            num_node = 2 ^ NO_OF_ROWS;
-        else:
-            assert (0, 'Network type not supported')
-
-        lambda_array = np.zeros((num_node, num_node))
-
-        for src_node in range(0, num_src_tiles):
-            for dest_node in range((num_src_tiles), (num_src_tiles + num_dest_tiles)):
-                lambda_array[src_node, dest_node] = (volume_per_tile[layer_idx] / bus_width) / freq;
-
-        weighted_const_delay = 0
-
-        for src_node in range(0, num_src_tiles):
-            for dest_node in range((num_src_tiles), (num_src_tiles + num_dest_tiles)):
-                src_row, src_col = extract_row_and_column_from_id(src_node, NO_OF_ROWS, NO_OF_COLS)
-                dest_row, dest_col = extract_row_and_column_from_id(dest_node, NO_OF_ROWS, NO_OF_COLS)
-
-                const_dist = abs(src_row - dest_row) + abs(src_col - dest_col)  # number of links
-                const_pipeline_delay = 4 * (
-                            const_dist + 1)  # number of routers visited is one more than number of links
-                source_sink_delay = 3;
-
-                total_const_delay = const_dist + const_pipeline_delay + source_sink_delay
-                weighted_const_delay += lambda_array[src_node, dest_node] * total_const_delay
-
-        avg_const_delay[layer_idx] = weighted_const_delay / np.sum(lambda_array)
-
         if (math.isnan(avg_latency_layer)):
             effective_delay[layer_idx] = 0
         else:
@@ -322,16 +1168,36 @@ def postprocess_latency_array(num_layers, num_tiles_per_layer, ip_activation_per
     return total_latency, per_layer_latency
 
 
+def layer_avg_const_delay(network_type, num_src_tiles, num_dest_tiles, volume_per_tile, bus_width, freq):
+    # the average constant delay (cycle) of one layer transfer on the network of create_injection_rate
+    NO_OF_ROWS, NO_OF_COLS, num_node = layer_network_size(network_type, num_src_tiles, num_dest_tiles)
+
+    # the injection rates of the src (row) -> dest (column) pairs
+    lambda_array = np.full((num_src_tiles, num_dest_tiles), (volume_per_tile / bus_width) / freq)
+
+    src_row, src_col = extract_row_and_column_from_id(np.arange(0, num_src_tiles), NO_OF_ROWS, NO_OF_COLS)
+    dest_row, dest_col = extract_row_and_column_from_id(np.arange(num_src_tiles, num_src_tiles + num_dest_tiles),
+                                                        NO_OF_ROWS, NO_OF_COLS)
+
+    const_dist = np.abs(src_row[:, None] - dest_row[None, :]) + np.abs(src_col[:, None] - dest_col[None, :])
+        # number of links
+    const_pipeline_delay = 4 * (const_dist + 1)
+        # number of routers visited is one more than number of links
+    source_sink_delay = 3
+
+    total_const_delay = const_dist + const_pipeline_delay + source_sink_delay
+    weighted_const_delay = np.sum(lambda_array * total_const_delay)
+
+    return weighted_const_delay / np.sum(lambda_array)
+
+
 def extract_row_and_column_from_id(ID, NO_OF_ROWS, NO_OF_COLS):
-    remainder = ID % NO_OF_COLS
-    quotient = ID // NO_OF_COLS
+    # ID: node id or array of node ids
+    remainder = np.mod(ID, NO_OF_COLS)
+    quotient = np.floor_divide(ID, NO_OF_COLS)
 
-    if remainder == 0:
-        column = NO_OF_COLS
-        row = quotient
-    else:
-        column = remainder
-        row = quotient + 1
+    column = np.where(remainder == 0, NO_OF_COLS, remainder)
+    row = np.where(remainder == 0, quotient, quotient + 1)
 
     return row, column
 
@@ -6,14 +6,15 @@ import configparser as cp
 work_path = os.path.dirname(os.getcwd())
 sys.path.append(work_path)
 import numpy as np
-from MNSIM.Interface.interface import *
 from MNSIM.Mapping_Model.Tile_connection_graph import TCG
-from MNSIM.Hardware_Model.Tile import tile
+from MNSIM.Hardware_Model.Tile import tile, tile_power_record, calculate_tile_read_power_record, SimConfig_hash
 
 class Model_inference_power():
     def __init__(self, NetStruct, SimConfig_path, multiple=None, TCG_mapping=None):
         self.NetStruct = NetStruct
         self.SimConfig_path = SimConfig_path
+        self.config_hash = SimConfig_hash(SimConfig_path)
+            # the config is hashed once per model, see calculate_tile_read_power_record
         if multiple is None:
             multiple = [1] * len(self.NetStruct)
         if TCG_mapping is None:
@@ -53,45 +54,45 @@ class Model_inference_power():
         self.calculate_model_power()
 
     def calculate_model_power(self):
-        for i in range(self.total_layer_num):
-            tile_num = self.graph.layer_tileinfo[i]['tilenum']
-            max_column = self.graph.layer_tileinfo[i]['max_column']
-            max_row = self.graph.layer_tileinfo[i]['max_row']
-            max_PE = self.graph.layer_tileinfo[i]['max_PE']
-            max_group = self.graph.layer_tileinfo[i]['max_group']
-            layer_type = self.graph.net[i][0][0]['type']
-            self.graph.tile.calculate_tile_read_power_fast(max_column,max_row,max_PE,max_group,layer_type)
-            self.arch_power[i] = self.graph.tile.tile_read_power * tile_num
-            self.arch_xbar_power[i] = self.graph.tile.tile_xbar_read_power * tile_num
-            self.arch_ADC_power[i] = self.graph.tile.tile_ADC_read_power * tile_num
-            self.arch_DAC_power[i] = self.graph.tile.tile_DAC_read_power * tile_num
-            self.arch_digital_power[i] = self.graph.tile.tile_digital_read_power * tile_num
-            self.arch_adder_power[i] = self.graph.tile.tile_adder_read_power * tile_num
-            self.arch_shiftreg_power[i] = self.graph.tile.tile_shiftreg_read_power * tile_num
-            self.arch_iReg_power[i] = self.graph.tile.tile_iReg_read_power * tile_num
-            self.arch_input_demux_power[i] = self.graph.tile.tile_input_demux_read_power * tile_num
-            self.arch_output_mux_power[i] = self.graph.tile.tile_output_mux_read_power * tile_num
-            self.arch_jointmodule_power[i] = self.graph.tile.tile_jointmodule_read_power * tile_num
-            self.arch_buf_power[i] = self.graph.tile.tile_buffer_read_power * tile_num
-            self.arch_buf_r_power[i] = self.graph.tile.tile_buffer_r_read_power * tile_num
-            self.arch_buf_w_power[i] = self.graph.tile.tile_buffer_w_read_power * tile_num
-            self.arch_pooling_power[i] = self.graph.tile.tile_pooling_read_power * tile_num
-        self.arch_total_power = sum(self.arch_power)
-        self.arch_total_xbar_power = sum(self.arch_xbar_power)
-        self.arch_total_ADC_power = sum(self.arch_ADC_power)
-        self.arch_total_DAC_power = sum(self.arch_DAC_power)
-        self.arch_total_digital_power = sum(self.arch_digital_power)
-        self.arch_total_adder_power = sum(self.arch_adder_power)
-        self.arch_total_shiftreg_power = sum(self.arch_shiftreg_power)
-        self.arch_total_iReg_power = sum(self.arch_iReg_power)
-        self.arch_total_input_demux_power = sum(self.arch_input_demux_power)
-        self.arch_total_output_mux_power = sum(self.arch_output_mux_power)
-        self.arch_total_jointmodule_power = sum(self.arch_jointmodule_power)
-        self.arch_total_buf_power = sum(self.arch_buf_power)
-        self.arch_total_buf_r_power = sum(self.arch_buf_r_power)
-        self.arch_total_buf_w_power = sum(self.arch_buf_w_power)
-        self.arch_total_pooling_power = sum(self.arch_pooling_power)
-    
+        # columnar estimation: the power of all layers is computed at once from the array form of layer_tileinfo
+        # the tile power of each occupancy is memoized, layers (and runs) with the same occupancy share the result
+        tileinfo = self.graph.get_layer_tileinfo_array()
+        occupancy_list = zip(tileinfo['max_column'], tileinfo['max_row'], tileinfo['max_PE'], tileinfo['max_group'], tileinfo['type'])
+        record_list = calculate_tile_read_power_record(self.SimConfig_path, list(occupancy_list), self.config_hash)
+        tile_power = dict(zip(tile_power_record._fields, np.array(record_list, dtype=float).reshape(-1, len(tile_power_record._fields)).T))
+        tile_num = tileinfo['tile_share']
+            # the tiles shared by several layers (tile packing) are split by the PE numbers
+        self.arch_power = tile_power['total'] * tile_num
+        self.arch_xbar_power = tile_power['xbar'] * tile_num
+        self.arch_ADC_power = tile_power['ADC'] * tile_num
+        self.arch_DAC_power = tile_power['DAC'] * tile_num
+        self.arch_digital_power = tile_power['digital'] * tile_num
+        self.arch_adder_power = tile_power['adder'] * tile_num
+        self.arch_shiftreg_power = tile_power['shiftreg'] * tile_num
+        self.arch_iReg_power = tile_power['iReg'] * tile_num
+        self.arch_input_demux_power = tile_power['input_demux'] * tile_num
+        self.arch_output_mux_power = tile_power['output_mux'] * tile_num
+        self.arch_jointmodule_power = tile_power['jointmodule'] * tile_num
+        self.arch_buf_power = tile_power['buffer'] * tile_num
+        self.arch_buf_r_power = tile_power['buffer_r'] * tile_num
+        self.arch_buf_w_power = tile_power['buffer_w'] * tile_num
+        self.arch_pooling_power = tile_power['pooling'] * tile_num
+        self.arch_total_power = self.arch_power.sum()
+        self.arch_total_xbar_power = self.arch_xbar_power.sum()
+        self.arch_total_ADC_power = self.arch_ADC_power.sum()
+        self.arch_total_DAC_power = self.arch_DAC_power.sum()
+        self.arch_total_digital_power = self.arch_digital_power.sum()
+        self.arch_total_adder_power = self.arch_adder_power.sum()
+        self.arch_total_shiftreg_power = self.arch_shiftreg_power.sum()
+        self.arch_total_iReg_power = self.arch_iReg_power.sum()
+        self.arch_total_input_demux_power = self.arch_input_demux_power.sum()
+        self.arch_total_output_mux_power = self.arch_output_mux_power.sum()
+        self.arch_total_jointmodule_power = self.arch_jointmodule_power.sum()
+        self.arch_total_buf_power = self.arch_buf_power.sum()
+        self.arch_total_buf_r_power = self.arch_buf_r_power.sum()
+        self.arch_total_buf_w_power = self.arch_buf_w_power.sum()
+        self.arch_total_pooling_power = self.arch_pooling_power.sum()
+
     def model_power_output(self, module_information = 1, layer_information = 1):
         print("Hardware power:", self.arch_total_power, "W")
         if module_information:
@@ -114,6 +115,7 @@ class Model_inference_power():
                 print("Layer", i, ":")
                 print("     Hardware power:", self.arch_power[i], "W")
 if __name__ == '__main__':
+    from MNSIM.Interface.interface import TrainTestInterface
     test_SimConfig_path = os.path.join(os.path.dirname(os.path.dirname(os.getcwd())), "SimConfig.ini")
     test_weights_file_path = os.path.join(os.path.dirname(os.path.dirname(os.getcwd())),
                                           "vgg8_params.pth")
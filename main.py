@@ -117,6 +117,8 @@ def main():
             __latency.calculate_model_latency_nopipe()
         __energy = Model_energy(NetStruct=structure_file, SimConfig_path=args.hardware_description, TCG_mapping=TCG_mapping,
                                 model_latency=__latency,model_power=__power)
+        print("========================Mapping Results=================================")
+        TCG_mapping.mapping_output(not (args.disable_layer_output))
         print("========================Area Results=================================")
         __area.model_area_output(not (args.disable_module_output), not (args.disable_layer_output))
         print("========================Power Results=================================")